@@ -1,80 +1,146 @@
 import json
-import os
+import queue
 import subprocess
-import tempfile
 from pathlib import Path
-from typing import Union
-
-import customtkinter as ctk
-from jira import JIRA
+from typing import TYPE_CHECKING, Union
+from urllib.parse import urlparse
 
 from constants import (
     CLOUD_CA_CERT_PATH,
     CONFIG_FILE_PATH,
+    DEFAULT_LEDGER_TTL_HOURS,
+    DEFAULT_MAX_WORKERS,
     JIRA_MODE,
+    PROFILES_DIR,
     SELF_HOSTED_CA_CERT_PATH,
-    TEMP_FOLDER_NAME,
 )
-from get_certificate_chain_download import SSLCertificateChainDownloader
+from jira_sessions import JiraSessionManager
 
+if TYPE_CHECKING:
+    import ssl
 
-def get_ssl_certificate(host_name: str) -> Path:
-    # TODO: gestire eccezioni in caso di fallimento nel download
+    # The Jira client is imported when first instantiated, to keep the startup fast
+    from jira import JIRA
 
-    # Get up-dated ssl certificates
 
-    out_temp_dir: str = os.path.join(tempfile.gettempdir(), TEMP_FOLDER_NAME)
-    downloader = SSLCertificateChainDownloader(output_directory=out_temp_dir)
-    result: dict[str, list[str]] = downloader.run(
-        {"host": host_name, "remove_ca_files": True}
-    )
-    # Extracting the path from the result
-    certificate_path = (
-        Path(result.get("files")[0])
-        if "files" in result and result.get("files")
-        else None
-    )
-    return certificate_path
+def get_ssl_context(server_url: str) -> "ssl.SSLContext":
+    """Download the certificate chain of the Jira server and trust it, in memory."""
+    # TODO: gestire eccezioni in caso di fallimento nel download
+    from get_certificate_chain_download import get_ssl_context as download_ssl_context
+
+    return download_ssl_context(urlparse(server_url).netloc)
 
 
 class AppData:
-    def __init__(self):
+    def __init__(self, user_email: Union[None, str] = None):
         self.load_config()
-        self._user_email: str = subprocess.check_output(
-            ["whoami", "/upn"], text=True
-        ).rstrip()
+        # The Windows UPN is the Jira Cloud login, unless given explicitly (e.g. by the CLI).
+        # It is resolved on first use, see `user_email`
+        self._user_email: Union[None, str] = user_email
 
         self._ssl_certificate_path: Path = None
         self._is_api_token_valid = False
         self._num_available_licenses = 0
         self._jira_mode = next(iter(JIRA_MODE))
+        # Toggled by a hidden key binding of the GUI, never saved in the configuration
+        self._profiling_enabled = False
 
         self.selected_file_path_var = None
         self.selected_month_var = None
         self.selected_user_var = None
         self.progress_bar_var = None
+        self.progress_status_var = None
+        # Progress events of the runs, sent by the worker threads to the Tk thread
+        self.progress_events: queue.SimpleQueue = queue.SimpleQueue()
 
         self._jira = None
-
-    def instantiate_jira_class_self_hosted(self) -> None:
-        # self._ssl_certificate_path: Path = get_ssl_certificate(self._config["host_name"])
-        self._ssl_certificate_path: Path = Path(SELF_HOSTED_CA_CERT_PATH)
-        self._jira = JIRA(
-            server=self._config["server_url_self_hosted"],
-            token_auth=self.api_key_token,
-            options={"verify": self._ssl_certificate_path},
+        # One client per mode, reused until its server, token or certificates change
+        self._sessions = JiraSessionManager()
+
+    def _create_jira(self, server_url: str, ca_cert_path: Path, **auth) -> "JIRA":
+        # The server is verified against the CA file shipped with the tool, or
+        # against its chain downloaded in memory if enabled
+        from jira_metrics import JiraMetrics
+
+        if self.download_ssl_chain:
+            from jira_client import SSLContextJIRA
+
+            jira: "JIRA" = SSLContextJIRA(
+                server=server_url,
+                ssl_context=get_ssl_context(server_url),
+                pool_maxsize=self.max_workers,
+                **auth,
+            )
+        else:
+            from jira_client import PooledJIRA
+
+            jira = PooledJIRA(
+                server=server_url,
+                options={"verify": Path(ca_cert_path)},
+                pool_maxsize=self.max_workers,
+                **auth,
+            )
+        JiraMetrics().install(jira)
+        return jira
+
+    def _jira_client(
+        self, mode: int, server_url: str, ca_cert_path: Path, **auth
+    ) -> "JIRA":
+        key: tuple = (
+            server_url,
+            repr(sorted(auth.items())),
+            self.download_ssl_chain,
+            self.max_workers,
+        )
+        return self._sessions.get(
+            mode,
+            key,
+            lambda: self._create_jira(server_url, ca_cert_path, **auth),
         )
 
-    def instantiate_jira_class_cloud(self) -> None:
-        self._ssl_certificate_path: Path = Path(CLOUD_CA_CERT_PATH)
+    def build_jira(self, mode: int, api_key_token: str) -> "JIRA":
+        """Return the client of a Jira mode logged in with a token, without using it.
+
+        Parameters:
+        mode (int): The Jira mode, a key of JIRA_MODE.
+        api_key_token (str): The API token of that mode.
+
+        Returns:
+        JIRA: The shared client of the mode, created if its settings changed.
+        """
+        if mode == 1:
+            return self._jira_client(
+                1,
+                self._config["server_url_self_hosted"],
+                SELF_HOSTED_CA_CERT_PATH,
+                token_auth=api_key_token,
+            )
+        return self._jira_client(
+            0,
+            self._config["server_url_cloud"],
+            CLOUD_CA_CERT_PATH,
+            basic_auth=(self.user_email, api_key_token),
+        )
 
-        self._jira = JIRA(
-            server=self._config["server_url_cloud"],
-            basic_auth=(self._user_email, self.api_key_token),
-            options={"verify": self._ssl_certificate_path},
+    def use_jira(self, mode: int, jira: "JIRA") -> None:
+        """Make a client built by `build_jira` the one used by the runs."""
+        self._jira = jira
+        self._ssl_certificate_path = (
+            None
+            if self.download_ssl_chain
+            else Path(CLOUD_CA_CERT_PATH if mode == 0 else SELF_HOSTED_CA_CERT_PATH)
         )
 
+    def instantiate_jira_class_self_hosted(self) -> None:
+        self.use_jira(1, self.build_jira(1, self.api_key_token))
+
+    def instantiate_jira_class_cloud(self) -> None:
+        self.use_jira(0, self.build_jira(0, self.api_key_token))
+
     def instantiate_view_variables(self) -> None:
+        # Imported here so that AppData can be used without Tk (e.g. from the CLI)
+        import customtkinter as ctk
+
         self.selected_user_var = ctk.StringVar()
         self.selected_user_var.set(self.selected_user)
         self.selected_user_var.trace_add("write", self.update_selected_user)
@@ -94,6 +160,8 @@ class AppData:
         self.progress_bar_var = ctk.DoubleVar()
         self.progress_bar_var.set(0)
 
+        self.progress_status_var = ctk.StringVar()
+
     def update_selected_user(self, var, index, mode) -> None:
         self.selected_user = self.selected_user_var.get()
 
@@ -182,6 +250,15 @@ class AppData:
         elif self.jira_mode == 1:
             self._config["api_key_token_self_hosted"] = value
 
+    @property
+    def user_email(self) -> str:
+        # 'whoami /upn' blocks for a while, so it runs once and only if Jira Cloud is used
+        if self._user_email is None:
+            self._user_email = subprocess.check_output(
+                ["whoami", "/upn"], text=True
+            ).rstrip()
+        return self._user_email
+
     @property
     def ssl_certificate_path(self) -> Path:
         return self._ssl_certificate_path
@@ -190,13 +267,58 @@ class AppData:
         return self._jira.myself()["displayName"]
 
     @property
-    def jira(self) -> Union[None, JIRA]:
+    def jira(self) -> Union[None, "JIRA"]:
         return self._jira
 
     @property
     def jira_map_file(self) -> str:
         return self._config["jira_map_file"]
 
+    @property
+    def max_workers(self) -> int:
+        return self._config.get("max_workers", DEFAULT_MAX_WORKERS)
+
+    @property
+    def excel_streaming_reader(self) -> bool:
+        return self._config.get("excel_streaming_reader", False)
+
+    @property
+    def workbook_cache_enabled(self) -> bool:
+        return self._config.get("workbook_cache", True)
+
+    @property
+    def profiling_enabled(self) -> bool:
+        return self._profiling_enabled
+
+    @profiling_enabled.setter
+    def profiling_enabled(self, value: bool) -> None:
+        self._profiling_enabled = value
+
+    @property
+    def profile_dir(self) -> Union[None, str]:
+        """Directory of the stage profiles, None if profiling is disabled."""
+        return str(PROFILES_DIR) if self._profiling_enabled else None
+
+    @property
+    def reconcile_worklogs(self) -> bool:
+        return self._config.get("reconcile_worklogs", False)
+
+    @property
+    def worklog_ledger_enabled(self) -> bool:
+        return self._config.get("worklog_ledger", True)
+
+    @property
+    def ledger_ttl_hours(self) -> float:
+        return self._config.get("ledger_ttl_hours", DEFAULT_LEDGER_TTL_HOURS)
+
+    @property
+    def download_ssl_chain(self) -> bool:
+        return self._config.get("download_ssl_chain", False)
+
+    @property
+    def run_journal_enabled(self) -> bool:
+        return self._config.get("run_journal", True)
+
     @property
     def config(self) -> dict[str, str]:
         return self._config
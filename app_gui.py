@@ -1,22 +1,25 @@
 import asyncio
+import concurrent.futures
 import threading
-from typing import Union
+from typing import Callable, Union
 
 import customtkinter as ctk
-from CTkMessagebox import CTkMessagebox
 from PIL import Image
 
 import logging_conf as lg
 from app_data import AppData
-from app_logic import AppLogic
+from app_logic import AppLogic, TokenCheck
 from constants import (
     CHECK_ICON_PATH,
     CROSS_ICON_PATH,
     JIRA_ICON_PATH,
     JIRA_MODE,
     MONTHS,
+    PROGRESS_POLL_MS,
+    TOKEN_CHECK_POLL_MS,
 )
 from logging_conf import logger
+from progress import PARSE, ProgressEvent
 
 
 def select_file(excel_file_path: ctk.StringVar) -> None:
@@ -32,6 +35,9 @@ class App:
         self.api_validity_icon = None
         self._app_data: AppData = data
         self._app_logic: AppLogic = app_logic
+        # Status lines of the progress label, of the run and of each user
+        self._run_progress: str = ""
+        self._user_progress: dict[str, str] = {}
 
         # Start the asyncio event loop in a separate thread
         self.loop: asyncio.AbstractEventLoop = asyncio.new_event_loop()
@@ -40,6 +46,8 @@ class App:
         self._gui: ctk.CTk = self.create_gui()
         # Collega la funzione on_closing all'evento di chiusura della finestra
         self._gui.protocol("WM_DELETE_WINDOW", self.on_closing)
+        # Hidden toggle of the stage profiling, for diagnosing slow or large runs
+        self._gui.bind("<Control-Alt-p>", self.toggle_profiling)
 
     def on_closing(self) -> None:
         # Salva la configurazione prima di chiudere
@@ -47,6 +55,13 @@ class App:
         # Chiudi la finestra
         self._gui.destroy()
 
+    def toggle_profiling(self, event=None) -> None:
+        self._app_data.profiling_enabled = not self._app_data.profiling_enabled
+        if self._app_data.profiling_enabled:
+            logger.info(f"Profiling enabled, profiles in {self._app_data.profile_dir}")
+        else:
+            logger.info("Profiling disabled")
+
     def start_event_loop(self) -> None:
         asyncio.set_event_loop(self.loop)
         self.loop.run_forever()
@@ -56,7 +71,7 @@ class App:
         main_window.title("Jira workload logging tool")
 
         ctk.set_appearance_mode(self._app_data.appearance_theme)
-        main_window.geometry("550x670")
+        main_window.geometry("550x710")
         # main_window.resizable(width=False, height=False)
         main_window.iconbitmap(True, JIRA_ICON_PATH)
 
@@ -146,10 +161,8 @@ class App:
 
         self.api_validity_icon = ctk.CTkLabel(api_setting_box)
         self.api_validity_icon.grid(row=1, column=1, padx=10, pady=10)
-        asyncio.run_coroutine_threadsafe(
-            self._app_logic.check_api_token_validity(self.update_api_status_icon),
-            self.loop,
-        )
+        # Connect to Jira once the window is drawn, so that it never delays the first frame
+        main_window.after_idle(self.start_api_token_check)
         # self.update_api_status_icon()  # Function called in order to initialize icon at app launch
 
         set_api_token_button = ctk.CTkButton(
@@ -164,13 +177,36 @@ class App:
             text="Load Worklog",
             command=self._app_logic.load_worklog_handler,
         )
-        start_worklog_load_button.pack(pady=20)
+        start_worklog_load_button.pack(pady=(20, 5))
+
+        # Button to log the month of every user of the team
+        start_team_worklog_load_button = ctk.CTkButton(
+            main_window,
+            text="Load Team Worklog",
+            command=self._app_logic.load_team_worklog_handler,
+        )
+        start_team_worklog_load_button.pack(pady=5)
+
+        # Button to stop the running load, the next load with the same inputs resumes it
+        cancel_worklog_load_button = ctk.CTkButton(
+            main_window,
+            text="Cancel",
+            command=self._app_logic.cancel_handler,
+        )
+        cancel_worklog_load_button.pack(pady=(5, 20))
 
         progressbar = ctk.CTkProgressBar(
             main_window, variable=self._app_data.progress_bar_var
         )
         progressbar.pack(pady=5, ipady=5)
 
+        # Phase, requests per second and ETA of the run
+        progress_status_label = ctk.CTkLabel(
+            main_window, textvariable=self._app_data.progress_status_var
+        )
+        progress_status_label.pack()
+        main_window.after(PROGRESS_POLL_MS, self.poll_progress_events)
+
         # Text Logger box
         log_text = ctk.CTkTextbox(
             main_window,
@@ -193,6 +229,92 @@ class App:
 
         return main_window
 
+    def poll_progress_events(self) -> None:
+        # Only the last event of the run and of each user matters, the previous
+        # ones are already outdated
+        event: Union[None, ProgressEvent] = None
+        user_events: dict[str, ProgressEvent] = {}
+        while not self._app_data.progress_events.empty():
+            queued: ProgressEvent = self._app_data.progress_events.get_nowait()
+            if queued.user:
+                user_events[queued.user] = queued
+            else:
+                event = queued
+
+        if event is not None:
+            if event.phase == PARSE:
+                # A new run: forget the users of the previous one
+                self._user_progress.clear()
+            self._run_progress = event.describe()
+            self._app_data.progress_bar_var.set(event.fraction)
+        for user, user_event in user_events.items():
+            self._user_progress[user] = user_event.describe()
+        if event is not None or user_events:
+            # A line for the run, then one for each user of a team run
+            self._app_data.progress_status_var.set(
+                "\n".join([self._run_progress, *self._user_progress.values()])
+            )
+
+        self._gui.after(PROGRESS_POLL_MS, self.poll_progress_events)
+
+    def start_api_token_check(
+        self, on_result: Union[None, Callable[[bool], None]] = None
+    ) -> "concurrent.futures.Future[TokenCheck]":
+        """Check the API token in the background, never blocking the Tk thread.
+
+        Parameters:
+        on_result (Union[None, Callable[[bool], None]]): Called on the Tk thread with
+        the validity of the token, unless the token or mode changed meanwhile.
+
+        Returns:
+        concurrent.futures.Future[TokenCheck]: The check in progress.
+        """
+        # The outcome if the check fails, with the settings it is started with
+        failed_check = TokenCheck(
+            self._app_data.jira_mode, self._app_data.api_key_token, None
+        )
+        future: concurrent.futures.Future = self._app_logic.start_token_check(self.loop)
+        self._gui.after(
+            TOKEN_CHECK_POLL_MS,
+            self.poll_api_token_check,
+            future,
+            on_result,
+            failed_check,
+        )
+        return future
+
+    def poll_api_token_check(
+        self,
+        future: "concurrent.futures.Future[TokenCheck]",
+        on_result: Union[None, Callable[[bool], None]],
+        failed_check: TokenCheck,
+    ) -> None:
+        # Tk widgets and the settings are only touched from the Tk thread, so the
+        # outcome is polled and applied here
+        if not future.done():
+            self._gui.after(
+                TOKEN_CHECK_POLL_MS,
+                self.poll_api_token_check,
+                future,
+                on_result,
+                failed_check,
+            )
+            return
+        if future.cancelled() and not self._app_logic.is_latest_token_check(future):
+            # Replaced by a newer check, which reports the outcome
+            return
+
+        try:
+            check: TokenCheck = future.result()
+        except (concurrent.futures.CancelledError, Exception) as e:
+            logger.error(f"The API token check did not complete: {e!r}")
+            check = failed_check
+        if not self._app_logic.apply_token_check(check):
+            return
+        self.update_api_status_icon()
+        if on_result is not None:
+            on_result(check.is_valid)
+
     def update_api_status_icon(self) -> None:
         image_path: str = (
             CHECK_ICON_PATH if self._app_data.is_api_token_valid else CROSS_ICON_PATH
@@ -238,20 +360,29 @@ class App:
     def save_token(
         self, token_window: ctk.CTkToplevel, token_value: Union[None, str]
     ) -> None:
+        # Imported on first use, it is not needed to draw the main window
+        from CTkMessagebox import CTkMessagebox
+
         token_window.destroy()
         if token_value is not None:
             self._app_data.api_key_token = token_value
-            asyncio.run_coroutine_threadsafe(
-                self._app_logic.check_api_token_validity(self.update_api_status_icon),
-                self.loop,
+            self.start_api_token_check(on_result=self.show_token_result)
+        else:
+            CTkMessagebox(
+                title="Error",
+                message="Invalid token. Please, try again.",
+                icon="cancel",
             )
 
-            if self._app_data.is_api_token_valid:
-                CTkMessagebox(
-                    title="Success",
-                    message="Valid token, login successfully completed.",
-                    icon="check",
-                )
+    def show_token_result(self, is_valid: bool) -> None:
+        from CTkMessagebox import CTkMessagebox
+
+        if is_valid:
+            CTkMessagebox(
+                title="Success",
+                message="Valid token, login successfully completed.",
+                icon="check",
+            )
         else:
             CTkMessagebox(
                 title="Error",
@@ -262,9 +393,7 @@ class App:
     def switch_event(self) -> None:
         self.jira_mode_switch_label.set(JIRA_MODE[self._app_data.jira_mode_var.get()])
 
-        asyncio.run(
-            self._app_logic.check_api_token_validity(self.update_api_status_icon)
-        )
+        self.start_api_token_check()
 
     def show_window(self) -> None:
         self._gui.mainloop()
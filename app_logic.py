@@ -1,27 +1,43 @@
 import asyncio
+import concurrent.futures
+import dataclasses
 import threading
 from concurrent.futures import ThreadPoolExecutor
-
-from jira.exceptions import JIRAError
+from typing import TYPE_CHECKING, Union
 
 import custom_exceptions as ce
-import jira_log_manager as jm
 from app_data import AppData
-from constants import MONTHS
+from constants import MONTHS, TOKEN_CHECK_TIMEOUT_S
 from logging_conf import logger
+from progress import ProgressReporter
+from workbook_cache import WorkbookCache
+from worklog_ledger import WorklogLedger
+
+if TYPE_CHECKING:
+    from jira import JIRA
 
 
 class AppLogic:
     def __init__(self, app_data: AppData):
         self._app_data: AppData = app_data
-        self.JIRA_INITIALIZATION_MAP = {
-            0: self._app_data.instantiate_jira_class_cloud,  # Default choice
-            1: self._app_data.instantiate_jira_class_self_hosted,
-        }
-        # asyncio.run(self._app_logic.check_api_token_validity(self, update_icon))
+        # Parsed workbooks are reused across runs while the files are unchanged
+        self._workbook_cache: Union[None, WorkbookCache] = (
+            WorkbookCache() if self._app_data.workbook_cache_enabled else None
+        )
+        # Issues synced by recent runs are planned without fetching them again
+        self._worklog_ledger: Union[None, WorklogLedger] = (
+            WorklogLedger(ttl_hours=self._app_data.ledger_ttl_hours)
+            if self._app_data.worklog_ledger_enabled
+            else None
+        )
+        # Set by the Cancel button, checked by the running load between writes
+        self._cancel_event = threading.Event()
+        # The token check in progress, cancelled when a newer check starts
+        self._token_check: Union[None, concurrent.futures.Future] = None
 
     def load_worklog_handler(self) -> None:
         logger.info("Start button pushed!")
+        self._cancel_event.clear()
         _file_path: str = self._app_data.selected_file_path
         _jira_map_file: str = self._app_data.jira_map_file
         _selected_month: int = MONTHS[self._app_data.selected_month]
@@ -32,28 +48,184 @@ class AppLogic:
         logger.info(f"Selected user: {_selected_user}")
 
         _load_worklog_thread = threading.Thread(
-            target=jm.load_worklog,
+            target=self._load_worklog,
             args=(
                 self._app_data.jira,
                 _file_path,
                 _jira_map_file,
                 _selected_month,
                 _selected_user,
-                self._app_data.progress_bar_var,
+                ProgressReporter(self._app_data.progress_events.put),
             ),
+            kwargs={
+                "jira_mode": self._app_data.jira_mode,
+                "max_workers": self._app_data.max_workers,
+                "streaming": self._app_data.excel_streaming_reader,
+                "workbook_cache": self._workbook_cache,
+                "ledger": self._worklog_ledger,
+                "reconcile": self._app_data.reconcile_worklogs,
+                "profile_dir": self._app_data.profile_dir,
+                "cancel_event": self._cancel_event,
+                "run_journal": self._app_data.run_journal_enabled,
+            },
         )
 
         _load_worklog_thread.start()
 
-    async def check_api_token_validity(self, update_icon_callback) -> None:
+    def load_team_worklog_handler(self) -> None:
+        logger.info("Load team button pushed!")
+        self._cancel_event.clear()
+        _users: list[str] = self._app_data.config["users_list"]
+
+        logger.info(f"Excel file path: {self._app_data.selected_file_path}")
+        logger.info(f"Selected month: {MONTHS[self._app_data.selected_month]}")
+        logger.info(f"Selected users: {', '.join(_users)}")
+
+        _load_team_worklog_thread = threading.Thread(
+            target=self._load_team_worklog,
+            args=(
+                self._app_data.jira,
+                self._app_data.selected_file_path,
+                self._app_data.jira_map_file,
+                MONTHS[self._app_data.selected_month],
+                _users,
+                ProgressReporter(self._app_data.progress_events.put),
+            ),
+            kwargs={
+                "jira_mode": self._app_data.jira_mode,
+                "max_workers": self._app_data.max_workers,
+                "workbook_cache": self._workbook_cache,
+                "ledger": self._worklog_ledger,
+                "profile_dir": self._app_data.profile_dir,
+                "cancel_event": self._cancel_event,
+                "run_journal": self._app_data.run_journal_enabled,
+                "reconcile": self._app_data.reconcile_worklogs,
+            },
+        )
+
+        _load_team_worklog_thread.start()
+
+    def cancel_handler(self) -> None:
+        logger.info("Cancel button pushed, stopping after the writes in progress...")
+        self._cancel_event.set()
+
+    @staticmethod
+    def _load_worklog(*args, **kwargs) -> None:
+        # Imported by the worker thread: pandas and jira do not delay the first frame
+        import jira_log_manager as jm
+
+        jm.load_worklog(*args, **kwargs)
+
+    @staticmethod
+    def _load_team_worklog(*args, **kwargs) -> None:
+        import jira_log_manager as jm
+
         try:
-            self.JIRA_INITIALIZATION_MAP[self._app_data.jira_mode]()
+            jm.load_team_worklog(*args, **kwargs)
+        except ce.RunCancelledError as e:
+            logger.warning(f"{e}. Start the same run again to resume it.")
+        except Exception as e:
+            logger.error(f"Failed to load the team worklog: {e}")
+
+    def start_token_check(
+        self, loop: asyncio.AbstractEventLoop
+    ) -> "concurrent.futures.Future[TokenCheck]":
+        """Schedule a check of the API token on the event loop, cancelling the previous one.
+
+        The Jira mode and token are read now, on the Tk thread: the check never
+        reads the settings again, nor changes the client used by the runs.
+
+        Parameters:
+        loop (asyncio.AbstractEventLoop): The event loop running in the background thread.
+
+        Returns:
+        concurrent.futures.Future[TokenCheck]: The outcome of the check, to pass to
+        `apply_token_check`. Cancelled if a newer check starts before it completes.
+        """
+        if self._token_check is not None:
+            self._token_check.cancel()
+        self._token_check = asyncio.run_coroutine_threadsafe(
+            self.check_api_token_validity(
+                self._app_data.jira_mode, self._app_data.api_key_token
+            ),
+            loop,
+        )
+        return self._token_check
+
+    async def check_api_token_validity(
+        self, jira_mode: int, api_key_token: str
+    ) -> "TokenCheck":
+        """Log in to Jira in an executor thread, keeping the event loop free.
+
+        Parameters:
+        jira_mode (int): The Jira mode to log in to.
+        api_key_token (str): The API token to check.
+
+        Returns:
+        TokenCheck: The client logged in, None if the token is invalid or the login
+        took more than TOKEN_CHECK_TIMEOUT_S.
+        """
+        jira: Union[None, "JIRA"] = None
+        try:
+            jira = await asyncio.wait_for(
+                asyncio.get_running_loop().run_in_executor(
+                    None, self._log_in, jira_mode, api_key_token
+                ),
+                timeout=TOKEN_CHECK_TIMEOUT_S,
+            )
+        except asyncio.TimeoutError:
+            logger.error(
+                f"Error connecting to Jira: no answer in {TOKEN_CHECK_TIMEOUT_S}s"
+            )
+        return TokenCheck(jira_mode, api_key_token, jira)
+
+    def _log_in(self, jira_mode: int, api_key_token: str) -> Union[None, "JIRA"]:
+        # Blocking: runs in the executor of the event loop. Any error (e.g. reading
+        # the user email, the SSL setup or the chain download) fails the check
+        try:
+            jira: "JIRA" = self._app_data.build_jira(jira_mode, api_key_token)
             logger.info(
-                f"Successfully connected to Jira as user {self._app_data.get_username()}"
+                f"Successfully connected to Jira as user {jira.myself()['displayName']}"
             )
-            self._app_data.is_api_token_valid = True
-        except (ce.JiraConnectionError, JIRAError, AttributeError) as e:
+            return jira
+        except Exception as e:
             logger.error(f"Error connecting to Jira: {e}")
-            self._app_data.is_api_token_valid = False
-        finally:
-            update_icon_callback()
+            return None
+
+    def is_latest_token_check(self, future: "concurrent.futures.Future") -> bool:
+        """Tell if no newer API token check was started since this one."""
+        return future is self._token_check
+
+    def apply_token_check(self, check: "TokenCheck") -> bool:
+        """Store the outcome of a check, on the Tk thread, if its settings are current.
+
+        Parameters:
+        check (TokenCheck): The outcome returned by `check_api_token_validity`.
+
+        Returns:
+        bool: False if the mode or token changed since the check started: it is
+        discarded, a newer check is running.
+        """
+        if (check.jira_mode, check.api_key_token) != (
+            self._app_data.jira_mode,
+            self._app_data.api_key_token,
+        ):
+            return False
+
+        self._app_data.is_api_token_valid = check.is_valid
+        if check.jira is not None:
+            self._app_data.use_jira(check.jira_mode, check.jira)
+        return True
+
+
+@dataclasses.dataclass(frozen=True)
+class TokenCheck:
+    """The outcome of an API token check, with the settings it was run with."""
+
+    jira_mode: int
+    api_key_token: str
+    jira: Union[None, "JIRA"]
+
+    @property
+    def is_valid(self) -> bool:
+        return self.jira is not None
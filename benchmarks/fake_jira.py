@@ -0,0 +1,357 @@
+"""In-process stand-in for the Jira REST endpoints used by the tool.
+
+It serves on localhost over plain HTTP, with configurable latency, server errors
+and HTTP 429 responses. The worklogs it receives are kept in memory, so a
+benchmark can run the same month twice and measure a re-run.
+
+Served endpoints (under /rest/api/2):
+    GET serverInfo, field, myself
+    GET search (with "key in (...)" JQL, fields=worklog, expand=changelog)
+    GET issue/{key} (with expand=changelog)
+    GET, POST issue/{key}/worklog
+    GET, PUT, DELETE issue/{key}/worklog/{id}
+"""
+
+import dataclasses
+import datetime
+import json
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+from urllib.parse import parse_qs, urlparse
+
+API_PREFIX = "/rest/api/2/"
+ACCOUNT_ID = "benchmark-account"
+JIRA_DATETIME = "%Y-%m-%dT%H:%M:%S.000+0000"
+
+ROUTES: list[tuple[str, re.Pattern]] = [
+    (name, re.compile(pattern))
+    for name, pattern in [
+        ("serverInfo", r"^serverInfo$"),
+        ("field", r"^field$"),
+        ("myself", r"^myself$"),
+        ("search", r"^search$"),
+        ("issue", r"^issue/(?P<key>[^/]+)$"),
+        ("worklogs", r"^issue/(?P<key>[^/]+)/worklog$"),
+        ("worklog", r"^issue/(?P<key>[^/]+)/worklog/(?P<id>[^/]+)$"),
+    ]
+]
+
+
+@dataclasses.dataclass
+class FaultConfig:
+    """Latency and failures injected in the responses.
+
+    Parameters:
+    latency_ms (float): Fixed delay of every response.
+    jitter_ms (float): Uniformly distributed extra delay.
+    error_rate (float): Probability of an HTTP 500 response.
+    rate_limit_rate (float): Probability of an HTTP 429 response.
+    retry_after (int): Retry-After header of the HTTP 429 responses, in seconds.
+    closed_ratio (float): Fraction of the issues closed during the benchmark month.
+    """
+
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: int = 1
+    closed_ratio: float = 0.0
+
+
+class FakeJiraState:
+    """Issues, worklogs and request counters of the fake server."""
+
+    def __init__(self, faults: FaultConfig, closed_on: datetime.date, seed: int = 0):
+        self.faults: FaultConfig = faults
+        self._closed_on: datetime.date = closed_on
+        self._random = random.Random(seed)
+        self._worklogs: dict[str, list[dict[str, Any]]] = defaultdict(list)
+        self._closed: dict[str, bool] = {}
+        self._next_worklog_id = 1
+        self._lock = threading.Lock()
+
+        self.requests: dict[str, int] = defaultdict(int)
+        self.statuses: dict[str, int] = defaultdict(int)
+        self.bytes_sent = 0
+
+    def counters(self) -> dict[str, Any]:
+        """Return a copy of the request counters."""
+        with self._lock:
+            return {
+                "requests": dict(self.requests),
+                "statuses": dict(self.statuses),
+                "bytes_sent": self.bytes_sent,
+            }
+
+    def count(self, endpoint: str, status: int, size: int) -> None:
+        with self._lock:
+            self.requests[endpoint] += 1
+            self.statuses[str(status)] += 1
+            self.bytes_sent += size
+
+    def injected_fault(self) -> Optional[int]:
+        """Return the status code of an injected failure, if any."""
+        with self._lock:
+            draw: float = self._random.random()
+        if draw < self.faults.rate_limit_rate:
+            return 429
+        if draw < self.faults.rate_limit_rate + self.faults.error_rate:
+            return 500
+        return None
+
+    def delay(self) -> float:
+        with self._lock:
+            jitter: float = self._random.uniform(0, self.faults.jitter_ms)
+        return (self.faults.latency_ms + jitter) / 1000
+
+    def _is_closed(self, key: str) -> bool:
+        if key not in self._closed:
+            self._closed[key] = self._random.random() < self.faults.closed_ratio
+        return self._closed[key]
+
+    def histories(self, key: str) -> list[dict[str, Any]]:
+        if not self._is_closed(key):
+            return []
+        return [
+            {
+                "id": "1",
+                "created": datetime.datetime.combine(
+                    self._closed_on, datetime.time(12)
+                ).strftime(JIRA_DATETIME),
+                "items": [
+                    {"field": "status", "fromString": "Open", "toString": "Closed"}
+                ],
+            }
+        ]
+
+    def issue(self, base_url: str, key: str, changelog: bool) -> dict[str, Any]:
+        with self._lock:
+            worklogs: list[dict[str, Any]] = list(self._worklogs[key])
+            histories: list[dict[str, Any]] = self.histories(key)
+
+        issue: dict[str, Any] = {
+            "id": key,
+            "key": key,
+            "self": f"{base_url}issue/{key}",
+            "fields": {
+                "worklog": {
+                    "startAt": 0,
+                    "maxResults": 20,
+                    "total": len(worklogs),
+                    "worklogs": worklogs[:20],
+                }
+            },
+        }
+        if changelog:
+            issue["changelog"] = {
+                "startAt": 0,
+                "maxResults": 100,
+                "total": len(histories),
+                "histories": histories,
+            }
+        return issue
+
+    def worklogs(self, key: str) -> list[dict[str, Any]]:
+        with self._lock:
+            return list(self._worklogs[key])
+
+    def find_worklog(self, key: str, worklog_id: str) -> Optional[dict[str, Any]]:
+        with self._lock:
+            return next((w for w in self._worklogs[key] if w["id"] == worklog_id), None)
+
+    def add_worklog(
+        self, base_url: str, key: str, body: dict[str, Any]
+    ) -> dict[str, Any]:
+        with self._lock:
+            worklog_id = str(self._next_worklog_id)
+            self._next_worklog_id += 1
+            worklog: dict[str, Any] = {
+                "self": f"{base_url}issue/{key}/worklog/{worklog_id}",
+                "id": worklog_id,
+                "issueId": key,
+                "author": {"accountId": ACCOUNT_ID, "displayName": "Benchmark"},
+                "started": body.get("started")
+                or datetime.datetime.utcnow().strftime(JIRA_DATETIME),
+                "timeSpentSeconds": int(body.get("timeSpentSeconds", 0)),
+            }
+            self._worklogs[key].append(worklog)
+        return worklog
+
+    def update_worklog(self, worklog: dict[str, Any], body: dict[str, Any]) -> None:
+        with self._lock:
+            if "timeSpentSeconds" in body:
+                worklog["timeSpentSeconds"] = int(body["timeSpentSeconds"])
+
+    def delete_worklog(self, key: str, worklog_id: str) -> None:
+        with self._lock:
+            self._worklogs[key] = [
+                w for w in self._worklogs[key] if w["id"] != worklog_id
+            ]
+
+
+class FakeJiraHandler(BaseHTTPRequestHandler):
+    # Keep-alive connections, as the Jira session pools them
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def state(self) -> FakeJiraState:
+        return self.server.state
+
+    def log_message(self, format, *args) -> None:
+        # Keep the benchmark output clean
+        pass
+
+    def _send(self, endpoint: str, status: int, payload: Any = None) -> None:
+        body: bytes = b"" if payload is None else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 429:
+            self.send_header("Retry-After", str(self.state.faults.retry_after))
+        self.end_headers()
+        self.wfile.write(body)
+        self.state.count(f"{self.command} {endpoint}", status, len(body))
+
+    def _handle(self) -> None:
+        url = urlparse(self.path)
+        query: dict[str, list[str]] = parse_qs(url.query)
+        length = int(self.headers.get("Content-Length") or 0)
+        body: dict[str, Any] = json.loads(self.rfile.read(length) or b"{}")
+
+        if not url.path.startswith(API_PREFIX):
+            return self._send(url.path, 404, {"errorMessages": ["Not found"]})
+        path: str = url.path[len(API_PREFIX) :]
+        endpoint, match = next(
+            ((name, m) for name, pattern in ROUTES if (m := pattern.match(path))),
+            (path, None),
+        )
+        if match is None:
+            return self._send(endpoint, 404, {"errorMessages": ["Not found"]})
+
+        time.sleep(self.state.delay())
+        fault: Optional[int] = self.state.injected_fault()
+        if fault is not None:
+            return self._send(endpoint, fault, {"errorMessages": ["Injected fault"]})
+
+        base_url: str = f"http://{self.headers['Host']}{API_PREFIX}"
+        key: str = match.groupdict().get("key", "")
+        expand: str = ",".join(query.get("expand", []))
+
+        if endpoint == "serverInfo":
+            return self._send(
+                endpoint,
+                200,
+                {
+                    "baseUrl": base_url,
+                    "version": "1001.0.0",
+                    "versionNumbers": [1001, 0, 0],
+                    "deploymentType": "Cloud",
+                },
+            )
+        if endpoint == "field":
+            return self._send(endpoint, 200, [])
+        if endpoint == "myself":
+            return self._send(
+                endpoint, 200, {"accountId": ACCOUNT_ID, "displayName": "Benchmark"}
+            )
+        if endpoint == "search":
+            jql: str = query.get("jql", [""])[0]
+            keys_match = re.search(r"key in \(([^)]*)\)", jql)
+            keys: list[str] = (
+                [k.strip() for k in keys_match.group(1).split(",")]
+                if keys_match
+                else []
+            )
+            issues = [
+                self.state.issue(base_url, k, "changelog" in expand) for k in keys
+            ]
+            return self._send(
+                endpoint,
+                200,
+                {
+                    "startAt": 0,
+                    "maxResults": max(len(issues), 50),
+                    "total": len(issues),
+                    "issues": issues,
+                },
+            )
+        if endpoint == "issue":
+            return self._send(
+                endpoint, 200, self.state.issue(base_url, key, "changelog" in expand)
+            )
+        if endpoint == "worklogs":
+            if self.command == "POST":
+                return self._send(
+                    endpoint, 201, self.state.add_worklog(base_url, key, body)
+                )
+            worklogs: list[dict[str, Any]] = self.state.worklogs(key)
+            return self._send(
+                endpoint,
+                200,
+                {
+                    "startAt": 0,
+                    "maxResults": len(worklogs),
+                    "total": len(worklogs),
+                    "worklogs": worklogs,
+                },
+            )
+
+        # A single worklog
+        worklog: Optional[dict[str, Any]] = self.state.find_worklog(key, match["id"])
+        if worklog is None:
+            return self._send(endpoint, 404, {"errorMessages": ["No worklog"]})
+        if self.command == "PUT":
+            self.state.update_worklog(worklog, body)
+        elif self.command == "DELETE":
+            self.state.delete_worklog(key, match["id"])
+            return self._send(endpoint, 204)
+        return self._send(endpoint, 200, worklog)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+
+class FakeJiraServer:
+    """Fake Jira served by a background thread, usable as a context manager.
+
+    Parameters:
+    faults (FaultConfig): Latency and failures to inject.
+    closed_on (datetime.date): Date on which the closed issues were closed.
+    seed (int): Seed of the injected faults and closed issues.
+    """
+
+    def __init__(
+        self,
+        faults: Optional[FaultConfig] = None,
+        closed_on: datetime.date = datetime.date(2024, 1, 15),
+        seed: int = 0,
+    ):
+        self.state = FakeJiraState(faults or FaultConfig(), closed_on, seed)
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), FakeJiraHandler)
+        self._server.daemon_threads = True
+        self._server.state = self.state
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeJiraServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeJiraServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
@@ -0,0 +1,287 @@
+"""Benchmark the worklog loading pipeline against a local fake Jira.
+
+Generates a synthetic report (rows x days x users) and jira map, starts the
+fake Jira server and runs every phase of `load_worklog` for each user, then
+prints wall time, requests by endpoint and peak traced memory per phase.
+
+Usage:
+    python benchmarks/load_worklog.py --users 4 --rows 40 --days 366 --issues 30 \\
+        --latency-ms 50 --rate-limit-rate 0.02 [--runs 2] [--output results.json]
+
+The second and later runs log the same month again, measuring a re-run where
+every worklog already exists. Memory tracing slows the parsing phases down,
+disable it with --no-memory when comparing wall times.
+
+The client is built as by the application. Every HTTP 429 served while posting
+must reach the worklog writer and lower its concurrency limit, otherwise the
+benchmark fails.
+"""
+
+import argparse
+import contextlib
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+ROOT_DIR: Path = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+
+import jira_log_manager as jm  # noqa: E402
+from constants import JIRA_REQUESTS_PER_SECOND  # noqa: E402
+from fake_jira import FakeJiraServer, FaultConfig  # noqa: E402
+from issue_state import IssueStateCache  # noqa: E402
+from jira_client import PooledJIRA  # noqa: E402
+from progress import ProgressReporter  # noqa: E402
+from worklog_ledger import WorklogLedger  # noqa: E402
+from worklog_plan import build_worklog_plan  # noqa: E402
+from worklog_writer import WorklogWriter  # noqa: E402
+from workbooks import generate_jira_map, generate_report, user_names  # noqa: E402
+
+PHASES: list[str] = [
+    "parse map",
+    "parse report",
+    "select month",
+    "fetch",
+    "decide",
+    "post",
+]
+
+
+class PhaseRecorder:
+    """Accumulate wall time, requests and peak memory of the pipeline phases."""
+
+    def __init__(self, server: FakeJiraServer, trace_memory: bool):
+        self._server: FakeJiraServer = server
+        self._trace_memory: bool = trace_memory
+        self.results: dict[str, dict[str, Any]] = defaultdict(
+            lambda: {"wall_s": 0.0, "requests": defaultdict(int), "peak_mb": 0.0}
+        )
+        # Responses by status code of the last phase
+        self.last_statuses: dict[str, int] = {}
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        before: dict[str, Any] = self._server.state.counters()
+        if self._trace_memory:
+            tracemalloc.reset_peak()
+        start: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            result: dict[str, Any] = self.results[name]
+            result["wall_s"] += time.perf_counter() - start
+            after: dict[str, Any] = self._server.state.counters()
+            self.last_statuses = {
+                status: count - before["statuses"].get(status, 0)
+                for status, count in after["statuses"].items()
+            }
+            for endpoint, count in after["requests"].items():
+                delta: int = count - before["requests"].get(endpoint, 0)
+                if delta:
+                    result["requests"][endpoint] += delta
+            if self._trace_memory:
+                peak_mb: float = tracemalloc.get_traced_memory()[1] / 2**20
+                result["peak_mb"] = max(result["peak_mb"], peak_mb)
+
+
+def parse_arguments(args: Optional[list[str]] = None) -> argparse.Namespace:
+    """Parse command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark the worklog loading against a local fake Jira."
+    )
+    parser.add_argument("--users", type=int, default=2, help="Sheets of the report.")
+    parser.add_argument("--rows", type=int, default=40, help="Task rows per sheet.")
+    parser.add_argument("--days", type=int, default=366, help="Daily columns.")
+    parser.add_argument("--issues", type=int, default=30, help="Distinct issues.")
+    parser.add_argument("--month", type=int, default=3, help="The month to log.")
+    parser.add_argument("--fill-ratio", type=float, default=0.3)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--closed-ratio", type=float, default=0.1)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=JIRA_REQUESTS_PER_SECOND[0],
+        help="Client-side requests per second. (default: the Cloud limit)",
+    )
+    parser.add_argument("--runs", type=int, default=1, help="Runs of the same month.")
+    parser.add_argument(
+        "--ledger", action="store_true", help="Use a worklog ledger in a temp dir."
+    )
+    parser.add_argument(
+        "--no-memory",
+        dest="trace_memory",
+        action="store_false",
+        help="Do not trace the peak memory of each phase.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    return parser.parse_args(args)
+
+
+def check_backoff(writer: WorklogWriter, served_429: int, workers: int) -> None:
+    """Fail if the writer did not see the 429 served, or did not slow down on them."""
+    if writer.rate_limited < served_429:
+        raise RuntimeError(
+            f"{served_429} HTTP 429 served, {writer.rate_limited} seen by the writer: "
+            "the session retried them itself"
+        )
+    if served_429 and workers > 1 and writer.lowest_concurrency_limit >= workers:
+        raise RuntimeError("HTTP 429 received without lowering the concurrency limit")
+
+
+def run_user(
+    jira: PooledJIRA,
+    recorder: PhaseRecorder,
+    report_path: Path,
+    map_path: Path,
+    user: str,
+    args: argparse.Namespace,
+    ledger: Optional[WorklogLedger],
+) -> dict[str, int]:
+    with recorder.phase("parse map"):
+        jira_map = jm.load_jira_map(map_path)
+    with recorder.phase("parse report"):
+        df = jm.load_excel_report(report_path, user)
+    with recorder.phase("select month"):
+        df_month_to_log = jm.select_month_to_log(df, jira_map, args.month)
+
+    with recorder.phase("fetch"):
+        author_id: str = jm.get_author_id(jira)
+        issue_state = IssueStateCache(jira, ledger)
+        issue_state.prefetch(
+            jm.collect_issue_keys(jira_map[jira_map.index.isin(df_month_to_log.index)])
+        )
+    with recorder.phase("decide"):
+        plan = build_worklog_plan(
+            df_month_to_log, jira_map, issue_state, author_id, user, args.month
+        )
+    writer = WorklogWriter(jira, issue_state, args.workers, args.rate)
+    with recorder.phase("post"):
+        counts: dict[str, int] = jm.apply_worklog_plan(
+            jira,
+            plan,
+            ProgressReporter(),
+            max_workers=args.workers,
+            issue_state=issue_state,
+            writer=writer,
+        )
+    check_backoff(writer, recorder.last_statuses.get("429", 0), args.workers)
+    return {**plan.summary(), **counts, "rate limited": writer.rate_limited}
+
+
+def main(args: Optional[list[str]] = None) -> None:
+    parsed_args: argparse.Namespace = parse_arguments(args)
+    users: list[str] = user_names(parsed_args.users)
+    faults = FaultConfig(
+        latency_ms=parsed_args.latency_ms,
+        jitter_ms=parsed_args.jitter_ms,
+        error_rate=parsed_args.error_rate,
+        rate_limit_rate=parsed_args.rate_limit_rate,
+        retry_after=parsed_args.retry_after,
+        closed_ratio=parsed_args.closed_ratio,
+    )
+
+    with tempfile.TemporaryDirectory() as temp_dir, FakeJiraServer(
+        faults, seed=parsed_args.seed
+    ) as server:
+        report_path = Path(temp_dir) / "report.xlsx"
+        map_path = Path(temp_dir) / "map.xlsx"
+        generate_started: float = time.perf_counter()
+        generate_report(
+            report_path,
+            users,
+            parsed_args.rows,
+            parsed_args.days,
+            fill_ratio=parsed_args.fill_ratio,
+            seed=parsed_args.seed,
+        )
+        generate_jira_map(
+            map_path, parsed_args.rows, parsed_args.issues, seed=parsed_args.seed
+        )
+        print(
+            f"Generated {parsed_args.users} user(s) x {parsed_args.rows} rows x "
+            f"{parsed_args.days} days in {time.perf_counter() - generate_started:.1f}s"
+        )
+
+        jira = PooledJIRA(
+            server=server.url,
+            basic_auth=("benchmark", "token"),
+            pool_maxsize=parsed_args.workers,
+        )
+        ledger: Optional[WorklogLedger] = (
+            WorklogLedger(Path(temp_dir) / "ledger.sqlite3")
+            if parsed_args.ledger
+            else None
+        )
+
+        if parsed_args.trace_memory:
+            tracemalloc.start()
+
+        runs: list[dict[str, Any]] = []
+        for run in range(1, parsed_args.runs + 1):
+            recorder = PhaseRecorder(server, parsed_args.trace_memory)
+            run_started: float = time.perf_counter()
+            outcomes: dict[str, dict[str, int]] = {
+                user: run_user(
+                    jira, recorder, report_path, map_path, user, parsed_args, ledger
+                )
+                for user in users
+            }
+            runs.append(
+                {
+                    "run": run,
+                    "wall_s": time.perf_counter() - run_started,
+                    "phases": {
+                        phase: recorder.results[phase]
+                        for phase in PHASES
+                        if phase in recorder.results
+                    },
+                    "outcomes": outcomes,
+                }
+            )
+            print_run(runs[-1])
+
+        if ledger is not None:
+            ledger.close()
+
+    if parsed_args.output:
+        with open(parsed_args.output, "w", encoding="utf-8") as file:
+            json.dump({"arguments": vars(parsed_args), "runs": runs}, file, indent=1)
+
+
+def print_run(run: dict[str, Any]) -> None:
+    print(f"\nRun {run['run']}: {run['wall_s']:.2f}s")
+    print(f"{'phase':<14}{'wall s':>9}{'peak MB':>9}  requests")
+    for phase, result in run["phases"].items():
+        requests: str = ", ".join(
+            f"{endpoint} {count}"
+            for endpoint, count in sorted(result["requests"].items())
+        )
+        print(
+            f"{phase:<14}{result['wall_s']:>9.3f}{result['peak_mb']:>9.1f}  {requests}"
+        )
+
+    totals: dict[str, int] = defaultdict(int)
+    for outcome in run["outcomes"].values():
+        for key, value in outcome.items():
+            totals[key] += value
+    print("Outcome: " + ", ".join(f"{key} {value}" for key, value in totals.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Benchmark the root CA lookup of the certificate chain downloader.
+
+Compares, on a PEM bundle such as the ~150 certificates cacert.pem of curl:
+- the former lookup, which parsed the bundle line by line and decoded every
+  root again to compare its SKI, for each certificate without AIA;
+- building the indexed store from the PEM, from its disk cache and the lookups
+  in the store once loaded.
+
+Usage:
+    python benchmarks/root_ca_store.py [--bundle cacert.pem] [--lookups 20] [--repeat 5]
+
+Without --bundle, the certifi bundle is used if installed.
+"""
+
+import argparse
+import re
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+ROOT_DIR: Path = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from cryptography import x509  # noqa: E402
+from cryptography.x509.oid import ExtensionOID  # noqa: E402
+
+from get_certificate_chain_download import RootCAStore  # noqa: E402
+
+
+def parse_arguments(args: Optional[list[str]] = None) -> argparse.Namespace:
+    """Parse command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark the root CA lookup against a PEM bundle."
+    )
+    parser.add_argument("--bundle", help="The PEM bundle. (default: certifi)")
+    parser.add_argument("--lookups", type=int, default=20, help="Roots looked up.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions.")
+    return parser.parse_args(args)
+
+
+def legacy_load(ca_cert_text: str) -> dict[str, str]:
+    # The parser replaced by RootCAStore, PEM text by subject
+    ca_root_store: dict[str, str] = {}
+    lines: list[str] = ca_cert_text.splitlines()
+    index = 0
+    while index < len(lines):
+        if re.search(r"^\={5,}", lines[index]):
+            root_ca_cert = ""
+            index += 1
+            while index < len(lines) and not re.search(
+                r"^-----END CERTIFICATE-----", lines[index]
+            ):
+                root_ca_cert += lines[index] + "\n"
+                index += 1
+            root_ca_cert += lines[index] + "\n"
+            index += 1
+            cert = x509.load_pem_x509_certificate(root_ca_cert.encode())
+            ca_root_store[cert.subject.rfc4514_string()] = root_ca_cert
+        else:
+            index += 1
+    return ca_root_store
+
+
+def legacy_lookup(bundle: Path, aki: bytes) -> Optional[x509.Certificate]:
+    # Load the bundle and decode every root until the SKI matches
+    with open(bundle) as file:
+        ca_root_store: dict[str, str] = legacy_load(file.read())
+    for pem in ca_root_store.values():
+        cert = x509.load_pem_x509_certificate(pem.encode("ascii"))
+        try:
+            ski: bytes = cert.extensions.get_extension_for_oid(
+                ExtensionOID.SUBJECT_KEY_IDENTIFIER
+            ).value.digest
+        except x509.ExtensionNotFound:
+            continue
+        if ski == aki:
+            return cert
+    return None
+
+
+def timed(function: Callable[[], object], repeat: int) -> float:
+    """Return the median wall time of a function in milliseconds."""
+    samples: list[float] = []
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main(args: Optional[list[str]] = None) -> None:
+    parsed_args: argparse.Namespace = parse_arguments(args)
+    if parsed_args.bundle:
+        bundle = Path(parsed_args.bundle)
+    else:
+        import certifi
+
+        bundle = Path(certifi.where())
+    pem_data: bytes = bundle.read_bytes()
+
+    certificates: list[x509.Certificate] = x509.load_pem_x509_certificates(pem_data)
+    # Self-signed roots: their AKI is their SKI
+    targets: list[bytes] = []
+    for cert in certificates:
+        try:
+            targets.append(
+                cert.extensions.get_extension_for_oid(
+                    ExtensionOID.SUBJECT_KEY_IDENTIFIER
+                ).value.digest
+            )
+        except x509.ExtensionNotFound:
+            pass
+    step: int = max(1, len(targets) // parsed_args.lookups)
+    targets = targets[::step][: parsed_args.lookups]
+    print(f"{bundle}: {len(certificates)} certificates, {len(targets)} lookups")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        results: dict[str, float] = {
+            "legacy, per lookup": timed(
+                lambda: legacy_lookup(bundle, targets[-1]), parsed_args.repeat
+            ),
+            "index from PEM": timed(
+                lambda: RootCAStore.from_pem(pem_data), parsed_args.repeat
+            ),
+        }
+        RootCAStore.from_file(bundle, cache_dir)
+        results["index from disk cache"] = timed(
+            lambda: RootCAStore.from_file(bundle, cache_dir), parsed_args.repeat
+        )
+
+        store: RootCAStore = RootCAStore.from_file(bundle, cache_dir)
+        for aki in targets:
+            assert store.find_by_ski(aki) is not None
+        results["indexed, per lookup"] = timed(
+            lambda: [store.find_by_ski(aki) for aki in targets], parsed_args.repeat
+        ) / len(targets)
+
+    for name, milliseconds in results.items():
+        print(f"{name:<24}{milliseconds:>12.4f} ms")
+
+
+if __name__ == "__main__":
+    main()
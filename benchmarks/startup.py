@@ -0,0 +1,145 @@
+"""Measure the startup time of the GUI.
+
+Every run starts the application in a fresh interpreter, so that imports are
+cold as in the frozen executable, and records:
+    first_frame      Seconds from the process launch to the first drawn frame.
+    token_validated  Seconds from the process launch to the end of the API token check.
+    heavy_modules    The heavy modules already imported when the first frame is drawn.
+
+Usage:
+    python benchmarks/startup.py [--runs N] [--output results.jsonl]
+
+A display is required. The token check contacts Jira with the configured token,
+so the second figure depends on the network too: compare runs made on the same
+machine and connection.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+ROOT_DIR: Path = Path(__file__).resolve().parent.parent
+
+# Modules that should not be imported before the first frame
+HEAVY_MODULES: list[str] = ["pandas", "openpyxl", "jira", "cryptography"]
+
+# Give up on a run whose token check does not complete
+RUN_TIMEOUT_SECONDS = 120
+
+
+def parse_arguments(args: Optional[list[str]] = None) -> argparse.Namespace:
+    """Parse command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Measure the startup time of the GUI.")
+    parser.add_argument(
+        "--runs",
+        dest="runs",
+        type=int,
+        default=5,
+        help="Number of application starts. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--output",
+        dest="output",
+        help="Append the results to this JSON lines file.",
+    )
+    # Internal: run the application in this process and report its timings
+    parser.add_argument("--child", dest="child", type=float, help=argparse.SUPPRESS)
+    return parser.parse_args(args)
+
+
+def run_child(launched_at: float) -> None:
+    """Start the application, print its timings as JSON and exit."""
+    sys.path.insert(0, str(ROOT_DIR))
+
+    from app_data import AppData
+    from app_gui import App
+    from app_logic import AppLogic
+
+    timings: dict[str, Any] = {}
+
+    app_data = AppData()
+    app_logic = AppLogic(app_data)
+    gui = App(app_data, app_logic)
+    window = gui._gui
+
+    def on_first_frame(event) -> None:
+        if "first_frame" in timings or event.widget is not window:
+            return
+        # The window is drawn by the idle tasks following its mapping
+        window.update_idletasks()
+        timings["first_frame"] = time.time() - launched_at
+        timings["heavy_modules"] = [
+            module for module in HEAVY_MODULES if module in sys.modules
+        ]
+
+    update_api_status_icon = gui.update_api_status_icon
+
+    def on_token_validated() -> None:
+        update_api_status_icon()
+        timings["token_validated"] = time.time() - launched_at
+        timings["token_valid"] = app_data.is_api_token_valid
+        window.after(0, window.destroy)
+
+    gui.update_api_status_icon = on_token_validated
+    window.bind("<Map>", on_first_frame, add="+")
+    # Stop a run whose token check hangs (destroy skips saving the configuration)
+    window.after(RUN_TIMEOUT_SECONDS * 1000, window.destroy)
+
+    window.mainloop()
+    print(json.dumps(timings))
+
+
+def run_once() -> dict[str, Any]:
+    """Start the application in a new interpreter and return its timings."""
+    launched_at: float = time.time()
+    output: str = subprocess.check_output(
+        [sys.executable, __file__, "--child", repr(launched_at)],
+        cwd=ROOT_DIR,
+        text=True,
+        timeout=RUN_TIMEOUT_SECONDS + 10,
+    )
+    return json.loads(output.splitlines()[-1])
+
+
+def summarize(results: list[dict[str, Any]], key: str) -> str:
+    values: list[float] = [result[key] for result in results if key in result]
+    if not values:
+        return f"{key}: not measured"
+    return (
+        f"{key}: median {statistics.median(values):.3f}s, "
+        f"min {min(values):.3f}s, max {max(values):.3f}s"
+    )
+
+
+def main(args: Optional[list[str]] = None) -> None:
+    parsed_args: argparse.Namespace = parse_arguments(args)
+    if parsed_args.child is not None:
+        run_child(parsed_args.child)
+        return
+
+    results: list[dict[str, Any]] = []
+    for run in range(1, parsed_args.runs + 1):
+        result: dict[str, Any] = run_once()
+        results.append(result)
+        print(f"Run {run}: {json.dumps(result)}")
+
+    print(summarize(results, "first_frame"))
+    print(summarize(results, "token_validated"))
+
+    if parsed_args.output:
+        with open(parsed_args.output, "a", encoding="utf-8") as file:
+            for result in results:
+                file.write(json.dumps({"time": time.time(), **result}) + "\n")
+
+
+if __name__ == "__main__":
+    main()
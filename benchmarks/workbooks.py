@@ -0,0 +1,117 @@
+"""Synthetic Excel report and jira map, laid out as the real ones."""
+
+import datetime
+import random
+from pathlib import Path
+from typing import Union
+
+import openpyxl
+
+# Hours of a filled report cell
+HOURS_CHOICES: list[float] = [0.5, 1, 2, 4, 8]
+
+
+def user_names(count: int) -> list[str]:
+    return [f"User {index:03d}" for index in range(count)]
+
+
+def row_keys(rows: int) -> list[tuple[str, str, str]]:
+    """Return the (project, activity, task) of each report row, 4 tasks per project."""
+    return [(f"P{row // 4}", f"A{row // 2}", f"T{row}") for row in range(rows)]
+
+
+def generate_report(
+    path: Union[str, Path],
+    users: list[str],
+    rows: int,
+    days: int,
+    year: int = 2024,
+    fill_ratio: float = 0.3,
+    seed: int = 0,
+) -> None:
+    """Write a report with a sheet per user, `rows` tasks and `days` daily columns.
+
+    Parameters:
+    path (Union[str, Path]): The workbook to write.
+    users (list[str]): The sheet names.
+    rows (int): The task rows of each sheet.
+    days (int): The daily columns, starting from the 1st of January.
+    year (int): The year of the daily columns.
+    fill_ratio (float): Probability of a cell to have hours.
+    seed (int): Seed of the random hours.
+    """
+    generator = random.Random(seed)
+    dates: list[datetime.datetime] = [
+        datetime.datetime(year, 1, 1) + datetime.timedelta(days=day)
+        for day in range(days)
+    ]
+
+    # The write-only workbook streams the rows, so large reports fit in memory
+    workbook = openpyxl.Workbook(write_only=True)
+    for user in users:
+        sheet = workbook.create_sheet(user)
+        sheet.append([f"Timesheet {user}"])
+        # Header on the second row, then 5 rows of summaries before the tasks
+        sheet.append([None, "Project", "Activity", "Task", *dates, "TOTALE"])
+        for summary_row in range(5):
+            sheet.append([None, None, None, None, f"summary {summary_row}"])
+
+        for row, (project, activity, task) in enumerate(row_keys(rows)):
+            hours: list[Union[None, float]] = [
+                (
+                    generator.choice(HOURS_CHOICES)
+                    if generator.random() < fill_ratio
+                    else None
+                )
+                for _ in dates
+            ]
+            sheet.append(
+                [
+                    None,
+                    # Merged-looking cells: only the first row of a group is filled
+                    project if row % 4 == 0 else None,
+                    activity if row % 2 == 0 else None,
+                    task,
+                    *hours,
+                    sum(hour for hour in hours if hour),
+                ]
+            )
+
+    workbook.save(path)
+
+
+def generate_jira_map(
+    path: Union[str, Path],
+    rows: int,
+    issues: int,
+    multi_issue_ratio: float = 0.1,
+    seed: int = 0,
+) -> None:
+    """Write a jira map linking the report rows to `issues` issue keys.
+
+    Parameters:
+    path (Union[str, Path]): The workbook to write.
+    rows (int): The task rows of the report.
+    issues (int): The number of distinct issue keys.
+    multi_issue_ratio (float): Fraction of rows mapped to two issues.
+    seed (int): Seed of the mapping.
+    """
+    generator = random.Random(seed)
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("Map")
+    sheet.append(["Project", "Activity", "Task", "Jira"])
+    for row, (project, activity, task) in enumerate(row_keys(rows)):
+        issue_keys: list[str] = [f"BENCH-{generator.randrange(issues)}"]
+        if generator.random() < multi_issue_ratio:
+            issue_keys.append(f"BENCH-{generator.randrange(issues)}")
+        sheet.append(
+            [
+                project if row % 4 == 0 else None,
+                activity if row % 2 == 0 else None,
+                task,
+                ",".join(dict.fromkeys(issue_keys)),
+            ]
+        )
+
+    workbook.save(path)
@@ -8,8 +8,8 @@ CONFIG_FILE_PATH: str = working_dir / "resources/config.json"
 JIRA_ICON_PATH: str = working_dir / "resources/jira_logo.ico"
 CHECK_ICON_PATH: str = working_dir / "resources/check.png"
 CROSS_ICON_PATH: str = working_dir / "resources/cross.png"
-CLOUD_CA_CERT_PATH: str = working_dir / "resources\Forcepoint Cloud CA.cer"
-SELF_HOSTED_CA_CERT_PATH: str = working_dir / "resources\Brembo Root CA.crt"
+CLOUD_CA_CERT_PATH: str = working_dir / "resources/Forcepoint Cloud CA.cer"
+SELF_HOSTED_CA_CERT_PATH: str = working_dir / "resources/Brembo Root CA.crt"
 
 
 MONTHS: dict[str, int] = {
@@ -28,7 +28,17 @@ MONTHS: dict[str, int] = {
 }
 
 
-TEMP_FOLDER_NAME = "jira_worklog_temp"
+# Log file of the GUI, and refresh interval and size of its log box
+LOG_FILE_PATH = "issue_not_map.log"
+LOG_BOX_POLL_MS = 100
+LOG_BOX_MAX_LINES = 2000
+# Interval between two progress events of a phase in the GUI, and in the CLI
+PROGRESS_MIN_INTERVAL_S = 0.1
+CONSOLE_PROGRESS_MIN_INTERVAL_S = 1.0
+PROGRESS_POLL_MS = 100
+# Longest wait for the login of the API token check, and its polling by the GUI
+TOKEN_CHECK_TIMEOUT_S = 15
+TOKEN_CHECK_POLL_MS = 100
 
 JIRA_MODE: dict[int, str] = {
     0: "Cloud",  # Default choice
@@ -37,3 +47,47 @@ JIRA_MODE: dict[int, str] = {
 
 # Constants
 HOUR_TO_SECONDS = 3600
+
+# Timestamp format of the "created"/"started" fields returned by the Jira REST API
+JIRA_DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f%z"
+
+# Issue keys per "key in (...)" JQL search, matching the default page size of the search endpoint
+JQL_KEYS_CHUNK_SIZE = 50
+
+# Concurrent worklog posting
+DEFAULT_MAX_WORKERS = 4
+MAX_RATE_LIMIT_RETRIES = 5
+JIRA_REQUESTS_PER_SECOND: dict[int, float] = {
+    0: 10.0,  # Cloud
+    1: 5.0,  # Self-Hosted
+}
+
+# Local data of the tool (caches, ledgers)
+LOCAL_DATA_DIR: Path = Path.home() / ".jira_worklog"
+WORKBOOK_CACHE_DIR: Path = LOCAL_DATA_DIR / "workbook_cache"
+WORKBOOK_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Part of the key of the cached workbooks: bump it when a parser or its output changes
+WORKBOOK_CACHE_VERSION = 1
+WORKLOG_LEDGER_PATH: Path = LOCAL_DATA_DIR / "worklog_ledger.sqlite3"
+# Request counters and latencies of the last run
+JIRA_METRICS_PATH: Path = LOCAL_DATA_DIR / "jira_metrics.json"
+# Profiles of the pipeline stages, a directory per run
+PROFILES_DIR: Path = LOCAL_DATA_DIR / "profiles"
+PROFILE_TOP_N = 25
+# Checkpoint journals of the runs not completed yet, a file per run inputs
+JOURNALS_DIR: Path = LOCAL_DATA_DIR / "journals"
+JOURNAL_SYNC_EVERY = 25
+# Root CA bundle of curl, downloaded on first use to find the root CA of the
+# chains without AIA
+ROOT_CA_BUNDLE_PATH: Path = LOCAL_DATA_DIR / "cacert.pem"
+ROOT_CA_BUNDLE_URL = "https://curl.se/ca/cacert.pem"
+# Indexes of the root CA bundles, by bundle hash
+ROOT_CA_STORE_CACHE_DIR: Path = LOCAL_DATA_DIR / "root_ca_store"
+# Intermediate certificates downloaded from AIA URIs, kept until they expire
+INTERMEDIATE_CERT_CACHE_DIR: Path = LOCAL_DATA_DIR / "intermediate_certs"
+AIA_FETCH_TIMEOUT_S = 10
+AIA_FETCH_MAX_WORKERS = 4
+# Hosts whose chains are downloaded concurrently
+CHAIN_DOWNLOAD_MAX_WORKERS = 8
+# Issues synced with Jira more recently than this are not fetched again
+DEFAULT_LEDGER_TTL_HOURS = 12
@@ -12,3 +12,8 @@ class NetworkConnectionError(JiraConnectionError):
 class AIAError(NetworkConnectionError):
     def __init__(self, message):
         super().__init__(message)
+
+
+class RunCancelledError(Exception):
+    def __init__(self, message="The run was cancelled"):
+        super().__init__(message)
@@ -10,25 +10,46 @@ and save them as PEM files as well.
 # Standard library imports
 # Third-party library imports
 import argparse
+import base64
+import datetime
+import hashlib
+import json
 import logging
 import os
 import re
 import socket
 import ssl
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from typing import Any, Dict, List, Optional, Union
 from urllib.error import HTTPError, URLError
 from urllib.request import urlopen
 
 from cryptography import x509
+from cryptography.exceptions import InvalidSignature
 from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.x509.oid import ExtensionOID
 
 import custom_exceptions as ce
-
-VERSION = "0.1.8"
+from constants import (
+    AIA_FETCH_MAX_WORKERS,
+    AIA_FETCH_TIMEOUT_S,
+    CHAIN_DOWNLOAD_MAX_WORKERS,
+    INTERMEDIATE_CERT_CACHE_DIR,
+    ROOT_CA_BUNDLE_PATH,
+    ROOT_CA_BUNDLE_URL,
+    ROOT_CA_STORE_CACHE_DIR,
+)
+
+VERSION = "0.3.0"
 CERT_CHAIN = []
+CHAIN_FILE_NAME = "Forcepoint Cloud CA.crt"
+MANIFEST_FILE_NAME = "manifest.json"
+ROOT_CA_STORE_CACHE_VERSION = 1
 
 
 # parse arguments
@@ -53,6 +74,24 @@ def parse_arguments(args: Optional[List[str]] = None) -> argparse.Namespace:
         default="www.google.com",
         help="The host to connect to. (default: %(default)s)",
     )
+    parser.add_argument(
+        "--hosts",
+        dest="hosts",
+        nargs="+",
+        help="Download the chains of several hosts concurrently, each in its own folder.",
+    )
+    parser.add_argument(
+        "--hosts-file",
+        dest="hosts_file",
+        help="A file with a host per line, as --hosts. Lines starting with # are skipped.",
+    )
+    parser.add_argument(
+        "--workers",
+        dest="workers",
+        type=int,
+        default=CHAIN_DOWNLOAD_MAX_WORKERS,
+        help="Hosts resolved concurrently with --hosts or --hosts-file. (default: %(default)s)",
+    )
     parser.add_argument(
         "--log-level",
         dest="log_level",
@@ -72,13 +111,352 @@ def parse_arguments(args: Optional[List[str]] = None) -> argparse.Namespace:
         action="store_true",
         help="Remove the cert files in current directory (*.crt, *.pem).",
     )
+    parser.add_argument(
+        "--no-aia-cache",
+        dest="aia_cache",
+        action="store_false",
+        help="Download the intermediate certificates even if cached.",
+    )
     return parser.parse_args()
 
 
+class RootCAStore:
+    """Root CA certificates of a PEM bundle, indexed by Subject Key Identifier and subject.
+
+    The bundle is parsed once, then the index (SKI, subject and DER of every
+    certificate) is kept in a disk cache named by the hash of the bundle, so the
+    next processes only decode the certificates they actually look up.
+
+    Args:
+        entries (List[Dict[str, Any]]): The "subject", "ski" (hex, None if missing)
+            and "der" (bytes) of each certificate.
+    """
+
+    def __init__(self, entries: List[Dict[str, Any]]):
+        self._entries: List[Dict[str, Any]] = entries
+        self._by_ski: Dict[bytes, int] = {}
+        self._by_subject: Dict[str, int] = {}
+        for index, entry in enumerate(entries):
+            if entry["ski"] is not None:
+                self._by_ski.setdefault(bytes.fromhex(entry["ski"]), index)
+            self._by_subject.setdefault(entry["subject"], index)
+        self._certificates: Dict[int, x509.Certificate] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @classmethod
+    def from_pem(cls, pem_data: bytes) -> "RootCAStore":
+        """Parse a PEM bundle, e.g. the cacert.pem of curl.
+
+        Args:
+            pem_data (bytes): The concatenated PEM certificates.
+
+        Returns:
+            RootCAStore: The indexed certificates.
+        """
+        certificates: List[x509.Certificate] = x509.load_pem_x509_certificates(pem_data)
+        entries: List[Dict[str, Any]] = []
+        for cert in certificates:
+            try:
+                ski: Optional[str] = cert.extensions.get_extension_for_oid(
+                    ExtensionOID.SUBJECT_KEY_IDENTIFIER
+                ).value.digest.hex()
+            except x509.ExtensionNotFound:
+                ski = None
+            entries.append(
+                {
+                    "subject": cert.subject.rfc4514_string(),
+                    "ski": ski,
+                    "der": cert.public_bytes(serialization.Encoding.DER),
+                }
+            )
+
+        store = cls(entries)
+        # The certificates are already decoded, keep them
+        store._certificates = dict(enumerate(certificates))
+        return store
+
+    @classmethod
+    def from_file(
+        cls, filename: Union[str, Path], cache_dir: Union[None, str, Path] = None
+    ) -> "RootCAStore":
+        """Load a PEM bundle, reading its index from the disk cache if available.
+
+        Args:
+            filename (Union[str, Path]): The PEM bundle.
+            cache_dir (Union[None, str, Path], optional): The directory of the cached
+                indexes. Defaults to ROOT_CA_STORE_CACHE_DIR.
+
+        Returns:
+            RootCAStore: The indexed certificates.
+        """
+        with open(filename, "rb") as f_ca_cert:
+            pem_data: bytes = f_ca_cert.read()
+
+        cache_path: Path = Path(cache_dir or ROOT_CA_STORE_CACHE_DIR) / (
+            hashlib.sha256(pem_data).hexdigest() + ".json"
+        )
+        try:
+            with open(cache_path, encoding="utf-8") as f_cache:
+                cache: Dict[str, Any] = json.load(f_cache)
+            if cache.get("version") == ROOT_CA_STORE_CACHE_VERSION:
+                logging.debug("Root CA store read from %s", cache_path)
+                return cls(
+                    [
+                        {**entry, "der": base64.b64decode(entry["der"])}
+                        for entry in cache["certificates"]
+                    ]
+                )
+        except (OSError, ValueError, KeyError):
+            pass
+
+        store: RootCAStore = cls.from_pem(pem_data)
+        try:
+            store.save(cache_path)
+        except OSError as e:
+            logging.warning("Cannot cache the root CA store: %s", e)
+        return store
+
+    def save(self, cache_path: Path) -> None:
+        """Write the index of the store to a cache file."""
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path: Path = cache_path.with_suffix(".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f_cache:
+            json.dump(
+                {
+                    "version": ROOT_CA_STORE_CACHE_VERSION,
+                    "certificates": [
+                        {**entry, "der": base64.b64encode(entry["der"]).decode()}
+                        for entry in self._entries
+                    ],
+                },
+                f_cache,
+            )
+        os.replace(temp_path, cache_path)
+
+    def _certificate(self, index: int) -> x509.Certificate:
+        if index not in self._certificates:
+            self._certificates[index] = x509.load_der_x509_certificate(
+                self._entries[index]["der"]
+            )
+        return self._certificates[index]
+
+    def find_by_ski(self, ski: bytes) -> Optional[x509.Certificate]:
+        """Return the root CA with the given Subject Key Identifier, None if unknown."""
+        index: Optional[int] = self._by_ski.get(ski)
+        return self._certificate(index) if index is not None else None
+
+    def find_by_subject(self, subject: x509.Name) -> Optional[x509.Certificate]:
+        """Return the root CA with the given subject, None if unknown."""
+        index: Optional[int] = self._by_subject.get(subject.rfc4514_string())
+        return self._certificate(index) if index is not None else None
+
+    def find_issuer(
+        self, ssl_certificate: x509.Certificate
+    ) -> Optional[x509.Certificate]:
+        """Return the root CA that issued a certificate.
+
+        The Authority Key Identifier of the certificate is matched against the
+        Subject Key Identifiers of the store; the issuer name is only used for the
+        certificates without an AKI. The candidate is accepted only if its key
+        verifies the signature of the certificate.
+
+        Args:
+            ssl_certificate (x509.Certificate): The certificate issued by a root CA.
+
+        Returns:
+            Optional[x509.Certificate]: The root CA, None if not in the store.
+        """
+        try:
+            aki: Optional[bytes] = ssl_certificate.extensions.get_extension_for_oid(
+                ExtensionOID.AUTHORITY_KEY_IDENTIFIER
+            ).value.key_identifier
+        except x509.ExtensionNotFound:
+            aki = None
+
+        root_ca: Optional[x509.Certificate] = (
+            self.find_by_ski(aki)
+            if aki is not None
+            else self.find_by_subject(ssl_certificate.issuer)
+        )
+        if root_ca is None:
+            return None
+
+        try:
+            ssl_certificate.verify_directly_issued_by(root_ca)
+        except (ValueError, TypeError, InvalidSignature) as e:
+            logging.debug(
+                "%s is not the issuer of %s: %s",
+                root_ca.subject.rfc4514_string(),
+                ssl_certificate.subject.rfc4514_string(),
+                e,
+            )
+            return None
+        return root_ca
+
+    def pem_by_subject(self) -> Dict[str, str]:
+        """Return the PEM of every certificate by subject."""
+        return {
+            entry["subject"]: ssl.DER_cert_to_PEM_cert(entry["der"])
+            for entry in self._entries
+        }
+
+
+# Root CA stores parsed by this process, by bundle path
+_root_ca_stores: Dict[str, RootCAStore] = {}
+
+
+def download_root_ca_bundle(filename: Union[None, str, Path] = None) -> None:
+    """Download the root CA bundle of curl.
+
+    Args:
+        filename (Union[None, str, Path], optional): Where to save the bundle.
+            Defaults to ROOT_CA_BUNDLE_PATH.
+
+    Raises:
+        NetworkConnectionError: If the bundle cannot be downloaded or saved.
+    """
+    filename = filename or ROOT_CA_BUNDLE_PATH
+    logging.info("Downloading %s to %s", ROOT_CA_BUNDLE_URL, filename)
+    temp_path: Path = Path(filename).with_suffix(".tmp")
+    try:
+        Path(filename).parent.mkdir(parents=True, exist_ok=True)
+        with urlopen(ROOT_CA_BUNDLE_URL, timeout=AIA_FETCH_TIMEOUT_S) as response:
+            if response.getcode() != 200:
+                raise ce.NetworkConnectionError(
+                    f"Error downloading {ROOT_CA_BUNDLE_URL}: "
+                    f"HTTP {response.getcode()}"
+                )
+            data: bytes = response.read()
+        # Write and rename, so that a failed download never leaves a partial bundle
+        with open(temp_path, "wb") as out_file:
+            out_file.write(data)
+        os.replace(temp_path, filename)
+    except (URLError, OSError) as e:
+        raise ce.NetworkConnectionError(
+            f"Error downloading the root CA bundle {ROOT_CA_BUNDLE_URL}: {e}"
+        )
+    logging.info("Downloaded %s to %s", ROOT_CA_BUNDLE_URL, filename)
+
+
+def get_root_ca_store(filename: Union[None, str, Path] = None) -> RootCAStore:
+    """Return the root CA store of a bundle, loading it once per process.
+
+    Args:
+        filename (Union[None, str, Path], optional): The PEM bundle, downloaded if
+            missing. Defaults to ROOT_CA_BUNDLE_PATH.
+
+    Returns:
+        RootCAStore: The indexed certificates.
+
+    Raises:
+        NetworkConnectionError: If the bundle is missing and cannot be downloaded.
+    """
+    filename = filename or ROOT_CA_BUNDLE_PATH
+    if not os.path.exists(filename):
+        download_root_ca_bundle(filename)
+    stat: os.stat_result = os.stat(filename)
+    # A bundle downloaded again is loaded again
+    key: str = f"{os.path.abspath(filename)}:{stat.st_size}:{stat.st_mtime_ns}"
+    if key not in _root_ca_stores:
+        _root_ca_stores[key] = RootCAStore.from_file(filename)
+        logging.info("Number of Root CAs loaded: %d", len(_root_ca_stores[key]))
+    return _root_ca_stores[key]
+
+
+class IntermediateCertCache:
+    """Disk cache of the certificates downloaded from AIA URIs.
+
+    Each URI maps to the SHA-256 fingerprint of its certificate, stored once as
+    DER even if published at several URIs. An entry expires with the `notAfter`
+    of its certificate, so a renewed intermediate is downloaded again.
+
+    Args:
+        cache_dir (Union[None, str, Path], optional): The cache directory.
+            Defaults to INTERMEDIATE_CERT_CACHE_DIR.
+    """
+
+    def __init__(self, cache_dir: Union[None, str, Path] = None):
+        self._cache_dir = Path(cache_dir or INTERMEDIATE_CERT_CACHE_DIR)
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._uri_locks: Dict[str, threading.Lock] = {}
+        self._index: Dict[str, Dict[str, str]] = self._load_index()
+
+    @property
+    def _index_path(self) -> Path:
+        return self._cache_dir / "index.json"
+
+    def _load_index(self) -> Dict[str, Dict[str, str]]:
+        try:
+            with open(self._index_path, encoding="utf-8") as f_index:
+                return json.load(f_index)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self) -> None:
+        temp_path: Path = self._index_path.with_suffix(".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f_index:
+            json.dump(self._index, f_index, indent=1)
+        os.replace(temp_path, self._index_path)
+
+    def uri_lock(self, uri: str) -> threading.Lock:
+        """Return the lock of a URI, so that concurrent chains download it once."""
+        with self._lock:
+            return self._uri_locks.setdefault(uri, threading.Lock())
+
+    def get(self, uri: str) -> Optional[x509.Certificate]:
+        """Return the certificate cached for a URI, None if missing or expired."""
+        with self._lock:
+            entry: Optional[Dict[str, str]] = self._index.get(uri)
+        if entry is None:
+            return None
+        if datetime.datetime.fromisoformat(entry["not_after"]) <= utc_now():
+            return None
+        try:
+            with open(self._cache_dir / f"{entry['fingerprint']}.der", "rb") as f_cert:
+                return x509.load_der_x509_certificate(f_cert.read())
+        except (OSError, ValueError):
+            return None
+
+    def put(self, uri: str, certificate: x509.Certificate) -> None:
+        """Store the certificate downloaded from a URI."""
+        fingerprint: str = certificate.fingerprint(hashes.SHA256()).hex()
+        cert_path: Path = self._cache_dir / f"{fingerprint}.der"
+        with self._lock:
+            if not cert_path.exists():
+                cert_path.write_bytes(
+                    certificate.public_bytes(serialization.Encoding.DER)
+                )
+            self._index[uri] = {
+                "fingerprint": fingerprint,
+                "not_after": certificate.not_valid_after.replace(
+                    tzinfo=datetime.timezone.utc
+                ).isoformat(),
+            }
+            try:
+                self._save_index()
+            except OSError as e:
+                logging.warning("Cannot save the AIA cache index: %s", e)
+
+
+def utc_now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
 class SSLCertificateChainDownloader:
-    def __init__(self, output_directory: str = None):
+    def __init__(
+        self,
+        output_directory: str = None,
+        cert_cache: Union[None, bool, IntermediateCertCache] = True,
+    ):
         self.cert_chain = []
         self._output_directory: str = output_directory
+        # Intermediates of previous runs, a warm start makes no AIA request
+        self._cert_cache: Optional[IntermediateCertCache] = (
+            IntermediateCertCache() if cert_cache is True else cert_cache or None
+        )
 
         # Create output directory
         os.makedirs(self.output_directory, exist_ok=True)
@@ -88,8 +466,9 @@ class SSLCertificateChainDownloader:
         return self._output_directory if self._output_directory else "."
 
     def remove_cacert_pem(self) -> None:
-        """Remove certificate files from the current directory."""
+        """Remove certificate files from the current directory and the root CA bundle."""
         logging.info("Removing certificate files from current directory.")
+        Path(ROOT_CA_BUNDLE_PATH).unlink(missing_ok=True)
 
         output_directory = self.output_directory if self.output_directory else "."
 
@@ -100,23 +479,8 @@ class SSLCertificateChainDownloader:
                 logging.info(f"Removed {filename}")
 
     def get_cacert_pem(self) -> None:
-        """Download the cacert.pem file from the curl.se website."""
-        cacert_pem_url = "https://curl.se/ca/cacert.pem"
-        cacert_pem_file = "cacert.pem"
-        logging.info("Downloading %s to %s", cacert_pem_url, cacert_pem_file)
-        with urlopen(cacert_pem_url) as response, open(
-            cacert_pem_file, "wb"
-        ) as out_file:
-            if response.getcode() != 200:
-                logging.error(
-                    "Error downloading %s. HTTP status code: %s",
-                    cacert_pem_url,
-                    response.getcode(),
-                )
-                sys.exit(1)
-            data = response.read()
-            out_file.write(data)
-        logging.info("Downloaded %s to %s", cacert_pem_url, cacert_pem_file)
+        """Download the cacert.pem file from the curl.se website, replacing the local one."""
+        download_root_ca_bundle()
 
     @staticmethod
     def check_url(host: str) -> Dict[str, Any]:
@@ -142,7 +506,9 @@ class SSLCertificateChainDownloader:
             x509.Certificate: The SSL certificate of the server.
         """
         context: ssl.SSLContext = ssl.create_default_context()
-        with socket.create_connection((host, port)) as sock:
+        with socket.create_connection(
+            (host, port), timeout=AIA_FETCH_TIMEOUT_S
+        ) as sock:
             with context.wrap_socket(sock, server_hostname=host) as ssl_socket:
                 cert_pem: str = ssl.DER_cert_to_PEM_cert(ssl_socket.getpeercert(True))
                 cert: x509.Certificate = x509.load_pem_x509_certificate(
@@ -185,19 +551,20 @@ class SSLCertificateChainDownloader:
 
     def write_chain_to_file(
         self, certificate_chain: List[x509.Certificate], output_dir: str = "."
-    ) -> None:
-        """Write a certificate chain to files.
+    ) -> str:
+        """Write a certificate chain to a file, replacing the chain of a previous run.
 
         Args:
             certificate_chain (List[x509.Certificate]): The certificate chain to write to files.
+
+        Returns:
+            str: The path of the chain file.
         """
         os.makedirs(self.output_directory, exist_ok=True)
-        ssl_certificate_filename = "Forcepoint Cloud CA.crt"
-        ssl_certificate_filepath = os.path.join(
-            self.output_directory, ssl_certificate_filename
-        )
-        for certificate_item in certificate_chain:
-            self.save_ssl_certificate(certificate_item, ssl_certificate_filepath)
+        ssl_certificate_filepath = os.path.join(self.output_directory, CHAIN_FILE_NAME)
+        with open(ssl_certificate_filepath, "wb") as f:
+            f.write(self.chain_pem(certificate_chain))
+        return ssl_certificate_filepath
 
     def return_cert_aia(self, ssl_certificate: x509.Certificate) -> x509.Extensions:
         """Get the Authority Information Access (AIA) extension from a certificate.
@@ -219,7 +586,7 @@ class SSLCertificateChainDownloader:
             return None
 
     def get_certificate_from_uri(self, uri: str) -> x509.Certificate:
-        """Retrieve a certificate from the given URI.
+        """Retrieve a certificate from the given URI, or from the cache if downloaded before.
 
         Args:
             uri (str): The URI to get the certificate from.
@@ -227,19 +594,54 @@ class SSLCertificateChainDownloader:
         Returns:
             x509.Certificate: The certificate from the URI or None if there was an error.
         """
+        if self._cert_cache is None:
+            return self._download_certificate(uri)
+
+        # Hosts sharing an intermediate wait for the first download of it
+        with self._cert_cache.uri_lock(uri):
+            cert: Optional[x509.Certificate] = self._cert_cache.get(uri)
+            if cert is not None:
+                logging.debug("Certificate of %s read from the cache", uri)
+                return cert
+
+            cert = self._download_certificate(uri)
+            if cert is not None:
+                self._cert_cache.put(uri, cert)
+        return cert
+
+    def _download_certificate(self, uri: str) -> Optional[x509.Certificate]:
         try:
-            with urlopen(uri) as response:
+            with urlopen(uri, timeout=AIA_FETCH_TIMEOUT_S) as response:
                 if response.getcode() != 200:
                     return None
                 aia_content = response.read()
                 ssl_certificate: str = ssl.DER_cert_to_PEM_cert(aia_content)
-                cert: x509.Certificate = x509.load_pem_x509_certificate(
+                return x509.load_pem_x509_certificate(
                     ssl_certificate.encode("ascii"), default_backend()
                 )
-                return cert
-        except (HTTPError, URLError):
+        except (HTTPError, URLError, TimeoutError) as e:
+            logging.warning("Could not download %s: %s", uri, e)
             return None
 
+    def get_certificates_from_uris(
+        self, uris: List[str]
+    ) -> List[Optional[x509.Certificate]]:
+        """Retrieve the certificates of several URIs, downloading the uncached ones concurrently.
+
+        Args:
+            uris (List[str]): The URIs to get the certificates from.
+
+        Returns:
+            List[Optional[x509.Certificate]]: The certificate of each URI, None if there was an error.
+        """
+        if len(uris) <= 1:
+            return [self.get_certificate_from_uri(uri) for uri in uris]
+
+        with ThreadPoolExecutor(
+            max_workers=min(len(uris), AIA_FETCH_MAX_WORKERS)
+        ) as executor:
+            return list(executor.map(self.get_certificate_from_uri, uris))
+
     def return_cert_aia_list(self, ssl_certificate: x509.Certificate) -> list:
         """Get the list of AIA URIs from a certificate.
 
@@ -311,48 +713,13 @@ class SSLCertificateChainDownloader:
         if filename is None and ca_cert_text is None:
             raise ValueError("Either filename or ca_cert_text must be provided")
 
-        ca_root_store = {}
-
         if filename:
-            with open(filename) as f_ca_cert:
-                ca_cert_text = f_ca_cert.read()
-
-        lines: list[str] = ca_cert_text.splitlines()
-        line_count: int = len(lines)
-        index = 0
-
-        previous_line = ""
-        current_line = ""
-
-        while index < line_count:
-            previous_line: str = current_line
-            current_line: str = lines[index]
-
-            if re.search("^\={5,}", current_line):
-                root_ca_cert = ""
-                root_ca_name = previous_line.strip()
-
-                index += 1
-                while index < line_count and not re.search(
-                    r"^-----END CERTIFICATE-----", lines[index]
-                ):
-                    root_ca_cert += lines[index] + "\n"
-                    index += 1
-
-                root_ca_cert += lines[index] + "\n"
-                index += 1
-
-                cert: x509.Certificate = x509.load_pem_x509_certificate(
-                    root_ca_cert.encode(), default_backend()
-                )
-                root_ca_name: str = cert.subject.rfc4514_string()
-
-                ca_root_store[root_ca_name] = root_ca_cert
-            else:
-                index += 1
+            ca_root_store: RootCAStore = get_root_ca_store(filename)
+        else:
+            ca_root_store = RootCAStore.from_pem(ca_cert_text.encode())
+            logging.info("Number of Root CAs loaded: %d", len(ca_root_store))
 
-        logging.info("Number of Root CAs loaded: %d", len(ca_root_store))
-        return ca_root_store
+        return ca_root_store.pem_by_subject()
 
     def walk_the_chain(
         self,
@@ -374,8 +741,10 @@ class SSLCertificateChainDownloader:
             max_depth (int, optional): The maximum depth allowed for the certificate chain. Defaults to 4.
 
         Raises:
-            SystemExit: If a certificate cannot be retrieved, if a certificate doesn't have the AIA
-                        extension, or if the root CA is not found in the pre-existing root CA store.
+            AIAError: If a certificate of the AIA URIs cannot be retrieved.
+            NetworkConnectionError: If a certificate doesn't have the AIA extension and its
+                root CA is not found in the root CA store, or the store cannot be
+                downloaded.
         """
         if depth <= max_depth:
             cert_aki = self.return_cert_aki(ssl_certificate)
@@ -392,51 +761,103 @@ class SSLCertificateChainDownloader:
             if cert_aki_value is not None:
                 aia_uri_list = self.return_cert_aia_list(ssl_certificate)
                 if aia_uri_list:
-                    for item in aia_uri_list:
-                        next_cert: x509.Certificate = self.get_certificate_from_uri(
-                            item
-                        )
-
+                    for next_cert in self.get_certificates_from_uris(aia_uri_list):
                         if next_cert is not None:
                             self.cert_chain.append(next_cert)
                             self.walk_the_chain(next_cert, depth + 1, max_depth)
                         else:
                             logging.warning("Could not retrieve certificate.")
-                            sys.exit(1)
+                            raise ce.AIAError(
+                                f"Could not retrieve the issuer of depth {depth} "
+                                f"from {', '.join(aia_uri_list)}"
+                            )
                 else:
                     logging.warning("Certificate didn't have AIA.")
-                    ca_root_store: Dict[str, str] = self.load_root_ca_cert_chain(
-                        "cacert.pem"
+                    root_ca_certificate: Optional[x509.Certificate] = (
+                        get_root_ca_store().find_issuer(ssl_certificate)
                     )
-                    root_ca_cn = None
-
-                    for root_ca in ca_root_store:
-                        try:
-                            root_ca_certificate_pem: str = ca_root_store[root_ca]
-                            root_ca_certificate: x509.Certificate = (
-                                x509.load_pem_x509_certificate(
-                                    root_ca_certificate_pem.encode("ascii")
-                                )
-                            )
-                            root_ca_ski: x509.Extension[x509.ExtensionType] = (
-                                self.return_cert_ski(root_ca_certificate)
-                            )
-                            root_ca_ski_value = root_ca_ski._value.digest
-
-                            if root_ca_ski_value == cert_aki_value:
-                                root_ca_cn = root_ca
-                                self.cert_chain.append(root_ca_certificate)
-                                logging.info(
-                                    f"Root CA Found - {root_ca_cn}\nCERT_CHAIN - {self.cert_chain}"
-                                )
-                                break
-                        except x509.extensions.ExtensionNotFound:
-                            logging.info("Root CA didn't have a SKI. Skipping...")
-                            pass
-
-                    if root_ca_cn is None:
+
+                    if root_ca_certificate is None:
                         logging.error("Root CA NOT found.")
-                        sys.exit(1)
+                        raise ce.NetworkConnectionError(
+                            f"Root CA of {ssl_certificate.issuer.rfc4514_string()} "
+                            "not found in the root CA store"
+                        )
+
+                    self.cert_chain.append(root_ca_certificate)
+                    logging.info(
+                        f"Root CA Found - {root_ca_certificate.subject.rfc4514_string()}\nCERT_CHAIN - {self.cert_chain}"
+                    )
+
+    def fetch_chain(self, host: str) -> List[x509.Certificate]:
+        """Connect to a host and walk its certificate chain, without writing any file.
+
+        Args:
+            host (str): The host, optionally with a port ("host:port").
+
+        Returns:
+            List[x509.Certificate]: The chain, from the server certificate to the root CA.
+        """
+        parsed_url: Dict[str, Any] = SSLCertificateChainDownloader.check_url(host)
+
+        try:
+            ssl_certificate: x509.Certificate = self.get_certificate(
+                parsed_url["host"], parsed_url["port"]
+            )
+        except ConnectionRefusedError:
+            raise ce.NetworkConnectionError(
+                f'Connection refused to {parsed_url["host"]}:{parsed_url["port"]}'
+            )
+
+        except ssl.SSLError as e:
+            raise ce.NetworkConnectionError(f"SSL error: {e}")
+
+        except socket.timeout:
+            raise ce.NetworkConnectionError(
+                f'Connection timed out to {parsed_url["host"]}:{parsed_url["port"]}'
+            )
+
+        except socket.gaierror:
+            raise ce.NetworkConnectionError(
+                f'Hostname could not be resolved: {parsed_url["host"]}'
+            )
+
+        aia: x509.Extensions = self.return_cert_aia(ssl_certificate)
+
+        if aia is not None and not self.return_cert_aia(ssl_certificate):
+            raise ce.AIAError(
+                "Could not find AIA, possible decryption taking place upstream?"
+            )
+
+        self.cert_chain = [ssl_certificate]
+
+        self.walk_the_chain(ssl_certificate, 1, max_depth=4)
+
+        return self.cert_chain
+
+    @staticmethod
+    def chain_pem(certificate_chain: List[x509.Certificate]) -> bytes:
+        """Return a certificate chain as concatenated PEM certificates."""
+        return b"".join(
+            certificate.public_bytes(encoding=serialization.Encoding.PEM)
+            for certificate in certificate_chain
+        )
+
+    @staticmethod
+    def ssl_context(certificate_chain: List[x509.Certificate]) -> ssl.SSLContext:
+        """Return an SSL context trusting the certificates of a chain only.
+
+        Args:
+            certificate_chain (List[x509.Certificate]): The chain of a host.
+
+        Returns:
+            ssl.SSLContext: A client context verifying the host against the chain.
+        """
+        return ssl.create_default_context(
+            cadata=SSLCertificateChainDownloader.chain_pem(certificate_chain).decode(
+                "ascii"
+            )
+        )
 
     def run(self, args: Union[argparse.Namespace, dict]) -> Dict[str, List[str]]:
         """Main method that handles the execution of SSLCertificateChainDownloader based on the provided arguments.
@@ -487,50 +908,136 @@ class SSLCertificateChainDownloader:
         if get_ca_cert_pem:
             self.get_cacert_pem()
 
-        try:
-            ssl_certificate: x509.Certificate = self.get_certificate(
-                self.parsed_url["host"], self.parsed_url["port"]
-            )
-        except ConnectionRefusedError:
-            raise ce.NetworkConnectionError(
-                f'Connection refused to {self.parsed_url["host"]}:{self.parsed_url["port"]}'
-            )
+        self.fetch_chain(self.host)
 
-        except ssl.SSLError as e:
-            raise ce.NetworkConnectionError(f"SSL error: {e}")
+        chain_file: str = self.write_chain_to_file(self.cert_chain)
 
-        except socket.timeout:
-            raise ce.NetworkConnectionError(
-                f'Connection timed out to {self.parsed_url["host"]}:{self.parsed_url["port"]}'
-            )
+        logging.info("Certificate chain downloaded and saved.")
 
-        except socket.gaierror:
-            raise ce.NetworkConnectionError(
-                f'Hostname could not be resolved: {self.parsed_url["host"]}'
-            )
+        return {"files": [chain_file]}
 
-        aia: x509.Extensions = self.return_cert_aia(ssl_certificate)
 
-        if aia is not None and not self.return_cert_aia(ssl_certificate):
-            raise ce.AIAError(
-                "Could not find AIA, possible decryption taking place upstream?"
-            )
+def get_ssl_context(
+    host: str, cert_cache: Union[bool, IntermediateCertCache] = True
+) -> ssl.SSLContext:
+    """Download the chain of a host and return an SSL context trusting it, all in memory.
 
-        self.cert_chain.append(ssl_certificate)
+    Args:
+        host (str): The host, optionally with a port ("host:port").
+        cert_cache (Union[bool, IntermediateCertCache], optional): The intermediates
+            cache, True for the default one.
 
-        self.walk_the_chain(ssl_certificate, 1, max_depth=4)
+    Returns:
+        ssl.SSLContext: A client context verifying the host against its chain.
+    """
+    downloader = SSLCertificateChainDownloader(cert_cache=cert_cache)
+    return downloader.ssl_context(downloader.fetch_chain(host))
 
-        self.write_chain_to_file(self.cert_chain)
 
-        logging.info("Certificate chain downloaded and saved.")
+def read_hosts_file(filename: str) -> List[str]:
+    """Read the hosts of a file, one per line, skipping blank lines and # comments."""
+    with open(filename, encoding="utf-8") as f_hosts:
+        return [
+            line.strip()
+            for line in f_hosts
+            if line.strip() and not line.lstrip().startswith("#")
+        ]
 
-        return {
-            "files": [
-                os.path.join(self.output_directory, f)
-                for f in os.listdir(self.output_directory)
-                if f.endswith(".crt")
-            ]
+
+def host_directory_name(host: str) -> str:
+    """Return the output folder of a host, e.g. "jira.example.com_443"."""
+    parsed_url: Dict[str, Any] = SSLCertificateChainDownloader.check_url(host)
+    return re.sub(r"[^\w.-]", "_", f'{parsed_url["host"]}_{parsed_url["port"]}')
+
+
+def download_host_chain(
+    host: str,
+    output_directory: str,
+    cert_cache: Optional[IntermediateCertCache],
+) -> Dict[str, Any]:
+    """Download the chain of a host into its own folder and describe the outcome.
+
+    Args:
+        host (str): The host, optionally with a port ("host:port").
+        output_directory (str): The parent of the host folders.
+        cert_cache (Optional[IntermediateCertCache]): The cache shared by all the hosts.
+
+    Returns:
+        Dict[str, Any]: The manifest entry of the host.
+    """
+    started: float = time.perf_counter()
+    downloader = SSLCertificateChainDownloader(
+        output_directory=os.path.join(output_directory, host_directory_name(host)),
+        cert_cache=cert_cache or False,
+    )
+    entry: Dict[str, Any] = {"host": host, **downloader.check_url(host)}
+    try:
+        entry["files"] = downloader.run({"host": host})["files"]
+        entry["status"] = "ok"
+    except (ce.NetworkConnectionError, OSError, ValueError) as e:
+        entry["status"] = "failed"
+        entry["error"] = str(e) or type(e).__name__
+        logging.error("Cannot download the chain of %s: %s", host, entry["error"])
+
+    entry["chain"] = [
+        {
+            "subject": cert.subject.rfc4514_string(),
+            "issuer": cert.issuer.rfc4514_string(),
+            "sha256": cert.fingerprint(hashes.SHA256()).hex(),
+            "not_after": cert.not_valid_after.replace(
+                tzinfo=datetime.timezone.utc
+            ).isoformat(),
         }
+        for cert in downloader.cert_chain
+    ]
+    entry["elapsed_s"] = round(time.perf_counter() - started, 3)
+    return entry
+
+
+def download_host_chains(
+    hosts: List[str],
+    output_directory: str,
+    max_workers: int = CHAIN_DOWNLOAD_MAX_WORKERS,
+    cert_cache: Optional[IntermediateCertCache] = None,
+) -> Dict[str, Any]:
+    """Download the chains of several hosts concurrently and write a manifest.
+
+    The intermediates are shared through the cache: a certificate common to
+    several chains is downloaded once, even when the hosts are resolved at the
+    same time.
+
+    Args:
+        hosts (List[str]): The hosts, optionally with a port ("host:port").
+        output_directory (str): The parent of the host folders and of the manifest.
+        max_workers (int, optional): Hosts resolved concurrently.
+        cert_cache (Optional[IntermediateCertCache], optional): The intermediates cache.
+
+    Returns:
+        Dict[str, Any]: The manifest, also written to manifest.json in the output directory.
+    """
+    started: float = time.perf_counter()
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(max_workers, len(hosts)))
+    ) as executor:
+        entries: List[Dict[str, Any]] = list(
+            executor.map(
+                lambda host: download_host_chain(host, output_directory, cert_cache),
+                hosts,
+            )
+        )
+
+    manifest: Dict[str, Any] = {
+        "version": VERSION,
+        "generated_at": utc_now().isoformat(),
+        "elapsed_s": round(time.perf_counter() - started, 3),
+        "hosts": entries,
+    }
+    os.makedirs(output_directory, exist_ok=True)
+    manifest_path: str = os.path.join(output_directory, MANIFEST_FILE_NAME)
+    with open(manifest_path, "w", encoding="utf-8") as f_manifest:
+        json.dump(manifest, f_manifest, indent=1)
+    logging.info("Manifest of %d host(s) written to %s", len(entries), manifest_path)
+    return manifest
 
 
 def main() -> None:
@@ -545,8 +1052,35 @@ def main() -> None:
         level=log_level, format="%(asctime)s [%(levelname)s] %(message)s"
     )
 
-    downloader = SSLCertificateChainDownloader(output_directory=args.output_dir)
-    downloader.run(args)
+    hosts: List[str] = list(args.hosts or [])
+    if args.hosts_file:
+        hosts += read_hosts_file(args.hosts_file)
+
+    if not hosts:
+        downloader = SSLCertificateChainDownloader(
+            output_directory=args.output_dir, cert_cache=args.aia_cache
+        )
+        try:
+            downloader.run(args)
+        except ce.NetworkConnectionError as e:
+            logging.error("Cannot download the certificate chain: %s", e)
+            sys.exit(1)
+        return
+
+    if args.get_ca_cert_pem:
+        try:
+            SSLCertificateChainDownloader(args.output_dir, False).get_cacert_pem()
+        except ce.NetworkConnectionError as e:
+            logging.error("%s", e)
+            sys.exit(1)
+    manifest: Dict[str, Any] = download_host_chains(
+        hosts,
+        args.output_dir,
+        args.workers,
+        IntermediateCertCache() if args.aia_cache else None,
+    )
+    if any(entry["status"] != "ok" for entry in manifest["hosts"]):
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,395 @@
+"""Per-run cache of the Jira issue state used to decide which worklogs to add."""
+
+import bisect
+import dataclasses
+import datetime
+import itertools
+import threading
+import uuid
+from typing import TYPE_CHECKING, Any, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+from jira import JIRA, Issue, Worklog, exceptions
+
+from constants import JIRA_DATETIME_FORMAT, JQL_KEYS_CHUNK_SIZE
+from logging_conf import logger
+
+if TYPE_CHECKING:
+    from run_journal import RunJournal
+    from worklog_ledger import WorklogLedger
+
+
+@dataclasses.dataclass(frozen=True)
+class WorklogRecord:
+    """The fields of a Jira worklog needed to plan a run."""
+
+    worklog_id: str
+    author_id: str
+    day: str  # Formatted as 'YYYY-MM-DD'
+    seconds: int
+
+    @classmethod
+    def from_worklog(cls, worklog: Worklog) -> "WorklogRecord":
+        return cls(
+            worklog_id=str(worklog.id),
+            author_id=worklog.author.accountId,
+            # The day in the offset of the author, as parsing and formatting it would give
+            day=worklog.started[:10],
+            seconds=int(worklog.timeSpentSeconds),
+        )
+
+
+class StatusTimeline:
+    """Chronological status transitions of a Jira issue, queried by bisection."""
+
+    def __init__(
+        self,
+        transition_dates: list[datetime.date],
+        statuses: list[str],
+        initial_status: str = "open",
+        valid_until: Optional[datetime.date] = None,
+    ):
+        # Running maximum of the transition dates: a bisection on it finds the first
+        # transition whose date is not before the requested one, exactly as a linear
+        # scan that stops at the first such transition would do.
+        self._dates: list[datetime.date] = list(
+            itertools.accumulate(transition_dates, max)
+        )
+        self._statuses: list[str] = statuses
+        self._initial_status: str = initial_status
+        # Last date answered correctly by a timeline synced in the past, None if current
+        self.valid_until: Optional[datetime.date] = valid_until
+
+    @classmethod
+    def from_histories(cls, histories: Iterable[Any]) -> "StatusTimeline":
+        """Build the timeline from the changelog histories of an issue.
+
+        Parameters:
+        histories (Iterable): The `changelog.histories` of a Jira issue, in any order.
+
+        Returns:
+        StatusTimeline: The status transitions sorted by creation time.
+        """
+        created: list[str] = []
+        statuses: list[str] = []
+        for history in histories:
+            status: Optional[str] = None
+            for item in history.items:
+                if item.field == "status":
+                    status = item.toString.lower()
+
+            # Histories without a status change do not affect the timeline
+            if status is not None:
+                created.append(history.created)
+                statuses.append(status)
+        if not created:
+            return cls([], [])
+
+        # Parsed in one pass, ordered as instants across offsets, ties kept in order
+        order: np.ndarray = np.argsort(
+            pd.to_datetime(created, format=JIRA_DATETIME_FORMAT, utc=True).asi8,
+            kind="stable",
+        )
+
+        return cls(
+            [datetime.date.fromisoformat(created[index][:10]) for index in order],
+            [statuses[index] for index in order],
+        )
+
+    def transitions(self) -> list[tuple[datetime.date, str]]:
+        """Return the (date, status) transitions, to store the timeline."""
+        return list(zip(self._dates, self._statuses))
+
+    def status_on(self, date: datetime.date) -> str:
+        """Return the last status set by a transition strictly before the given date.
+
+        Parameters:
+        date (datetime.date): The date to check.
+
+        Returns:
+        str: The lower-cased status, the initial status if no transition occurred before the date.
+        """
+        index: int = bisect.bisect_left(self._dates, date)
+        return self._statuses[index - 1] if index else self._initial_status
+
+    def is_open_on(self, date: datetime.date) -> bool:
+        return self.status_on(date) == "open"
+
+
+class IssueStateCache:
+    """Jira issue state fetched at most once per issue during a logging run.
+
+    With a worklog ledger, the issues synced recently are read from the ledger
+    instead of Jira, and everything fetched or created during the run is stored
+    back in it. With a run journal, the issues fetched by an interrupted run
+    are read from the journal, and everything fetched or written is appended to it.
+
+    Parameters:
+    jira (JIRA): An authenticated JIRA client instance.
+    ledger (WorklogLedger, optional): Local ledger of the issue state.
+    journal (RunJournal, optional): Checkpoint journal of the run.
+    """
+
+    def __init__(
+        self,
+        jira: JIRA,
+        ledger: Optional["WorklogLedger"] = None,
+        journal: Optional["RunJournal"] = None,
+    ):
+        self._jira: JIRA = jira
+        self._ledger: Optional["WorklogLedger"] = ledger
+        self._journal: Optional["RunJournal"] = journal
+        self._worklogs: dict[str, list[WorklogRecord]] = {}
+        self._histories: dict[str, list[Any]] = {}
+        self._timelines: dict[str, Optional[StatusTimeline]] = {}
+        self._lock = threading.Lock()
+        # Identifies the worklogs created by this run in the ledger
+        self.run_id: str = uuid.uuid4().hex
+
+    @property
+    def _server(self) -> str:
+        # The ledger keeps the issues of every Jira server the tool logs to
+        return self._jira.server_url
+
+    def prefetch(self, issues: Iterable[str], refresh: bool = False) -> None:
+        """Download worklogs and changelogs of many issues with a few JQL searches.
+
+        Issues whose embedded worklogs or changelog are truncated by the search
+        endpoint are left out and fetched one by one on first use. Issues fresh
+        in the ledger are not downloaded at all.
+
+        Parameters:
+        issues (Iterable[str]): The Jira issue keys needed by the run.
+        refresh (bool): Download the issues fresh in the ledger too.
+        """
+        issue_keys: list[str] = sorted(set(issues) - self._worklogs.keys())
+        if self._journal is not None:
+            issue_keys = self._load_from_journal(issue_keys)
+        if self._ledger is not None and not refresh:
+            issue_keys = self._load_from_ledger(issue_keys)
+        searches_count = 0
+
+        for start in range(0, len(issue_keys), JQL_KEYS_CHUNK_SIZE):
+            chunk: list[str] = issue_keys[start : start + JQL_KEYS_CHUNK_SIZE]
+            searches_count += 1
+            try:
+                found_issues: list[Issue] = self._jira.search_issues(
+                    f"key in ({','.join(chunk)})",
+                    maxResults=False,
+                    validate_query=False,  # Unknown keys must not fail the whole chunk
+                    fields="worklog",
+                    expand="changelog",
+                )
+            except exceptions.JIRAError as e:
+                logger.warning(f"Failed to prefetch issues {', '.join(chunk)}: {e}")
+                continue
+
+            for found_issue in found_issues:
+                self._store_search_result(found_issue)
+
+        logger.info(
+            f"Prefetched {len(issue_keys)} issue(s) in {searches_count} search(es)"
+        )
+        if self._journal is not None:
+            self._journal.sync()
+
+    def _load_from_journal(self, issue_keys: list[str]) -> list[str]:
+        # Returns the issues not fetched by the interrupted run
+        journaled_issues: dict[
+            str, tuple[list[WorklogRecord], Optional[StatusTimeline]]
+        ] = self._journal.load(issue_keys)
+
+        for issue, (records, timeline) in journaled_issues.items():
+            self._worklogs[issue] = records
+            if timeline is not None:
+                self._timelines[issue] = timeline
+
+        if journaled_issues:
+            logger.info(f"Read {len(journaled_issues)} issue(s) from the run journal")
+        return [issue for issue in issue_keys if issue not in journaled_issues]
+
+    def _load_from_ledger(self, issue_keys: list[str]) -> list[str]:
+        # Returns the issues that must still be fetched from Jira
+        fresh_issues: dict[str, tuple[list[WorklogRecord], Optional[StatusTimeline]]]
+        fresh_issues = self._ledger.load_fresh(self._server, issue_keys)
+
+        for issue, (records, timeline) in fresh_issues.items():
+            self._worklogs[issue] = records
+            # Without a stored timeline the changelog is fetched on first use
+            if timeline is not None:
+                self._timelines[issue] = timeline
+            if self._journal is not None:
+                self._journal.record_worklogs(issue, records)
+                if timeline is not None:
+                    self._journal.record_timeline(issue, timeline)
+
+        logger.info(f"Read {len(fresh_issues)} issue(s) from the worklog ledger")
+        return [issue for issue in issue_keys if issue not in fresh_issues]
+
+    def _store_search_result(self, issue: Issue) -> None:
+        worklog_field = getattr(issue.fields, "worklog", None)
+        if worklog_field is not None and worklog_field.total <= len(
+            worklog_field.worklogs
+        ):
+            self._store_worklogs(issue.key, worklog_field.worklogs)
+
+        changelog = getattr(issue, "changelog", None)
+        if changelog is not None and getattr(
+            changelog, "total", len(changelog.histories)
+        ) <= len(changelog.histories):
+            self._histories[issue.key] = changelog.histories
+            if self._ledger is not None or self._journal is not None:
+                # Store the timeline now, the run may not need to check any day
+                self.timeline(issue.key)
+
+    def _store_worklogs(self, issue: str, worklogs: list[Worklog]) -> None:
+        records: list[WorklogRecord] = [
+            WorklogRecord.from_worklog(worklog) for worklog in worklogs
+        ]
+        self._worklogs[issue] = records
+        if self._ledger is not None:
+            self._ledger.sync_worklogs(self._server, issue, records)
+        if self._journal is not None:
+            self._journal.record_worklogs(issue, records)
+
+    def worklogs(self, issue: str) -> list[WorklogRecord]:
+        """Return all the worklogs of the issue, fetching them if not prefetched.
+
+        Parameters:
+        issue (str): The Jira issue key.
+
+        Returns:
+        list[WorklogRecord]: The worklogs of the issue.
+
+        Raises:
+        JIRAError: If the worklogs could not be fetched.
+        """
+        if issue not in self._worklogs:
+            self._store_worklogs(issue, self._jira.worklogs(issue))
+
+        return self._worklogs[issue]
+
+    def author_worklog_days(self, issue: str, author_id: str) -> set[str]:
+        """Return the days on which the author has already logged work on the issue.
+
+        Parameters:
+        issue (str): The Jira issue key.
+        author_id (str): The Jira account ID of the author.
+
+        Returns:
+        set[str]: The days formatted as 'YYYY-MM-DD'.
+
+        Raises:
+        JIRAError: If the worklogs could not be fetched.
+        """
+        return {
+            record.day
+            for record in self.worklogs(issue)
+            if record.author_id == author_id
+        }
+
+    def record_worklog(self, issue: str, worklog: Worklog) -> None:
+        """Keep the cached worklogs of an issue in sync with a worklog just added.
+
+        Parameters:
+        issue (str): The Jira issue key.
+        worklog (Worklog): The worklog returned by Jira on creation.
+        """
+        record: WorklogRecord = WorklogRecord.from_worklog(worklog)
+        # Worklogs are added concurrently by the writer threads
+        with self._lock:
+            self._worklogs.setdefault(issue, []).append(record)
+        if self._ledger is not None:
+            self._ledger.record_worklog(self._server, issue, record, self.run_id)
+        if self._journal is not None:
+            self._journal.record_create(issue, record)
+
+    def record_worklog_update(self, issue: str, worklog_id: str, seconds: int) -> None:
+        """Keep the cached worklogs of an issue in sync with a worklog just updated."""
+        with self._lock:
+            self._worklogs[issue] = [
+                (
+                    dataclasses.replace(record, seconds=seconds)
+                    if record.worklog_id == worklog_id
+                    else record
+                )
+                for record in self._worklogs.get(issue, [])
+            ]
+        if self._ledger is not None:
+            self._ledger.update_worklog(self._server, worklog_id, seconds)
+        if self._journal is not None:
+            self._journal.record_update(issue, worklog_id, seconds)
+
+    def record_worklog_delete(self, issue: str, worklog_id: str) -> None:
+        """Keep the cached worklogs of an issue in sync with a worklog just deleted."""
+        with self._lock:
+            self._worklogs[issue] = [
+                record
+                for record in self._worklogs.get(issue, [])
+                if record.worklog_id != worklog_id
+            ]
+        if self._ledger is not None:
+            self._ledger.delete_worklog(self._server, worklog_id)
+        if self._journal is not None:
+            self._journal.record_delete(issue, worklog_id)
+
+    def mark_stale(self, issue: str) -> None:
+        """Fetch the issue from Jira on the next run, e.g. after a failed write."""
+        if self._ledger is not None:
+            self._ledger.mark_stale(self._server, [issue])
+
+    def timeline(self, issue: str) -> Optional[StatusTimeline]:
+        """Return the status timeline of the issue, fetching its changelog if not prefetched.
+
+        Parameters:
+        issue (str): The Jira issue key.
+
+        Returns:
+        Optional[StatusTimeline]: The status timeline, None if the changelog could not be fetched.
+        """
+        if issue not in self._timelines:
+            try:
+                if issue not in self._histories:
+                    issue_changelog: Issue = self._jira.issue(issue, expand="changelog")
+                    self._histories[issue] = issue_changelog.changelog.histories
+
+                self._timelines[issue] = StatusTimeline.from_histories(
+                    self._histories[issue]
+                )
+                if self._ledger is not None:
+                    self._ledger.store_timeline(
+                        self._server, issue, self._timelines[issue]
+                    )
+                if self._journal is not None:
+                    self._journal.record_timeline(issue, self._timelines[issue])
+            except exceptions.JIRAError as e:
+                logger.error(f"Error fetching issue history for {issue}: {e}")
+                # Remember the failure so the changelog is not requested again for every day
+                self._timelines[issue] = None
+
+        return self._timelines[issue]
+
+    def is_open_on(self, issue: str, date: datetime.date) -> bool:
+        """Check if the last status of the issue before a specific date was Open.
+
+        Parameters:
+        issue (str): The Jira issue key.
+        date (datetime.date): The date to check.
+
+        Returns:
+        bool: True if the issue was open on the given date, assuming 'open' as the
+        initial state. False if its changelog could not be fetched.
+        """
+        timeline: Optional[StatusTimeline] = self.timeline(issue)
+        if (
+            timeline is not None
+            and timeline.valid_until is not None
+            and date > timeline.valid_until
+        ):
+            # The ledger does not know the transitions made after its last sync
+            del self._timelines[issue]
+            self._histories.pop(issue, None)
+            timeline = self.timeline(issue)
+
+        return timeline is not None and timeline.is_open_on(date)
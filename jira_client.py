@@ -0,0 +1,146 @@
+"""Jira clients with a connection pool sized for the worklog writers.
+
+The server is verified against a CA file, or against an in-memory SSL context
+(e.g. a downloaded chain) mounted through an HTTPS adapter.
+"""
+
+import contextlib
+import ssl
+import threading
+from typing import Any, Iterator, Union
+
+from jira import JIRA
+from jira.resilientsession import ResilientSession
+from requests import ConnectionError, Response
+from requests.adapters import HTTPAdapter
+
+from constants import DEFAULT_MAX_WORKERS
+
+
+class SSLContextAdapter(HTTPAdapter):
+    """HTTPS adapter whose connections use the given SSL context.
+
+    Parameters:
+    ssl_context (ssl.SSLContext): The context verifying the servers.
+    kwargs: The other HTTPAdapter arguments, e.g. pool_maxsize.
+    """
+
+    def __init__(self, ssl_context: ssl.SSLContext, **kwargs: Any):
+        self._ssl_context: ssl.SSLContext = ssl_context
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        kwargs["ssl_context"] = self._ssl_context
+        super().init_poolmanager(*args, **kwargs)
+
+    def proxy_manager_for(self, proxy: str, **proxy_kwargs: Any) -> Any:
+        proxy_kwargs["ssl_context"] = self._ssl_context
+        return super().proxy_manager_for(proxy, **proxy_kwargs)
+
+
+class ScopedRetrySession(ResilientSession):
+    """ResilientSession whose 429 and 503 retries can be turned off for a thread.
+
+    The session retries 429 and 503 responses by itself, sleeping in the calling
+    thread. The worklog writers back off on their own (shared rate limit pause and
+    concurrency decrease), so they must receive those responses instead. Dropped
+    connections are still retried by the session.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        self._thread_state = threading.local()
+        super().__init__(*args, **kwargs)
+
+    def _ResilientSession__recoverable(
+        self,
+        response: Union[ConnectionError, Response, None],
+        *args: Any,
+        **kwargs: Any
+    ) -> bool:
+        # The retry decision of ResilientSession (a private method, jira is pinned)
+        if isinstance(response, Response) and getattr(
+            self._thread_state, "status_retries_disabled", False
+        ):
+            return False
+        return super()._ResilientSession__recoverable(response, *args, **kwargs)
+
+    @contextlib.contextmanager
+    def status_retries_disabled(self) -> Iterator[None]:
+        """Raise the 429 and 503 responses of the calling thread instead of retrying."""
+        previous: bool = getattr(self._thread_state, "status_retries_disabled", False)
+        self._thread_state.status_retries_disabled = True
+        try:
+            yield
+        finally:
+            self._thread_state.status_retries_disabled = previous
+
+
+@contextlib.contextmanager
+def session_status_retries_disabled(jira: JIRA) -> Iterator[None]:
+    """Let the 429 and 503 responses of the calling thread reach the caller.
+
+    Only the clients created as PooledJIRA support it, the requests of the other
+    clients are still retried by their session.
+    """
+    session: Any = getattr(jira, "_session", None)
+    if not isinstance(session, ScopedRetrySession):
+        yield
+        return
+
+    with session.status_retries_disabled():
+        yield
+
+
+class PooledJIRA(JIRA):
+    """Jira client keeping up to `pool_maxsize` connections alive to the server.
+
+    The requests default of 10 connections per host either wastes sockets or,
+    with more writer threads than that, closes connections that the next request
+    opens again with a new TLS handshake. The adapter is mounted while the session
+    is created, before the first request (the server info) is sent. The session
+    is a ScopedRetrySession, so the worklog writers handle rate limiting themselves.
+
+    Parameters:
+    pool_maxsize (int): Connections kept alive, e.g. the number of worklog writers.
+    args, kwargs: The JIRA arguments.
+    """
+
+    def __init__(self, *args: Any, pool_maxsize: int = DEFAULT_MAX_WORKERS, **kwargs):
+        self._pool_maxsize: int = max(1, pool_maxsize)
+        super().__init__(*args, **kwargs)
+
+    def _adapter(self) -> HTTPAdapter:
+        return HTTPAdapter(pool_maxsize=self._pool_maxsize)
+
+    def _add_ssl_cert_verif_strategy_to_session(self) -> None:
+        # Called right after the session is created: replace it with one whose
+        # 429 and 503 retries the worklog writers can turn off
+        session = ScopedRetrySession(timeout=self._session.timeout)
+        session.cert = self._session.cert
+        self._session = session
+
+        super()._add_ssl_cert_verif_strategy_to_session()
+        adapter: HTTPAdapter = self._adapter()
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+
+class SSLContextJIRA(PooledJIRA):
+    """Jira client trusting the certificates of an SSL context, e.g. a downloaded chain.
+
+    Parameters:
+    ssl_context (ssl.SSLContext): The context verifying the Jira server.
+    args, kwargs: The PooledJIRA arguments.
+    """
+
+    def __init__(self, *args: Any, ssl_context: ssl.SSLContext, **kwargs: Any):
+        self._ssl_context: ssl.SSLContext = ssl_context
+        super().__init__(*args, **kwargs)
+
+    def _adapter(self) -> HTTPAdapter:
+        return SSLContextAdapter(self._ssl_context, pool_maxsize=self._pool_maxsize)
+
+    def _add_ssl_cert_verif_strategy_to_session(self) -> None:
+        super()._add_ssl_cert_verif_strategy_to_session()
+        # The context verifies the server, not a CA bundle path
+        self._session.verify = True
@@ -1,13 +1,41 @@
 import datetime
 import getpass
-from typing import Any
+import io
+import itertools
+import threading
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import BinaryIO, Iterable, Optional, Union
 
-import customtkinter as ctk
 import pandas as pd
-from jira import JIRA, Issue, exceptions
-
-from constants import HOUR_TO_SECONDS
+from jira import JIRA, exceptions
+
+from constants import DEFAULT_MAX_WORKERS, HOUR_TO_SECONDS, JIRA_REQUESTS_PER_SECOND
+from custom_exceptions import RunCancelledError
+from issue_state import IssueStateCache
+from jira_metrics import (
+    JiraMetrics,
+    get_jira_metrics,
+    report_jira_metrics,
+    reset_jira_metrics,
+)
 from logging_conf import logger
+from profiling import profile_scope, profiling_run
+from progress import FETCH, PARSE, PLAN, POST, ProgressReporter
+from run_journal import RunJournal
+from workbook_cache import WorkbookCache
+from worklog_ledger import WorklogLedger
+from worklog_plan import (
+    CREATE,
+    WorklogAction,
+    WorklogPlan,
+    build_reconcile_plan,
+    build_team_reconcile_plans,
+    build_worklog_plan,
+    collect_issue_keys,
+)
+from worklog_writer import WorklogWriter
 
 # TODO: it is usefull to keep dataframe colums as datetime instead of strings?
 
@@ -21,28 +49,40 @@ def get_user_id() -> str:
     return getpass.getuser()
 
 
-def parse_jira_map_file(jira_map_file) -> pd.DataFrame:
-    # First, read the Multi-index rows
-    multiindex_rows: pd.DataFrame = pd.read_excel(
-        jira_map_file,
+def read_file_to_buffer(file_path: Union[str, Path, BinaryIO]) -> BinaryIO:
+    """Read a whole file in a single request, so a network share is hit only once.
+
+    Parameters:
+    file_path (Union[str, Path, BinaryIO]): The file to read, or an already read buffer.
+
+    Returns:
+    BinaryIO: An in-memory buffer with the file content.
+    """
+    if hasattr(file_path, "read"):
+        return file_path
+
+    with open(file_path, "rb") as file:
+        return io.BytesIO(file.read())
+
+
+def parse_jira_map_file(jira_map_file) -> pd.Series:
+    # Parse the whole sheet once, the first row is the header
+    raw_map: pd.DataFrame = pd.read_excel(
+        read_file_to_buffer(jira_map_file),
         header=None,
         index_col=None,
-        usecols="A:C",
-        skiprows=1,
-    ).dropna(how="all", axis=0)
+    )
 
-    # fill in Null values in rows
-    multiindex_rows.iloc[:, 0:2] = multiindex_rows.iloc[:, 0:2].ffill()
+    # Remove empty rows
+    jira_map: pd.DataFrame = raw_map.iloc[1:].dropna(how="all", axis=0).infer_objects()
 
-    jira_map: pd.DataFrame = (
-        pd.read_excel(
-            jira_map_file,
-            index_col=None,
-        )
-    ).dropna(how="all", axis=0)
+    # Take the Multi-index rows and fill in Null values in rows
+    multiindex_rows: pd.DataFrame = jira_map.iloc[:, 0:3].copy()
+    multiindex_rows.iloc[:, 0:2] = multiindex_rows.iloc[:, 0:2].ffill()
 
     # create multiindex column names and drop first 3 columns
     jira_map = jira_map.iloc[:, 3:]
+    jira_map.columns = raw_map.iloc[0, 3:].to_list()
     jira_map.index = pd.MultiIndex.from_arrays(multiindex_rows.values.T)
 
     # Remove empty rows
@@ -54,39 +94,93 @@ def parse_jira_map_file(jira_map_file) -> pd.DataFrame:
     return jira_map
 
 
-def parse_input_excel_report(excel_path, req_person) -> pd.DataFrame:
-    # First, read the Multi-index rows
-    multiindex_rows: pd.DataFrame = pd.read_excel(
-        excel_path,
+def parse_input_excel_report(
+    excel_path, req_person, req_month: Optional[int] = None
+) -> pd.DataFrame:
+    """Parse the sheet of a user of the Excel report.
+
+    Parameters:
+    excel_path: The Excel report, as a path or a buffer.
+    req_person (str): The sheet of the user.
+    req_month (int, optional): If given, the sheet is streamed with a read-only
+        workbook and only the columns of this month are kept.
+
+    Returns:
+    pd.DataFrame: The hours by row (multi-index) and day (columns).
+    """
+    if req_month is not None:
+        return parse_input_excel_report_month(excel_path, req_person, req_month)
+
+    # Parse the whole sheet once
+    raw_report: pd.DataFrame = pd.read_excel(
+        read_file_to_buffer(excel_path),
         sheet_name=req_person,
         header=None,
         index_col=None,
-        usecols="B:D",
-        skiprows=7,
-    ).dropna(how="all", axis=0)
+    )
+
+    return parse_report_sheet(raw_report)
+
+
+def parse_team_excel_report(
+    excel_path, users: Iterable[str]
+) -> dict[str, pd.DataFrame]:
+    """Parse the sheets of many users with a single read of the Excel report.
+
+    Parameters:
+    excel_path: The Excel report, as a path or a buffer.
+    users (Iterable[str]): The sheets of the users.
+
+    Returns:
+    dict[str, pd.DataFrame]: The hours by row and day of each user with a sheet.
+    """
+    raw_reports: dict[str, pd.DataFrame] = pd.read_excel(
+        read_file_to_buffer(excel_path),
+        sheet_name=None,
+        header=None,
+        index_col=None,
+    )
 
-    # fill in Null values in rows
-    multiindex_rows.iloc[:, 0:2] = multiindex_rows.iloc[:, 0:2].ffill()
+    missing_users: list[str] = [user for user in users if user not in raw_reports]
+    if missing_users:
+        logger.error("Missing %s sheet(s) in the file.", ", ".join(missing_users))
 
-    # Read excel report without the last column "TOTALE"
+    return {
+        user: parse_report_sheet(raw_reports[user])
+        for user in users
+        if user in raw_reports
+    }
+
+
+def parse_report_sheet(raw_report: pd.DataFrame) -> pd.DataFrame:
+    """Build the hours frame from a report sheet read without header.
+
+    Parameters:
+    raw_report (pd.DataFrame): The sheet cells, with positional rows and columns.
+
+    Returns:
+    pd.DataFrame: The hours by row (multi-index) and day (columns).
+    """
+    # The header is on the second row and the report rows start after 5 more header rows
+    header: pd.Series = raw_report.iloc[1]
+
+    # Drop the last column "TOTALE" and empty rows and columns
     df: pd.DataFrame = (
-        pd.read_excel(
-            excel_path,
-            header=1,
-            index_col=None,
-            skiprows=[2, 3, 4, 5, 6],
-            sheet_name=req_person,
-            usecols=lambda x: x != "TOTALE",
-        )
+        raw_report.iloc[7:, (header != "TOTALE").to_numpy()]
         .dropna(how="all", axis=0)
         .dropna(how="all", axis=1)
+        .infer_objects()
     )
 
-    # Just name of header
-    df.columns.name = "Date"
+    # Take the Multi-index rows (columns B:D) and fill in Null values in rows
+    multiindex_rows: pd.DataFrame = (
+        raw_report.iloc[:, 1:4].loc[df.index].infer_objects()
+    )
+    multiindex_rows.iloc[:, 0:2] = multiindex_rows.iloc[:, 0:2].ffill()
 
     # drop first 3 columns that will be substituted by the new index
     df = df.iloc[:, 3:]
+    df.columns = pd.Index(header[df.columns].to_list(), name="Date")
 
     # create multiindex column names
     df.index = pd.MultiIndex.from_arrays(multiindex_rows.values.T)
@@ -98,211 +192,744 @@ def parse_input_excel_report(excel_path, req_person) -> pd.DataFrame:
     return df
 
 
-def is_issue_open_on_date(issue: str, date: str, jira: JIRA) -> str:
-    """Check if the last status of the issue before a specific date was Open.
+def parse_input_excel_report_month(
+    excel_path, req_person: str, req_month: int
+) -> pd.DataFrame:
+    """Stream the sheet of a user keeping only the columns of the requested month.
+
+    The read-only workbook never holds the whole sheet in memory, so multi-year
+    reports are parsed in a fraction of the time and memory. The year is the
+    one of the first dated column.
 
     Parameters:
-    issue (str): The Jira issue key.
-    date (str): The date to check, formatted as 'YYYY-MM-DD'.
-    jira (JIRA): Authenticated Jira client instance.
+    excel_path: The Excel report, as a path or a buffer.
+    req_person (str): The sheet of the user.
+    req_month (int): The month to keep.
 
     Returns:
-    str: The issue status on the given date, assuming 'open' as the initial state.
+    pd.DataFrame: The hours of the month by row (multi-index) and day (columns).
     """
+    # Imported here: only the streaming reader needs openpyxl directly
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(
+        read_file_to_buffer(excel_path), read_only=True, data_only=True
+    )
     try:
-        # Fetch issue's changelog to get its history
-        issue_changelog: Issue = jira.issue(issue, expand="changelog")
-        last_status = "open"  # Default status is 'open' if no transitions occurred before the date
-
-        # Sort histories by creation date in chronological order
-        sorted_histories = sorted(
-            issue_changelog.changelog.histories,
-            key=lambda h: datetime.datetime.strptime(
-                h.created, "%Y-%m-%dT%H:%M:%S.%f%z"
-            ),
-        )
+        sheet_rows = workbook[req_person].iter_rows(values_only=True)
 
-        # Traverse through the sorted changelog and find status transitions
-        for history in sorted_histories:
-            transition_date = datetime.datetime.strptime(
-                history.created, "%Y-%m-%dT%H:%M:%S.%f%z"
-            ).date()
+        # The header is on the second row
+        next(sheet_rows)
+        header: tuple = next(sheet_rows)
+        dates: list[datetime.datetime] = [
+            value for value in header if isinstance(value, datetime.datetime)
+        ]
+        month_columns: list[int] = [
+            column
+            for column, value in enumerate(header)
+            if isinstance(value, datetime.datetime)
+            and value.year == dates[0].year
+            and value.month == req_month
+        ]
 
-            if transition_date < datetime.datetime.strptime(date, "%Y-%m-%d").date():
-                # Check if there was a status transition before the date
-                for item in history.items:
-                    if item.field == "status":
-                        last_status = (
-                            item.toString.lower()
-                        )  # Update the last known status
+        # Skip the other 5 header rows and keep index (B:D) and month columns
+        index_rows: list[tuple] = []
+        month_rows: list[list] = []
+        for row in itertools.islice(sheet_rows, 5, None):
+            row_index: tuple = row[1:4]
+            row_hours: list = [
+                row[column] if column < len(row) else None for column in month_columns
+            ]
+            if any(value is not None for value in row_index):
+                index_rows.append(row_index)
+                month_rows.append(row_hours)
+    finally:
+        workbook.close()
+
+    multiindex_rows = pd.DataFrame(index_rows, columns=range(1, 4))
+    multiindex_rows.iloc[:, 0:2] = multiindex_rows.iloc[:, 0:2].ffill()
 
-            else:
-                # Once we hit a transition after the date, break the loop
-                break
+    df = pd.DataFrame(
+        month_rows,
+        index=pd.MultiIndex.from_arrays(multiindex_rows.values.T),
+        columns=pd.Index([header[column] for column in month_columns], name="Date"),
+        dtype=float,
+    )
 
-        return last_status == "open"
+    # Remove empty colums and rows
+    df.dropna(how="all", axis=0, inplace=True)
+    df.dropna(how="all", axis=1, inplace=True)
 
-    except exceptions.JIRAError as e:
-        logger.error(f"Error fetching issue history for {issue}: {e}")
-        return False
+    return df
 
 
-def log_work_in_batches(
-    jira: JIRA, df_month_to_log: pd.DataFrame, jira_map: pd.DataFrame, progress_bar_var
-) -> None:
-    """Log work hours in batches to JIRA issues based on provided dataframes. If an activity is linked to multiple issues, time is split equally between them.
+def load_jira_map(
+    jira_map_file: str, workbook_cache: Optional[WorkbookCache] = None
+) -> pd.Series:
+    """Parse the jira map file, or take it from the workbook cache if unchanged."""
+    if workbook_cache is None:
+        return parse_jira_map_file(jira_map_file)
 
-    Parameters:
-    jira (JIRA): An authenticated JIRA client instance.
-    df_month_to_log (pd.DataFrame): DataFrame containing the hours of the selected month to be logged.
-    jira_map (pd.DataFrame): DataFrame mapping the DataFrame indices to JIRA issue keys.
-    progress_bar_var (tk.Variable): Tkinter variable to update the progress bar.
-    """
+    return workbook_cache.get_or_parse(jira_map_file, parse_jira_map_file)
+
+
+def load_excel_report(
+    excel_path: str,
+    req_person: str,
+    req_month: Optional[int] = None,
+    workbook_cache: Optional[WorkbookCache] = None,
+) -> pd.DataFrame:
+    """Parse the sheet of a user, or take it from the workbook cache if unchanged."""
+    if workbook_cache is None:
+        return parse_input_excel_report(excel_path, req_person, req_month)
+
+    return workbook_cache.get_or_parse(
+        excel_path, parse_input_excel_report, req_person, req_month
+    )
+
+
+def get_author_id(jira: JIRA) -> str:
+    """Fetch the account ID of the Jira user the worklogs are logged as."""
     try:
-        # Fetch the current user's ID from JIRA
-        author_ID: str = jira.myself()["accountId"]
+        return jira.myself()["accountId"]
     except Exception as e:
         logger.error(f"Failed to fetch author name: {e}")
         raise
 
-    total_worklog_number: int = df_month_to_log.shape[0]
-    progress_bar_value: float = 0.0
-    step_size: float = 1 / total_worklog_number if total_worklog_number else 1
-
-    # Only update progress bar every 5 logs for efficiency
-    update_progress_threshold = 5
-    log_count = 0
-
-    # Iterate over each issues number and its corresponding work log group
-    for issues, group in df_month_to_log.groupby(jira_map):
-        # Transform group into a Series and collapse more rows mapped with the same issue
-        group: pd.Series = group.sum()
-
-        issues_splitted = issues.split(",")
-
-        # If activity maps to multiple issues, split the time equally
-        num_issues: int = len(issues_splitted)
-        group_for_issue = group / num_issues
-
-        for issue in issues_splitted:
-            try:
-                # Fetch existing worklogs for the issue
-                existing_worklogs = jira.worklogs(issue)
-
-                # Get a set of days on which the author has already logged work
-                this_author_worklogs_days: set[str] = {
-                    datetime.datetime.strptime(
-                        worklog.started, "%Y-%m-%dT%H:%M:%S.%f%z"
-                    ).strftime("%Y-%m-%d")
-                    for worklog in existing_worklogs
-                    if worklog.author.accountId == author_ID
-                }
 
-                # Create a list of worklog entries to be added
-                worklog_entries: list[dict[str, Any]] = []
-                for day, hours in group_for_issue.items():
-                    day_str = day.strftime("%Y-%m-%d")
-                    if hours and day_str not in this_author_worklogs_days:
-                        # New worklog to be log on Jira
-                        if is_issue_open_on_date(issue, day_str, jira):
-                            worklog_entries.append(
-                                {
-                                    "timeSpentSeconds": int(hours * HOUR_TO_SECONDS),
-                                    "started": day,
-                                }
-                            )
-                        else:
-                            logger.info(
-                                f"Issue {issue} was not 'open' on {day_str}. Skipping log."
-                            )
-                    else:
-                        # Cancellare o modificare il worklog su jira con il valore letto dall'excel se diverso
-                        pass
+def select_month_to_log(
+    df: pd.DataFrame, jira_map: pd.Series, req_month: int
+) -> pd.DataFrame:
+    """Keep the requested month of the report and the rows mapped to a Jira issue.
 
-                # If there are any worklog entries to add, attempt to log them in JIRA
-                if worklog_entries:
-                    try:
-                        for entry in worklog_entries:
-                            jira.add_worklog(issue=issue, **entry)
-                        logger.info(
-                            f"Logged {len(worklog_entries)} worklog(s) for issue {issue}"
-                        )
+    Parameters:
+    df (pd.DataFrame): The parsed report of a user.
+    jira_map (pd.Series): Series mapping the report rows to JIRA issue keys.
+    req_month (int): The month to log.
 
-                    except exceptions.JIRAError:
-                        logger.warning(
-                            f"Cannot log work for the issue {issue}, issue might be closed."
-                        )
-                else:  # FIXME: this message is log only if the issue has no entry date
-                    # Log information if work has already been logged for these days
-                    for day in group_for_issue.index:
-                        if day.strftime("%Y-%m-%d") in this_author_worklogs_days:
-                            logger.info(
-                                f"Work already logged for issue {issue} on {day.strftime('%Y-%m-%d')}"
-                            )
+    Returns:
+    pd.DataFrame: The hours of the month to be logged.
+    """
+    # Keep only the requested month and drop the rest
+    first_day_of_req_month: datetime.datetime = datetime.datetime(
+        df.columns[0].year, req_month, 1, 0, 0
+    )
+    last_day_of_req_month: datetime.datetime = (
+        first_day_of_req_month + pd.offsets.MonthEnd()
+    )
+
+    df_month: pd.DataFrame = df.loc[
+        :,
+        first_day_of_req_month:last_day_of_req_month,
+    ].dropna(how="all", axis=0)
+
+    # Take the Jira issue associated with the row and signalize the ones with no map
+    row_without_jira_issue: list[tuple] = list(
+        set(df_month.index) - set(jira_map.index)
+    )
+    logger.info(
+        "Rows without Jira issues: "
+        + "\n".join([str(i) for i in row_without_jira_issue])
+    )
+
+    return df_month[df_month.index.isin(jira_map.index.to_list())]
 
-            except exceptions.JIRAError as e:
-                logger.warning(f"Failed to fetch worklogs for issue {issue}: {e}")
-
-            finally:
-                # Update progress bar in batches
-                log_count += 1
-                if (
-                    log_count % update_progress_threshold == 0
-                    or log_count == total_worklog_number
-                ):
-                    progress_bar_value = progress_bar_value + (
-                        update_progress_threshold * step_size
+
+def plan_worklog(
+    jira: JIRA,
+    df_month_to_log: pd.DataFrame,
+    jira_map: pd.Series,
+    req_month: int = 0,
+    req_person: str = "",
+    ledger: Optional[WorklogLedger] = None,
+    reconcile: bool = False,
+    progress: Optional[ProgressReporter] = None,
+    journal: Optional[RunJournal] = None,
+) -> tuple[WorklogPlan, IssueStateCache]:
+    """Prefetch the Jira state of the mapped issues and decide which worklogs to write.
+
+    Parameters:
+    jira (JIRA): An authenticated JIRA client instance.
+    df_month_to_log (pd.DataFrame): DataFrame containing the hours of the selected month to be logged.
+    jira_map (pd.Series): Series mapping the DataFrame indices to JIRA issue keys.
+    req_month (int): The month to log, stored in the plan.
+    req_person (str): The report sheet, stored in the plan.
+    ledger (WorklogLedger, optional): Ledger of the issues synced by previous runs.
+    reconcile (bool): Also update and delete the worklogs not matching the report,
+        instead of only creating the missing ones.
+    progress (ProgressReporter, optional): Receives the phases of the run.
+    journal (RunJournal, optional): Checkpoint journal of the run, the issues it
+        holds are not fetched again.
+
+    Returns:
+    tuple[WorklogPlan, IssueStateCache]: The plan and the Jira state it was built from.
+    """
+    progress = progress or ProgressReporter()
+
+    progress.begin(FETCH)
+    with profile_scope("fetch"):
+        author_ID: str = get_author_id(jira)
+
+        # Worklogs and status timelines of all the mapped issues are fetched upfront
+        # with a few searches (only the stale ones if a ledger is used) and shared by
+        # all the days of each issue. Reconciliation must see the worklogs changed by
+        # hand, so it always fetches them, on every mapped issue: the hours of an
+        # issue may have been removed from the month.
+        issue_state = IssueStateCache(jira, ledger, journal)
+        issue_state.prefetch(
+            collect_issue_keys(
+                jira_map
+                if reconcile
+                else jira_map[jira_map.index.isin(df_month_to_log.index)]
+            ),
+            refresh=reconcile,
+        )
+
+    build_plan = build_reconcile_plan if reconcile else build_worklog_plan
+    progress.begin(PLAN)
+    with profile_scope("decide"):
+        plan: WorklogPlan = build_plan(
+            df_month_to_log, jira_map, issue_state, author_ID, req_person, req_month
+        )
+    logger.info(f"Worklog plan: {plan.summary()}")
+
+    return plan, issue_state
+
+
+def apply_worklog_plan(
+    jira: JIRA,
+    plan: WorklogPlan,
+    progress: ProgressReporter,
+    jira_mode: int = 0,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    issue_state: Optional[IssueStateCache] = None,
+    writer: Optional[WorklogWriter] = None,
+    ledger: Optional[WorklogLedger] = None,
+) -> dict[str, int]:
+    """Create, update and delete the worklogs of a plan in Jira.
+
+    Parameters:
+    jira (JIRA): An authenticated JIRA client instance.
+    plan (WorklogPlan): The plan to apply.
+    progress (ProgressReporter): Receives the written worklogs.
+    jira_mode (int): Key of the JIRA_MODE in use, selecting the request rate limit.
+    max_workers (int): Maximum number of worklogs written concurrently.
+    issue_state (IssueStateCache, optional): The Jira state the plan was built from.
+        If missing, the plan comes from a previous run: the worklogs logged since then
+        are fetched again and skipped, as well as the updates and deletes of worklogs
+        gone in the meantime, so a partially applied plan can be re-applied.
+    writer (WorklogWriter, optional): Writer shared with other plans applied at the
+        same time, so that they share rate limit and concurrency.
+    ledger (WorklogLedger, optional): Ledger used if `issue_state` is missing.
+
+    Returns:
+    dict[str, int]: The number of worklogs "logged", "updated", "deleted" and "failed".
+    """
+    writes: list[WorklogAction] = plan.writes
+
+    if issue_state is None:
+        if get_author_id(jira) != plan.author_id:
+            logger.error("The worklog plan was created for another Jira account.")
+            return {"logged": 0, "updated": 0, "deleted": 0, "failed": 0}
+
+        progress.begin(FETCH)
+        issue_state = IssueStateCache(jira, ledger)
+        issue_state.prefetch({action.issue for action in writes})
+
+        author_worklogs: dict[str, Optional[dict[str, str]]] = {}
+        pending_writes: list[WorklogAction] = []
+        for action in writes:
+            if action.issue not in author_worklogs:
+                try:
+                    # Day of each worklog of the author, by worklog id
+                    author_worklogs[action.issue] = {
+                        record.worklog_id: record.day
+                        for record in issue_state.worklogs(action.issue)
+                        if record.author_id == plan.author_id
+                    }
+                except exceptions.JIRAError as e:
+                    logger.warning(
+                        f"Failed to fetch worklogs for issue {action.issue}: {e}"
                     )
-                    # Ensure progress bar maxes at 1.0
-                    progress_bar_var.set(min(progress_bar_value, 1.0))
+                    author_worklogs[action.issue] = None
+
+            if author_worklogs[action.issue] is None:
+                continue
+            if action.action == CREATE:
+                if action.day in author_worklogs[action.issue].values():
+                    logger.info(
+                        f"Work already logged for issue {action.issue} on {action.day}"
+                    )
+                    continue
+            elif action.worklog_id not in author_worklogs[action.issue]:
+                logger.info(
+                    f"Worklog {action.worklog_id} of issue {action.issue} no longer exists"
+                )
+                continue
+            pending_writes.append(action)
+
+        writes = pending_writes
+
+    # Attempt to write all the worklogs in JIRA concurrently
+    if writer is None:
+        writer = WorklogWriter(
+            jira, issue_state, max_workers, JIRA_REQUESTS_PER_SECOND[jira_mode]
+        )
+    progress.begin(POST, len(writes))
+    counts: dict[str, int] = writer.write_worklogs(
+        writes, lambda done_actions, total_actions: progress.advance()
+    )
 
+    return counts
 
-def load_worklog(
+
+def apply_worklog_plan_file(
+    jira: JIRA,
+    plan_file: str,
+    progress: ProgressReporter,
+    jira_mode: int = 0,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    ledger: Optional[WorklogLedger] = None,
+) -> dict[str, int]:
+    """Create in Jira the worklogs of a plan saved by a previous run."""
+    plan: WorklogPlan = WorklogPlan.load(plan_file)
+    logger.info(f"Applying worklog plan of {plan.user} created at {plan.created_at}")
+
+    track_requests(jira, progress)
+    counts: dict[str, int] = apply_worklog_plan(
+        jira, plan, progress, jira_mode, max_workers, ledger=ledger
+    )
+    progress.finish()
+
+    logger.info("Worklog loaded!")
+    return counts
+
+
+def track_requests(jira: JIRA, progress: ProgressReporter) -> None:
+    """Report the rate of the requests counted by the metrics of the Jira client."""
+    metrics: Optional[JiraMetrics] = get_jira_metrics(jira)
+    progress.count_requests(metrics.total_calls if metrics is not None else None)
+
+
+def prepare_worklog_plan(
     jira: JIRA,
     excel_report: str,
     jira_map_file: str,
     req_month: int,
     req_person: str,
-    progress_bar_var: ctk.DoubleVar,
-) -> None:
+    streaming: bool = False,
+    workbook_cache: Optional[WorkbookCache] = None,
+    ledger: Optional[WorklogLedger] = None,
+    reconcile: bool = False,
+    progress: Optional[ProgressReporter] = None,
+    journal: Optional[RunJournal] = None,
+) -> tuple[WorklogPlan, IssueStateCache]:
+    """Read the Excel files and plan the worklogs of a user for a month.
+
+    Returns:
+    tuple[WorklogPlan, IssueStateCache]: The plan and the Jira state it was built from.
+    """
+    progress = progress or ProgressReporter()
+    progress.begin(PARSE)
+
     # Read the supporting mapping file
-    jira_map: pd.DataFrame = parse_jira_map_file(jira_map_file)
+    with profile_scope("map parse"):
+        jira_map: pd.Series = load_jira_map(jira_map_file, workbook_cache)
 
     # Read the report Excel file
+    with profile_scope("report parse"):
+        df: pd.DataFrame = load_excel_report(
+            excel_report, req_person, req_month if streaming else None, workbook_cache
+        )
+
+    with profile_scope("month slicing"):
+        df_month_to_log: pd.DataFrame = select_month_to_log(df, jira_map, req_month)
+
+    # Decide the worklogs to write
+    return plan_worklog(
+        jira,
+        df_month_to_log,
+        jira_map,
+        req_month,
+        req_person,
+        ledger,
+        reconcile,
+        progress,
+        journal,
+    )
+
+
+def check_cancelled(cancel_event: Optional[threading.Event]) -> None:
+    """Stop the run between two phases if it was cancelled.
+
+    Raises:
+    RunCancelledError: If the cancel event is set.
+    """
+    if cancel_event is not None and cancel_event.is_set():
+        raise RunCancelledError()
+
+
+def open_run_journal(
+    jira: JIRA,
+    excel_report: str,
+    jira_map_file: str,
+    users: Iterable[str],
+    resume: bool,
+    **options,
+) -> RunJournal:
+    """Open the checkpoint journal of a run, resuming the run with the same inputs."""
+    return RunJournal.for_inputs(
+        excel_report,
+        jira_map_file,
+        users,
+        resume,
+        server=jira.server_url,
+        **options,
+    )
+
+
+def load_worklog(
+    jira: JIRA,
+    excel_report: str,
+    jira_map_file: str,
+    req_month: int,
+    req_person: str,
+    progress: ProgressReporter,
+    jira_mode: int = 0,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    plan_file: Optional[str] = None,
+    streaming: bool = False,
+    workbook_cache: Optional[WorkbookCache] = None,
+    ledger: Optional[WorklogLedger] = None,
+    reconcile: bool = False,
+    profile_dir: Optional[str] = None,
+    cancel_event: Optional[threading.Event] = None,
+    run_journal: bool = False,
+    resume: bool = True,
+) -> Optional[dict[str, int]]:
+    reset_jira_metrics(jira)
+    track_requests(jira, progress)
+    journal: Optional[RunJournal] = None
+    completed = False
     try:
-        df: pd.DataFrame = parse_input_excel_report(excel_report, req_person)
+        if run_journal:
+            journal = open_run_journal(
+                jira,
+                excel_report,
+                jira_map_file,
+                [req_person],
+                resume,
+                month=req_month,
+                jira_mode=jira_mode,
+                reconcile=reconcile,
+            )
+
+        with profiling_run(profile_dir):
+            plan, issue_state = prepare_worklog_plan(
+                jira,
+                excel_report,
+                jira_map_file,
+                req_month,
+                req_person,
+                streaming,
+                workbook_cache,
+                ledger,
+                reconcile,
+                progress,
+                journal,
+            )
+            if plan_file:
+                plan.save(plan_file)
+            check_cancelled(cancel_event)
+
+            # Batch log the planned worklogs
+            with profile_scope("post"):
+                writer = WorklogWriter(
+                    jira,
+                    issue_state,
+                    max_workers,
+                    JIRA_REQUESTS_PER_SECOND[jira_mode],
+                    cancel_event,
+                )
+                counts: dict[str, int] = apply_worklog_plan(
+                    jira, plan, progress, jira_mode, max_workers, issue_state, writer
+                )
+
+        completed = True
+        progress.finish()
+        logger.info("Worklog loaded!")
+        return counts
 
-        # Keep only the requested month and drop the rest
-        first_day_of_req_month: datetime.datetime = datetime.datetime(
-            df.columns[0].year, req_month, 1, 0, 0
-        )
-        last_day_of_req_month: datetime.datetime = (
-            first_day_of_req_month + pd.offsets.MonthEnd()
+    except RunCancelledError as e:
+        logger.warning(f"{e}. Start the same run again to resume it.")
+        return None
+
+    except Exception as e:
+        logger.error(f"Failed to load the worklog of {req_person}: {e}")
+        return None
+
+    finally:
+        if journal is not None:
+            journal.close(completed)
+        report_jira_metrics(jira)
+
+
+def report_already_planned(user: str, plan: WorklogPlan) -> None:
+    """Warn about the hours of a user not logged because another user planned those days."""
+    seconds_by_issue: dict[str, int] = defaultdict(int)
+    days_by_issue: dict[str, int] = defaultdict(int)
+    for action in plan.already_planned:
+        seconds_by_issue[action.issue] += action.seconds
+        days_by_issue[action.issue] += 1
+    if not seconds_by_issue:
+        return
+
+    logger.warning(
+        f"{sum(seconds_by_issue.values()) / HOUR_TO_SECONDS:.2f} hour(s) of {user} "
+        "not logged, the days were already planned for another user of the same "
+        "Jira account: "
+        + ", ".join(
+            f"{issue} {seconds / HOUR_TO_SECONDS:.2f}h on {days_by_issue[issue]} day(s)"
+            for issue, seconds in seconds_by_issue.items()
         )
-        # first_day_of_req_month.strftime("%Y-%m-%d %H:%M:%S")
+    )
 
-        df_month: pd.DataFrame = df.loc[
-            :,
-            first_day_of_req_month:last_day_of_req_month,
-        ].dropna(how="all", axis=0)
 
-        # Take the Jira issue associated with the row and signalize the ones with no map
-        row_without_jira_issue: list[tuple] = list(
-            set(df_month.index) - set(jira_map.index)
+def load_team_worklog(
+    jira: JIRA,
+    excel_report: str,
+    jira_map_file: str,
+    req_month: int,
+    users: Iterable[str],
+    progress: ProgressReporter,
+    jira_mode: int = 0,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    workbook_cache: Optional[WorkbookCache] = None,
+    ledger: Optional[WorklogLedger] = None,
+    profile_dir: Optional[str] = None,
+    cancel_event: Optional[threading.Event] = None,
+    run_journal: bool = False,
+    resume: bool = True,
+    reconcile: bool = False,
+) -> dict[str, dict[str, int]]:
+    """Log the month of every user of a team reading the Excel report once.
+
+    The worklogs are created as the authenticated Jira account, exactly as when the
+    tool is run once per user. Plans are built one user after the other, so a day
+    planned for a user is not planned again for the same issue by the next ones:
+    the hours skipped this way are reported for each user. Then the users are
+    applied in parallel through one writer, sharing the Jira session, rate limit
+    and concurrency bound, each with its own progress.
+
+    Parameters:
+    jira (JIRA): An authenticated JIRA client instance.
+    excel_report (str): The Excel report with a sheet per user.
+    jira_map_file (str): The jira map file.
+    req_month (int): The month to log.
+    users (Iterable[str]): The sheets of the users to log.
+    progress (ProgressReporter): Receives the phases and the written worklogs.
+    jira_mode (int): Key of the JIRA_MODE in use, selecting the request rate limit.
+    max_workers (int): Maximum number of worklogs posted concurrently.
+    workbook_cache (WorkbookCache, optional): Cache of the parsed workbooks.
+    ledger (WorklogLedger, optional): Ledger of the issues synced by previous runs.
+    profile_dir (str, optional): If given, the stages are profiled into a new
+        directory under it.
+    cancel_event (threading.Event, optional): Once set, the run stops after the
+        current phase or worklog writes.
+    run_journal (bool): Checkpoint the run in a journal, so that an interrupted
+        run with the same inputs resumes without fetching the issues again.
+    resume (bool): Resume from an existing journal, otherwise discard it.
+    reconcile (bool): Also update and delete the worklogs of the account not
+        matching the report of the team, instead of only creating the missing ones.
+
+    Returns:
+    dict[str, dict[str, int]]: The plan summary, the "already planned seconds"
+    not logged and the "logged" and "failed" counts of each user.
+
+    Raises:
+    RunCancelledError: If the run was cancelled.
+    """
+    users = list(users)
+    reset_jira_metrics(jira)
+    track_requests(jira, progress)
+    journal: Optional[RunJournal] = (
+        open_run_journal(
+            jira,
+            excel_report,
+            jira_map_file,
+            users,
+            resume,
+            month=req_month,
+            jira_mode=jira_mode,
+            reconcile=reconcile,
         )
-        logger.info(
-            "Rows without Jira issues: "
-            + "\n".join([str(i) for i in row_without_jira_issue])
+        if run_journal
+        else None
+    )
+    completed = False
+    try:
+        results: dict[str, dict[str, int]] = _load_team_worklog(
+            jira,
+            excel_report,
+            jira_map_file,
+            req_month,
+            users,
+            progress,
+            jira_mode,
+            max_workers,
+            workbook_cache,
+            ledger,
+            profile_dir,
+            cancel_event,
+            journal,
+            reconcile,
         )
+        completed = True
+    finally:
+        if journal is not None:
+            journal.close(completed)
+        report_jira_metrics(jira)
 
-        df_month_to_log: pd.DataFrame = df_month[
-            df_month.index.isin(jira_map.index.to_list())
-        ]
+    return results
 
-        # Batch log the related workload if not nan
-        log_work_in_batches(jira, df_month_to_log, jira_map, progress_bar_var)
 
-        logger.info("Worklog loaded!")
+def _load_team_worklog(
+    jira: JIRA,
+    excel_report: str,
+    jira_map_file: str,
+    req_month: int,
+    users: list[str],
+    progress: ProgressReporter,
+    jira_mode: int,
+    max_workers: int,
+    workbook_cache: Optional[WorkbookCache],
+    ledger: Optional[WorklogLedger],
+    profile_dir: Optional[str],
+    cancel_event: Optional[threading.Event],
+    journal: Optional[RunJournal],
+    reconcile: bool,
+) -> dict[str, dict[str, int]]:
+    with profiling_run(profile_dir):
+        progress.begin(PARSE)
+        with profile_scope("map parse"):
+            jira_map: pd.Series = load_jira_map(jira_map_file, workbook_cache)
+
+        # Read all the sheets at once
+        with profile_scope("report parse"):
+            if workbook_cache is None:
+                reports: dict[str, pd.DataFrame] = parse_team_excel_report(
+                    excel_report, users
+                )
+            else:
+                reports = workbook_cache.get_or_parse(
+                    excel_report, parse_team_excel_report, users
+                )
+
+        with profile_scope("month slicing"):
+            months_to_log: dict[str, pd.DataFrame] = {
+                user: select_month_to_log(df, jira_map, req_month)
+                for user, df in reports.items()
+            }
+        check_cancelled(cancel_event)
+
+        # One prefetch for the issues of the whole team, all the mapped ones when
+        # reconciling, as in a single user run
+        progress.begin(FETCH)
+        with profile_scope("fetch"):
+            author_ID: str = get_author_id(jira)
+            issue_state = IssueStateCache(jira, ledger, journal)
+            issue_state.prefetch(
+                (
+                    collect_issue_keys(jira_map)
+                    if reconcile
+                    else set().union(
+                        *(
+                            collect_issue_keys(
+                                jira_map[jira_map.index.isin(df_month.index)]
+                            )
+                            for df_month in months_to_log.values()
+                        )
+                    )
+                ),
+                refresh=reconcile,
+            )
+
+        progress.begin(PLAN)
+        with profile_scope("decide"):
+            if reconcile:
+                plans: dict[str, WorklogPlan] = build_team_reconcile_plans(
+                    months_to_log, jira_map, issue_state, author_ID, req_month
+                )
+            else:
+                planned_days: dict[str, set[str]] = {}
+                plans = {
+                    user: build_worklog_plan(
+                        df_month_to_log,
+                        jira_map,
+                        issue_state,
+                        author_ID,
+                        user,
+                        req_month,
+                        planned_days,
+                    )
+                    for user, df_month_to_log in months_to_log.items()
+                }
+            for user, plan in plans.items():
+                logger.info(f"Worklog plan of {user}: {plan.summary()}")
+                report_already_planned(user, plan)
+        check_cancelled(cancel_event)
+
+        with profile_scope("post"):
+            writer = WorklogWriter(
+                jira,
+                issue_state,
+                max_workers,
+                JIRA_REQUESTS_PER_SECOND[jira_mode],
+                cancel_event,
+            )
+
+            # A progress line per user, their writes also add up to the team progress
+            user_progress: dict[str, ProgressReporter] = {
+                user: progress.for_user(user) for user in plans
+            }
+            results: dict[str, dict[str, int]] = {}
+            with ThreadPoolExecutor(max_workers=max(1, len(plans))) as executor:
+                futures: dict[Future, str] = {
+                    executor.submit(
+                        apply_worklog_plan,
+                        jira,
+                        plan,
+                        user_progress[user],
+                        jira_mode,
+                        max_workers,
+                        issue_state,
+                        writer,
+                    ): user
+                    for user, plan in plans.items()
+                }
 
-    except Exception:
-        logger.error("Missing %s sheet it the file.", req_person)
+                for future in as_completed(futures):
+                    user: str = futures[future]
+                    try:
+                        counts: dict[str, int] = future.result()
+                    except RunCancelledError:
+                        continue
+                    except Exception as e:
+                        logger.error(f"Failed to load the worklog of {user}: {e}")
+                        counts = {"logged": 0, "failed": len(plans[user].writes)}
+
+                    user_progress[user].finish()
+                    results[user] = {
+                        **plans[user].summary(),
+                        "already planned seconds": sum(
+                            action.seconds for action in plans[user].already_planned
+                        ),
+                        **counts,
+                    }
+                    logger.info(f"Worklog of {user} loaded: {results[user]}")
+        check_cancelled(cancel_event)
+
+        progress.finish()
+        logger.info("Team worklog loaded!")
+
+    return results
@@ -0,0 +1,220 @@
+"""Per-endpoint counters and latency percentiles of the requests made by the Jira client."""
+
+import json
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional, Union
+from urllib.parse import parse_qs, urlparse
+
+from constants import JIRA_METRICS_PATH
+from logging_conf import logger
+
+if TYPE_CHECKING:
+    from jira import JIRA
+    from requests import Response
+
+# The Jira session retries these responses by itself, the worklog writer retries 429 too
+RETRIED_STATUS_CODES: set[int] = {429, 503}
+PERCENTILES: list[int] = [50, 90, 99]
+
+API_PATH = re.compile(r"^.*?/rest/(?:api|agile)/[^/]+/")
+ISSUE_KEY = re.compile(r"^[A-Z][A-Z0-9_]*-\d+$")
+
+
+def endpoint_name(method: str, url: str) -> str:
+    """Return the endpoint of a request, with issue keys and ids replaced by placeholders.
+
+    Parameters:
+    method (str): The HTTP method.
+    url (str): The URL of the request.
+
+    Returns:
+    str: E.g. "GET issue/{issue} expand=changelog" or "POST issue/{issue}/worklog".
+    """
+    parsed_url = urlparse(url)
+    segments: list[str] = [
+        (
+            "{issue}"
+            if ISSUE_KEY.match(segment)
+            else "{id}" if segment.isdigit() else segment
+        )
+        for segment in API_PATH.sub("", parsed_url.path).strip("/").split("/")
+    ]
+    name: str = f"{method} {'/'.join(segments)}"
+
+    # The changelog makes an issue request much heavier, keep it apart
+    expand: list[str] = parse_qs(parsed_url.query).get("expand", [])
+    if any("changelog" in value for value in expand):
+        name += " expand=changelog"
+    return name
+
+
+def percentile(sorted_values: list[float], percent: float) -> float:
+    """Return the nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank: int = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class EndpointStats:
+    """Counters of the requests to one endpoint."""
+
+    def __init__(self):
+        self.calls = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.retried = 0
+        self.client_errors = 0
+        self.server_errors = 0
+        self.latencies: list[float] = []
+
+    def add(self, response: "Response") -> None:
+        self.calls += 1
+        body: Union[None, str, bytes] = response.request.body
+        self.bytes_sent += len(body.encode() if isinstance(body, str) else body or b"")
+        self.bytes_received += len(response.content or b"")
+        self.latencies.append(response.elapsed.total_seconds())
+
+        if response.status_code in RETRIED_STATUS_CODES:
+            self.retried += 1
+        if 400 <= response.status_code < 500:
+            self.client_errors += 1
+        elif response.status_code >= 500:
+            self.server_errors += 1
+
+    def to_dict(self) -> dict[str, Any]:
+        latencies: list[float] = sorted(self.latencies)
+        return {
+            "calls": self.calls,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "retried": self.retried,
+            "4xx": self.client_errors,
+            "5xx": self.server_errors,
+            "latency_ms": {
+                **{
+                    f"p{percent}": round(percentile(latencies, percent) * 1000, 1)
+                    for percent in PERCENTILES
+                },
+                "max": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+                "total": round(sum(latencies) * 1000, 1),
+            },
+        }
+
+
+class JiraMetrics:
+    """Collect the requests of a Jira client through a response hook of its session.
+
+    Every attempt is counted, including the ones retried by the session, so the
+    counters reflect the load put on the server. Latency is the time until the
+    response headers were received.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints: dict[str, EndpointStats] = defaultdict(EndpointStats)
+        self._started_at: float = time.time()
+
+    def install(self, jira: "JIRA") -> "JiraMetrics":
+        """Hook the metrics into the session of a Jira client."""
+        jira._session.hooks["response"].append(self._on_response)
+        return self
+
+    def reset(self) -> None:
+        """Forget the requests counted so far, e.g. at the start of a run."""
+        with self._lock:
+            self._endpoints.clear()
+            self._started_at = time.time()
+
+    def total_calls(self) -> int:
+        """Return the number of requests counted so far."""
+        with self._lock:
+            return sum(stats.calls for stats in self._endpoints.values())
+
+    def _on_response(self, response: "Response", *args, **kwargs) -> None:
+        try:
+            name: str = endpoint_name(response.request.method, response.request.url)
+            with self._lock:
+                self._endpoints[name].add(response)
+        except Exception as e:
+            # Never fail a request because of the metrics
+            logger.debug(f"Jira request not counted: {e}")
+
+    def to_dict(self) -> dict[str, Any]:
+        with self._lock:
+            endpoints: dict[str, dict[str, Any]] = {
+                name: stats.to_dict() for name, stats in sorted(self._endpoints.items())
+            }
+            started_at: float = self._started_at
+
+        return {
+            "started_at": started_at,
+            "duration_s": round(time.time() - started_at, 3),
+            "calls": sum(stats["calls"] for stats in endpoints.values()),
+            "retried": sum(stats["retried"] for stats in endpoints.values()),
+            "4xx": sum(stats["4xx"] for stats in endpoints.values()),
+            "5xx": sum(stats["5xx"] for stats in endpoints.values()),
+            "bytes_received": sum(
+                stats["bytes_received"] for stats in endpoints.values()
+            ),
+            "endpoints": endpoints,
+        }
+
+    def summary_lines(self) -> list[str]:
+        """Return a human readable summary, one line per endpoint."""
+        metrics: dict[str, Any] = self.to_dict()
+        lines: list[str] = [
+            f"Jira requests: {metrics['calls']} in {metrics['duration_s']:.1f}s, "
+            f"{metrics['bytes_received'] / 1024:.1f} KiB received, "
+            f"{metrics['retried']} retried, {metrics['4xx']} 4xx, {metrics['5xx']} 5xx"
+        ]
+        for name, stats in metrics["endpoints"].items():
+            latency: dict[str, float] = stats["latency_ms"]
+            lines.append(
+                f"  {name}: {stats['calls']} calls, "
+                f"p50 {latency['p50']:.0f} ms, p90 {latency['p90']:.0f} ms, "
+                f"p99 {latency['p99']:.0f} ms, max {latency['max']:.0f} ms"
+                + (f", {stats['retried']} retried" if stats["retried"] else "")
+            )
+        return lines
+
+    def save(self, path: Union[str, Path] = JIRA_METRICS_PATH) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file, indent=1)
+
+
+def get_jira_metrics(jira: "JIRA") -> Optional[JiraMetrics]:
+    """Return the metrics installed on a Jira client, if any."""
+    session = getattr(jira, "_session", None)
+    for hook in getattr(session, "hooks", {}).get("response", []):
+        if isinstance(getattr(hook, "__self__", None), JiraMetrics):
+            return hook.__self__
+    return None
+
+
+def reset_jira_metrics(jira: "JIRA") -> None:
+    """Start counting the requests of a run from zero."""
+    metrics: Optional[JiraMetrics] = get_jira_metrics(jira)
+    if metrics is not None:
+        metrics.reset()
+
+
+def report_jira_metrics(jira: "JIRA") -> None:
+    """Log the summary of the requests of a run and save them as JSON."""
+    metrics: Optional[JiraMetrics] = get_jira_metrics(jira)
+    if metrics is None:
+        return
+
+    for line in metrics.summary_lines():
+        logger.info(line)
+    try:
+        metrics.save()
+        logger.debug(f"Jira request metrics saved to {JIRA_METRICS_PATH}")
+    except OSError as e:
+        logger.warning(f"Cannot save the Jira request metrics: {e}")
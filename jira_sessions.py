@@ -0,0 +1,51 @@
+"""Jira clients shared by the GUI and the worker threads, one per server mode."""
+
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Hashable
+
+if TYPE_CHECKING:
+    from jira import JIRA
+
+
+class JiraSessionManager:
+    """Keep one Jira client, and so one keep-alive connection pool, per server mode.
+
+    A client is identified by a key of everything it was built from (server,
+    credentials, certificates): asking again for a mode with the same key returns
+    the same client, a different key (e.g. a new token) builds a new one. The
+    previous client is not closed, a run still using it completes with it.
+
+    The clients are shared across threads: the token checks and the worklog runs
+    issue their requests through the same requests session, which is thread-safe
+    for this use.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients: dict[Any, tuple[Hashable, "JIRA"]] = {}
+
+    def get(self, mode: Any, key: Hashable, factory: Callable[[], "JIRA"]) -> "JIRA":
+        """Return the client of a mode, building it with `factory` if the key changed.
+
+        Parameters:
+        mode: The server mode, e.g. a key of JIRA_MODE.
+        key (Hashable): What the client is built from.
+        factory (Callable[[], JIRA]): Builds the client, may raise.
+
+        Returns:
+        JIRA: The client of the mode.
+        """
+        with self._lock:
+            cached: tuple[Hashable, "JIRA"] = self._clients.get(mode)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+
+        # Built outside the lock: it connects to the server, the other modes need not wait
+        client: "JIRA" = factory()
+        with self._lock:
+            cached = self._clients.get(mode)
+            if cached is not None and cached[0] == key:
+                # Built at the same time by another thread, keep a single pool
+                return cached[1]
+            self._clients[mode] = (key, client)
+        return client
@@ -0,0 +1,383 @@
+"""Headless command line interface of the Jira worklog tool.
+
+Run it with `python -m jira_worklog <command>` from the application folder. It
+shares configuration, credentials and logging logic with the GUI, but never
+imports Tk, so it can run from a scheduled job on a headless machine.
+
+Commands:
+    load            Parse the Excel report, plan and create the worklogs.
+    plan            Parse the Excel report and save the worklog plan without writing to Jira.
+    apply           Create the worklogs of a saved plan.
+    validate-token  Check that the configured API token can log in to Jira.
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Any, Callable, Optional
+
+import custom_exceptions as ce
+import jira_log_manager as jm
+import logging_conf
+from app_data import AppData
+from constants import (
+    CONSOLE_PROGRESS_MIN_INTERVAL_S,
+    JIRA_MODE,
+    MONTHS,
+    PROFILES_DIR,
+)
+from logging_conf import logger
+from profiling import profiling_run
+from progress import ProgressEvent, ProgressReporter
+from workbook_cache import WorkbookCache
+from worklog_ledger import WorklogLedger
+
+# Environment variables overriding the configured credentials
+API_TOKEN_ENV_VAR = "JIRA_API_TOKEN"
+USER_EMAIL_ENV_VAR = "JIRA_USER_EMAIL"
+
+
+class ConsoleProgress:
+    """Progress events printed on stdout, as text or JSON lines."""
+
+    def __init__(self, json_lines: bool = False):
+        self._json_lines: bool = json_lines
+
+    def __call__(self, event: ProgressEvent) -> None:
+        if self._json_lines:
+            print(json.dumps({"event": "progress", **event.to_dict()}))
+        else:
+            print(f"Progress: {event.fraction:.0%} {event.describe()}")
+        sys.stdout.flush()
+
+
+def console_progress(args: argparse.Namespace) -> ProgressReporter:
+    return ProgressReporter(
+        ConsoleProgress(json_lines=args.output_format == "json"),
+        min_interval=CONSOLE_PROGRESS_MIN_INTERVAL_S,
+    )
+
+
+def parse_month(value: str) -> int:
+    """Accept a month as English name (as in the GUI) or number."""
+    if value.capitalize() in MONTHS:
+        return MONTHS[value.capitalize()]
+    try:
+        month = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid month: {value}")
+    if not 1 <= month <= 12:
+        raise argparse.ArgumentTypeError(f"invalid month: {value}")
+    return month
+
+
+def parse_arguments(args: Optional[list[str]] = None) -> argparse.Namespace:
+    """Parse command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m jira_worklog",
+        description="Log the hours of the Excel report as Jira worklogs.",
+    )
+    parser.add_argument(
+        "--mode",
+        dest="mode",
+        choices=list(JIRA_MODE.values()),
+        default=JIRA_MODE[0],
+        help="The Jira server to connect to. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--email",
+        dest="email",
+        default=os.environ.get(USER_EMAIL_ENV_VAR),
+        help=f"The Jira Cloud login. (default: ${USER_EMAIL_ENV_VAR}, or the Windows UPN)",
+    )
+    parser.add_argument(
+        "--output-format",
+        dest="output_format",
+        choices=["text", "json"],
+        default="text",
+        help="Print logs and progress as text or JSON lines. (default: %(default)s)",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_report_arguments(subparser: argparse.ArgumentParser) -> None:
+        subparser.add_argument(
+            "--user",
+            dest="user",
+            help="The sheet of the user in the Excel report. (default: last selected in the GUI)",
+        )
+        subparser.add_argument(
+            "--month",
+            dest="month",
+            type=parse_month,
+            help="The month to log, as name or number. (default: last selected in the GUI)",
+        )
+        subparser.add_argument(
+            "--workbook",
+            dest="workbook",
+            help="The Excel report. (default: last selected in the GUI)",
+        )
+        subparser.add_argument(
+            "--map",
+            dest="map",
+            help="The jira map file. (default: jira_map_file of the configuration)",
+        )
+        subparser.add_argument(
+            "--streaming",
+            dest="streaming",
+            action="store_true",
+            help="Stream the report keeping only the columns of the month.",
+        )
+        subparser.add_argument(
+            "--refresh",
+            dest="refresh",
+            action="store_true",
+            help="Fetch every issue from Jira, even if synced recently in the worklog ledger.",
+        )
+        subparser.add_argument(
+            "--reconcile",
+            dest="reconcile",
+            action="store_true",
+            help="Also update and delete the worklogs of the month not matching the report.",
+        )
+        subparser.add_argument(
+            "--profile",
+            dest="profile",
+            nargs="?",
+            const=str(PROFILES_DIR),
+            metavar="DIR",
+            help=f"Write cProfile and tracemalloc reports of each stage under DIR. (default: {PROFILES_DIR})",
+        )
+
+    def add_write_arguments(subparser: argparse.ArgumentParser) -> None:
+        subparser.add_argument(
+            "--workers",
+            dest="workers",
+            type=int,
+            help="Maximum number of worklogs posted concurrently. (default: max_workers of the configuration)",
+        )
+
+    load_parser = subparsers.add_parser(
+        "load", help="Parse the Excel report, plan and create the worklogs."
+    )
+    add_report_arguments(load_parser)
+    add_write_arguments(load_parser)
+    load_parser.add_argument(
+        "--plan-file",
+        dest="plan_file",
+        help="Also save the applied plan to this file (.json or .parquet).",
+    )
+    load_parser.add_argument(
+        "--all-users",
+        dest="all_users",
+        action="store_true",
+        help="Log every user of users_list in the configuration, reading the report once.",
+    )
+    load_parser.add_argument(
+        "--no-resume",
+        dest="resume",
+        action="store_false",
+        help="Start over instead of resuming an interrupted run with the same inputs.",
+    )
+
+    plan_parser = subparsers.add_parser(
+        "plan", help="Save the worklog plan without writing to Jira."
+    )
+    add_report_arguments(plan_parser)
+    plan_parser.add_argument(
+        "--output",
+        dest="output",
+        required=True,
+        help="The plan file to write (.json or .parquet).",
+    )
+
+    apply_parser = subparsers.add_parser(
+        "apply", help="Create the worklogs of a saved plan."
+    )
+    add_write_arguments(apply_parser)
+    apply_parser.add_argument("plan_file", help="The plan file (.json or .parquet).")
+
+    subparsers.add_parser(
+        "validate-token", help="Check that the API token can log in to Jira."
+    )
+
+    return parser.parse_args(args)
+
+
+def connect(app_data: AppData) -> None:
+    """Instantiate the Jira client of the selected mode, raising on failure."""
+    if app_data.jira_mode == 0:
+        app_data.instantiate_jira_class_cloud()
+    else:
+        app_data.instantiate_jira_class_self_hosted()
+
+
+def open_ledger(args: argparse.Namespace, app_data: AppData) -> Optional[WorklogLedger]:
+    """Open the worklog ledger if enabled, considering every issue stale with --refresh."""
+    if not app_data.worklog_ledger_enabled:
+        return None
+    return WorklogLedger(
+        ttl_hours=0 if getattr(args, "refresh", False) else app_data.ledger_ttl_hours
+    )
+
+
+def load_command(args: argparse.Namespace, app_data: AppData) -> int:
+    try:
+        return run_load(args, app_data)
+    except KeyboardInterrupt:
+        # The writes in progress are completed and journaled before exiting
+        logger.warning("Interrupted. Run the same command again to resume it.")
+        return 130
+
+
+def run_load(args: argparse.Namespace, app_data: AppData) -> int:
+    workbook_cache: Optional[WorkbookCache] = (
+        WorkbookCache() if app_data.workbook_cache_enabled else None
+    )
+    progress: ProgressReporter = console_progress(args)
+    common_arguments: dict[str, Any] = {
+        "jira_mode": app_data.jira_mode,
+        "max_workers": args.workers or app_data.max_workers,
+        "workbook_cache": workbook_cache,
+        "ledger": open_ledger(args, app_data),
+        "profile_dir": args.profile,
+        "run_journal": app_data.run_journal_enabled,
+        "resume": args.resume,
+    }
+
+    if args.all_users:
+        results: dict[str, dict[str, int]] = jm.load_team_worklog(
+            app_data.jira,
+            args.workbook,
+            args.map,
+            args.month,
+            app_data.config["users_list"],
+            progress,
+            reconcile=args.reconcile,
+            **common_arguments,
+        )
+        print_result(args, {"users": results})
+        return 0 if all(not result["failed"] for result in results.values()) else 1
+
+    counts: Optional[dict[str, int]] = jm.load_worklog(
+        app_data.jira,
+        args.workbook,
+        args.map,
+        args.month,
+        args.user,
+        progress,
+        plan_file=args.plan_file,
+        streaming=args.streaming,
+        reconcile=args.reconcile,
+        **common_arguments,
+    )
+    if counts is None:
+        return 1
+
+    print_result(args, counts)
+    return 0 if not counts["failed"] else 1
+
+
+def plan_command(args: argparse.Namespace, app_data: AppData) -> int:
+    with profiling_run(args.profile):
+        plan, _ = jm.prepare_worklog_plan(
+            app_data.jira,
+            args.workbook,
+            args.map,
+            args.month,
+            args.user,
+            streaming=args.streaming,
+            workbook_cache=WorkbookCache() if app_data.workbook_cache_enabled else None,
+            ledger=open_ledger(args, app_data),
+            reconcile=args.reconcile,
+            progress=console_progress(args),
+        )
+    plan.save(args.output)
+
+    print_result(args, plan.summary())
+    return 0
+
+
+def apply_command(args: argparse.Namespace, app_data: AppData) -> int:
+    counts: dict[str, int] = jm.apply_worklog_plan_file(
+        app_data.jira,
+        args.plan_file,
+        console_progress(args),
+        app_data.jira_mode,
+        args.workers or app_data.max_workers,
+        open_ledger(args, app_data),
+    )
+
+    print_result(args, counts)
+    return 0 if not counts["failed"] else 1
+
+
+def validate_token_command(args: argparse.Namespace, app_data: AppData) -> int:
+    print_result(args, {"valid": True, "user": app_data.get_username()})
+    return 0
+
+
+def print_result(args: argparse.Namespace, result: dict[str, Any]) -> None:
+    if args.output_format == "json":
+        print(json.dumps({"event": "result", **result}))
+    else:
+        print(", ".join(f"{key}: {value}" for key, value in result.items()))
+
+
+COMMANDS: dict[str, Callable[[argparse.Namespace, AppData], int]] = {
+    "load": load_command,
+    "plan": plan_command,
+    "apply": apply_command,
+    "validate-token": validate_token_command,
+}
+
+
+def main(args: Optional[list[str]] = None) -> int:
+    """Parse the arguments, connect to Jira and run the command.
+
+    Returns:
+        int: The exit code, 0 on success.
+    """
+    parsed_args: argparse.Namespace = parse_arguments(args)
+    logging_conf.setup_console_logging(json_lines=parsed_args.output_format == "json")
+
+    jira_mode: int = next(
+        key for key, value in JIRA_MODE.items() if value == parsed_args.mode
+    )
+    # The e-mail is the login of Jira Cloud only
+    app_data = AppData(
+        user_email=(
+            parsed_args.email if parsed_args.email is not None or jira_mode == 0 else ""
+        )
+    )
+    app_data.jira_mode = jira_mode
+    if os.environ.get(API_TOKEN_ENV_VAR):
+        app_data.api_key_token = os.environ[API_TOKEN_ENV_VAR]
+
+    # Fill in the report arguments with the last selections of the GUI
+    if parsed_args.command in ("load", "plan"):
+        parsed_args.user = parsed_args.user or app_data.selected_user
+        parsed_args.month = parsed_args.month or MONTHS.get(app_data.selected_month)
+        parsed_args.workbook = parsed_args.workbook or app_data.selected_file_path
+        parsed_args.map = parsed_args.map or app_data.jira_map_file
+        if not parsed_args.month:
+            logger.error("No month selected, use --month.")
+            return 2
+
+    try:
+        connect(app_data)
+    except Exception as e:
+        logger.error(f"Error connecting to Jira: {ce.JiraConnectionError(e)}")
+        if parsed_args.command == "validate-token":
+            print_result(parsed_args, {"valid": False})
+        return 1
+
+    return COMMANDS[parsed_args.command](parsed_args, app_data)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,39 +1,153 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
+import sys
+from typing import TYPE_CHECKING, Union
 
-import customtkinter
+from constants import LOG_BOX_MAX_LINES, LOG_BOX_POLL_MS, LOG_FILE_PATH
+
+if TYPE_CHECKING:
+    # Only for type hints: logging must not load Tk in headless runs
+    import customtkinter
+
+# Index of the end of a Tk text widget (tkinter.END)
+TEXT_END = "end"
 
 
 class TextHandler(logging.Handler):
-    """This class allows you to log to a Tkinter Text or ScrolledText widget."""
+    """This class allows you to log to a Tkinter Text or ScrolledText widget.
+
+    Records are queued by the emitting thread and the Tk thread drains the queue
+    on a fixed tick, inserting all the pending lines in one call, so a burst of
+    records from the worker threads costs one widget update instead of one each.
+    Only the last `max_lines` lines are kept in the widget.
 
-    def __init__(self, text: customtkinter.CTkTextbox):
+    Parameters:
+    text (customtkinter.CTkTextbox): The widget to log to.
+    poll_ms (int): Interval between two drains of the queue, in milliseconds.
+    max_lines (int): Maximum number of lines kept in the widget.
+    """
+
+    def __init__(
+        self,
+        text: "customtkinter.CTkTextbox",
+        poll_ms: int = LOG_BOX_POLL_MS,
+        max_lines: int = LOG_BOX_MAX_LINES,
+    ):
         # run the regular Handler __init__
         logging.Handler.__init__(self)
         # Store a reference to the Text it will log to
-        self.text: customtkinter.CTkTextbox = text
+        self.text: "customtkinter.CTkTextbox" = text
+        self._poll_ms: int = poll_ms
+        self._max_lines: int = max_lines
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._closed = False
+
+        # The widget can only be modified from the Tk thread
+        self.text.after(self._poll_ms, self._drain)
 
     def emit(self, record) -> None:
-        msg: str = self.format(record)
+        try:
+            self._queue.put(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+    def close(self) -> None:
+        self._closed = True
+        super().close()
+
+    def _drain(self) -> None:
+        if self._closed:
+            return
+
+        messages: list[str] = []
+        try:
+            while True:
+                messages.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        if messages:
+            try:
+                self._append(messages)
+            except Exception:
+                # The widget was destroyed, e.g. the window is closing
+                self._closed = True
+                return
+
+        self.text.after(self._poll_ms, self._drain)
+
+    def _append(self, messages: list[str]) -> None:
+        # Lines that would be trimmed right away are not inserted at all
+        if len(messages) > self._max_lines:
+            skipped: int = len(messages) - self._max_lines + 1
+            messages = [f"... {skipped} lines not shown"] + messages[
+                -(self._max_lines - 1) :
+            ]
 
-        def append() -> None:
-            self.text.configure(state="normal")
-            self.text.insert(customtkinter.END, msg + "\n")
-            self.text.configure(state="disabled")
+        self.text.configure(state="normal")
+        self.text.insert(TEXT_END, "\n".join(messages) + "\n")
 
-            # Autoscroll to the bottom
-            self.text.yview(customtkinter.END)
+        # Ring buffer: drop the oldest lines beyond the limit
+        lines: int = int(self.text.index("end-1c").split(".")[0]) - 1
+        if lines > self._max_lines:
+            self.text.delete("1.0", f"{lines - self._max_lines + 1}.0")
+        self.text.configure(state="disabled")
 
-        # This is necessary because we can't modify the Text from other threads
-        self.text.after(0, append)
+        # Autoscroll to the bottom
+        self.text.yview(TEXT_END)
 
 
 logger: logging.Logger = logging.getLogger()
 
 
+_queue_listener: Union[None, logging.handlers.QueueListener] = None
+
+
 def setup_logging() -> None:
+    """Log to the log file through a queue, so that no thread waits for the disk."""
+    global _queue_listener
+
+    file_handler = logging.FileHandler(LOG_FILE_PATH, mode="w")
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _queue_listener = logging.handlers.QueueListener(log_queue, file_handler)
+    _queue_listener.start()
+    # Flush the records still queued when the application exits
+    atexit.register(_queue_listener.stop)
+
     # Basic logger configuration
     logging.basicConfig(
-        filename="issue_not_map.log",
-        filemode="w",
         level=logging.INFO,
+        handlers=[logging.handlers.QueueHandler(log_queue)],
+    )
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Format each record as a JSON object on a single line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(
+            {
+                "event": "log",
+                "time": self.formatTime(record),
+                "level": record.levelname,
+                "message": record.getMessage(),
+            }
+        )
+
+
+def setup_console_logging(json_lines: bool = False) -> None:
+    """Log to stdout, for headless runs.
+
+    Parameters:
+    json_lines (bool): Write each record as a JSON line instead of plain text.
+    """
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(
+        JsonLinesFormatter()
+        if json_lines
+        else logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
     )
+    logging.basicConfig(level=logging.INFO, handlers=[handler], force=True)
@@ -0,0 +1,192 @@
+"""Profiling of the pipeline stages with cProfile and tracemalloc.
+
+A profiling run writes, for each stage of the pipeline, the cProfile statistics
+(`NN_stage.pstats`, readable with `python -m pstats`) and a text report with the
+slowest functions and the top allocations still alive at the end of the stage
+(`NN_stage.txt`), plus a `summary.json` with wall time and peak memory per stage.
+
+cProfile only sees the thread running the stages: the "post" stage shows the
+wait for the writer threads, while tracemalloc traces the memory of all threads.
+"""
+
+import contextlib
+import cProfile
+import datetime
+import io
+import json
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Iterator, Optional, Union
+
+from constants import PROFILE_TOP_N
+from logging_conf import logger
+
+# Frames kept per allocation, enough to tell pandas internals from our callers
+TRACEMALLOC_FRAMES = 10
+
+_active_profiler: Optional["PhaseProfiler"] = None
+
+
+def take_snapshot() -> tracemalloc.Snapshot:
+    """Snapshot the traced memory, leaving out the allocations of the profiler itself."""
+    return tracemalloc.take_snapshot().filter_traces(
+        [
+            tracemalloc.Filter(False, tracemalloc.__file__, all_frames=True),
+            tracemalloc.Filter(False, __file__, all_frames=True),
+        ]
+    )
+
+
+class PhaseProfiler:
+    """Profile named scopes, one output file set per scope, in a run directory.
+
+    Scopes can be nested: the outer scope is paused while the inner one runs,
+    so each function call is counted in a single scope.
+
+    Parameters:
+    run_dir (Union[str, Path]): The directory of the profiles of this run.
+    top_n (int): Functions and allocations listed in the text reports.
+    """
+
+    def __init__(self, run_dir: Union[str, Path], top_n: int = PROFILE_TOP_N):
+        self.run_dir = Path(run_dir)
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        self._top_n: int = top_n
+        self._thread_id: int = threading.get_ident()
+        self._stack: list[dict[str, Any]] = []
+        self._summary: list[dict[str, Any]] = []
+
+    @contextlib.contextmanager
+    def scope(self, name: str) -> Iterator[None]:
+        """Profile the code run in the block as the stage `name`."""
+        if threading.get_ident() != self._thread_id:
+            # cProfile cannot follow other threads
+            yield
+            return
+
+        if self._stack:
+            outer: dict[str, Any] = self._stack[-1]
+            outer["profile"].disable()
+            outer["peak"] = max(outer["peak"], tracemalloc.get_traced_memory()[1])
+
+        tracemalloc.reset_peak()
+        frame: dict[str, Any] = {
+            "name": name,
+            "profile": cProfile.Profile(),
+            "snapshot": take_snapshot(),
+            "started": time.perf_counter(),
+            "peak": 0,
+        }
+        self._stack.append(frame)
+        frame["profile"].enable()
+        try:
+            yield
+        finally:
+            frame["profile"].disable()
+            wall_s: float = time.perf_counter() - frame["started"]
+            peak: int = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+            self._stack.pop()
+            self._write_scope(frame, wall_s, peak)
+
+            if self._stack:
+                tracemalloc.reset_peak()
+                self._stack[-1]["profile"].enable()
+
+    def _write_scope(self, frame: dict[str, Any], wall_s: float, peak: int) -> None:
+        index: int = len(self._summary) + 1
+        slug: str = re.sub(r"\W+", "_", frame["name"]).strip("_")
+        base_path: Path = self.run_dir / f"{index:02d}_{slug}"
+
+        frame["profile"].dump_stats(base_path.with_suffix(".pstats"))
+
+        stats_stream = io.StringIO()
+        pstats.Stats(frame["profile"], stream=stats_stream).sort_stats(
+            pstats.SortKey.CUMULATIVE
+        ).print_stats(self._top_n)
+
+        # Memory allocated in the scope and not yet released at its end
+        allocations: list[tracemalloc.StatisticDiff] = take_snapshot().compare_to(
+            frame["snapshot"], "traceback"
+        )
+        allocated: int = sum(diff.size_diff for diff in allocations)
+
+        with open(base_path.with_suffix(".txt"), "w", encoding="utf-8") as file:
+            file.write(
+                f"Stage: {frame['name']}\nWall time: {wall_s:.3f} s\n"
+                f"Peak traced memory: {peak / 2**20:.1f} MiB\n"
+                f"Net allocated: {allocated / 2**20:.1f} MiB\n\n"
+            )
+            file.write(f"Top {self._top_n} allocations still alive at the end:\n")
+            for diff in allocations[: self._top_n]:
+                file.write(
+                    f"\n{diff.size_diff / 2**20:+.2f} MiB in {diff.count_diff:+d} blocks\n"
+                )
+                file.write("\n".join(diff.traceback.format(limit=TRACEMALLOC_FRAMES)))
+                file.write("\n")
+            file.write("\ncProfile, by cumulative time:\n")
+            file.write(stats_stream.getvalue())
+
+        self._summary.append(
+            {
+                "stage": frame["name"],
+                "wall_s": round(wall_s, 4),
+                "peak_mb": round(peak / 2**20, 2),
+                "net_allocated_mb": round(allocated / 2**20, 2),
+                "pstats": base_path.with_suffix(".pstats").name,
+                "report": base_path.with_suffix(".txt").name,
+            }
+        )
+
+    def write_summary(self) -> None:
+        with open(self.run_dir / "summary.json", "w", encoding="utf-8") as file:
+            json.dump(self._summary, file, indent=1)
+
+
+def profile_scope(name: str) -> contextlib.AbstractContextManager:
+    """Profile a stage of the pipeline, if a profiling run is active.
+
+    Parameters:
+    name (str): The stage, e.g. "report parse".
+
+    Returns:
+    contextlib.AbstractContextManager: The profiling scope, or a no-op one.
+    """
+    if _active_profiler is None:
+        return contextlib.nullcontext()
+    return _active_profiler.scope(name)
+
+
+@contextlib.contextmanager
+def profiling_run(profile_dir: Union[None, str, Path]) -> Iterator[None]:
+    """Profile the stages run in the block into a new directory under `profile_dir`.
+
+    Does nothing if `profile_dir` is None or another run is being profiled.
+    """
+    global _active_profiler
+
+    if profile_dir is None or _active_profiler is not None:
+        yield
+        return
+
+    run_dir: Path = Path(profile_dir) / datetime.datetime.now().strftime(
+        "%Y%m%d-%H%M%S"
+    )
+    started_tracing: bool = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+
+    _active_profiler = PhaseProfiler(run_dir)
+    logger.info(f"Profiling the run into {run_dir}")
+    try:
+        yield
+    finally:
+        try:
+            _active_profiler.write_summary()
+        finally:
+            _active_profiler = None
+            if started_tracing:
+                tracemalloc.stop()
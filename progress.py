@@ -0,0 +1,180 @@
+"""Progress events of a logging run, reported from any thread."""
+
+import dataclasses
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from constants import PROGRESS_MIN_INTERVAL_S
+
+# Phases of a run
+PARSE = "parse"
+FETCH = "fetch"
+PLAN = "plan"
+POST = "post"
+DONE = "done"
+
+PHASE_LABELS: dict[str, str] = {
+    PARSE: "Reading the Excel files",
+    FETCH: "Fetching the issues",
+    PLAN: "Planning the worklogs",
+    POST: "Writing the worklogs",
+    DONE: "Done",
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class ProgressEvent:
+    """The state of a run: its phase, the items done and the pace of the requests."""
+
+    phase: str
+    done: int
+    total: int  # 0 if the phase has no countable items
+    elapsed: float  # Seconds since the start of the phase
+    requests_per_second: float  # Jira requests per second during the phase
+    eta: Optional[float]  # Seconds to the end of the phase, None if unknown
+    user: str = ""  # The user of a team run, empty for the whole run
+
+    @property
+    def fraction(self) -> float:
+        if self.phase == DONE:
+            return 1.0
+        return self.done / self.total if self.total else 0.0
+
+    def describe(self) -> str:
+        """Return a one-line description, e.g. for a status label."""
+        text: str = PHASE_LABELS.get(self.phase, self.phase)
+        if self.user:
+            text = f"{self.user}: {text}"
+        if self.total:
+            text += f" {self.done}/{self.total}"
+        if self.requests_per_second:
+            text += f", {self.requests_per_second:.1f} req/s"
+        if self.eta is not None and self.phase != DONE:
+            text += f", ETA {self.eta:.0f}s"
+        return text
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            **({"user": self.user} if self.user else {}),
+            "phase": self.phase,
+            "done": self.done,
+            "total": self.total,
+            "value": round(self.fraction, 4),
+            "elapsed_s": round(self.elapsed, 3),
+            "requests_per_second": round(self.requests_per_second, 2),
+            "eta_s": round(self.eta, 1) if self.eta is not None else None,
+        }
+
+
+class ProgressReporter:
+    """Track the phase of a run and send progress events to a sink.
+
+    The pipeline reports from its worker threads, the sink decides how the events
+    reach the user: the GUI queues them for the Tk thread, the CLI prints them.
+    Events within a phase are throttled to one per `min_interval` seconds, while
+    phase changes and the end of the run are always sent.
+
+    Parameters:
+    sink (Callable[[ProgressEvent], None], optional): Receives the events.
+        Without a sink the progress is tracked but not reported.
+    min_interval (float): Minimum time between two events of the same phase.
+    """
+
+    def __init__(
+        self,
+        sink: Optional[Callable[[ProgressEvent], None]] = None,
+        min_interval: float = PROGRESS_MIN_INTERVAL_S,
+    ):
+        self._sink: Optional[Callable[[ProgressEvent], None]] = sink
+        self._min_interval: float = min_interval
+        self._request_counter: Optional[Callable[[], int]] = None
+        self._lock = threading.Lock()
+        # Set on the reporters of the users of a team run, see `for_user`
+        self._user: str = ""
+        self._parent: Optional["ProgressReporter"] = None
+
+        self._phase: str = ""
+        self._done = 0
+        self._total = 0
+        self._phase_started: float = time.monotonic()
+        self._phase_requests = 0
+        self._last_sent: float = 0.0
+
+    def count_requests(self, request_counter: Optional[Callable[[], int]]) -> None:
+        """Use a counter of the Jira requests made so far to report the request rate."""
+        with self._lock:
+            self._request_counter = request_counter
+            self._phase_requests = self._requests()
+
+    def for_user(self, user: str) -> "ProgressReporter":
+        """Return a reporter of the progress of one user of a team run.
+
+        Its events carry the user name. The items it begins and advances are
+        added to this reporter too, which keeps reporting the whole team.
+        """
+        reporter = ProgressReporter(self._sink, self._min_interval)
+        reporter._user = user
+        reporter._parent = self
+        return reporter
+
+    def begin(self, phase: str, total: int = 0) -> None:
+        """Start a phase of `total` items, or add `total` items to it if already running.
+
+        Adding to the running phase lets the users of a team write concurrently
+        under a single progress.
+        """
+        with self._lock:
+            if phase == self._phase:
+                self._total += total
+            else:
+                self._phase = phase
+                self._done = 0
+                self._total = total
+                self._phase_started = time.monotonic()
+                self._phase_requests = self._requests()
+            self._send(force=True)
+        # The end of a user is not the end of the team run
+        if self._parent is not None and phase != DONE:
+            self._parent.begin(phase, total)
+
+    def advance(self, count: int = 1) -> None:
+        """Mark `count` more items of the current phase as done."""
+        with self._lock:
+            self._done += count
+            self._send(force=self._total > 0 and self._done >= self._total)
+        if self._parent is not None:
+            self._parent.advance(count)
+
+    def finish(self) -> None:
+        self.begin(DONE)
+
+    def _requests(self) -> int:
+        return self._request_counter() if self._request_counter is not None else 0
+
+    def _send(self, force: bool) -> None:
+        now: float = time.monotonic()
+        if self._sink is None or (
+            not force and now - self._last_sent < self._min_interval
+        ):
+            return
+        self._last_sent = now
+
+        elapsed: float = now - self._phase_started
+        # The counter restarts with every run, never report a negative rate
+        requests: int = max(0, self._requests() - self._phase_requests)
+        eta: Optional[float] = None
+        if self._total and self._done:
+            eta = elapsed / self._done * max(0, self._total - self._done)
+
+        self._sink(
+            ProgressEvent(
+                phase=self._phase,
+                done=self._done,
+                total=self._total,
+                elapsed=elapsed,
+                requests_per_second=requests / elapsed if elapsed > 0 else 0.0,
+                eta=eta,
+                user=self._user,
+            )
+        )
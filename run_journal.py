@@ -0,0 +1,271 @@
+"""Append-only journal of a logging run, so that an interrupted run can resume."""
+
+import datetime
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterable, Optional, Union
+
+from constants import JOURNAL_SYNC_EVERY, JOURNALS_DIR
+from logging_conf import logger
+
+if TYPE_CHECKING:
+    from issue_state import StatusTimeline, WorklogRecord
+
+
+def file_identity(path: Union[str, Path]) -> list[Any]:
+    """Return what identifies a version of an input file: path, size and mtime."""
+    try:
+        stat: os.stat_result = os.stat(path)
+    except OSError:
+        return [str(path), None, None]
+    return [str(Path(path).resolve()), stat.st_size, stat.st_mtime_ns]
+
+
+def inputs_hash(
+    excel_report: str, jira_map_file: str, users: Iterable[str], **options: Any
+) -> str:
+    """Hash the inputs of a run: a changed file or option starts a new journal.
+
+    Parameters:
+    excel_report (str): The Excel report.
+    jira_map_file (str): The jira map file.
+    users (Iterable[str]): The sheets logged by the run.
+    options: The other choices affecting the plan, e.g. month and Jira mode.
+
+    Returns:
+    str: A hex digest naming the journal of the run.
+    """
+    inputs: dict[str, Any] = {
+        "report": file_identity(excel_report),
+        "map": file_identity(jira_map_file),
+        "users": sorted(users),
+        **options,
+    }
+    return hashlib.sha256(
+        json.dumps(inputs, sort_keys=True, default=str).encode()
+    ).hexdigest()[:32]
+
+
+class RunJournal:
+    """Journal of the Jira state fetched and the worklogs written by a run.
+
+    Every entry is a JSON line appended to the journal file, flushed and fsynced
+    every `sync_every` entries and at each checkpoint, so a crash loses at most
+    one batch. Creates and deletes are fsynced before they are reported done:
+    writing them again on resume would duplicate a worklog or fail on a missing
+    one, while a lost fetch or update is just repeated. On resume the fetched issues are replayed with the writes made
+    since, giving the current Jira state of those issues without fetching them
+    again: the new plan skips the days already written. The journal is deleted
+    once the run completes.
+
+    Parameters:
+    path (Union[str, Path]): The journal file.
+    resume (bool): Replay an existing journal, otherwise start a new one.
+    sync_every (int): Entries appended between two fsyncs.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        resume: bool = True,
+        sync_every: int = JOURNAL_SYNC_EVERY,
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._sync_every: int = sync_every
+        self._lock = threading.Lock()
+        self._pending = 0
+
+        self._worklogs: dict[str, list["WorklogRecord"]] = {}
+        self._timelines: dict[str, "StatusTimeline"] = {}
+        self.resumed_writes = 0
+        if resume and self.path.exists():
+            replayed_size: int = self._replay()
+            # Drop a line torn by the crash, the next entries must start on a new line
+            os.truncate(self.path, replayed_size)
+            logger.info(
+                f"Resuming an interrupted run: {len(self._worklogs)} issue(s) fetched "
+                f"and {self.resumed_writes} worklog write(s) done"
+            )
+
+        self._file = open(self.path, "a" if resume else "w", encoding="utf-8")
+
+    @classmethod
+    def for_inputs(
+        cls,
+        excel_report: str,
+        jira_map_file: str,
+        users: Iterable[str],
+        resume: bool = True,
+        **options: Any,
+    ) -> "RunJournal":
+        """Open the journal of the run with these inputs in the journals folder."""
+        digest: str = inputs_hash(excel_report, jira_map_file, users, **options)
+        return cls(JOURNALS_DIR / f"{digest}.jsonl", resume)
+
+    def _replay(self) -> int:
+        # Returns the size of the complete entries at the start of the journal
+        from issue_state import StatusTimeline, WorklogRecord
+
+        replayed_size = 0
+        with open(self.path, "rb") as file:
+            for line in file:
+                # The last line of a crashed run may be truncated
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry: dict[str, Any] = json.loads(line)
+                except ValueError:
+                    break
+                replayed_size += len(line)
+
+                kind: str = entry["type"]
+                issue: str = entry["issue"]
+                if kind == "worklogs":
+                    self._worklogs[issue] = [
+                        WorklogRecord(*fields) for fields in entry["worklogs"]
+                    ]
+                elif kind == "timeline":
+                    valid_until: Optional[str] = entry.get("valid_until")
+                    self._timelines[issue] = StatusTimeline(
+                        [
+                            datetime.date.fromisoformat(d)
+                            for d, _ in entry["transitions"]
+                        ],
+                        [status for _, status in entry["transitions"]],
+                        valid_until=(
+                            datetime.date.fromisoformat(valid_until)
+                            if valid_until
+                            else None
+                        ),
+                    )
+                elif issue in self._worklogs:
+                    self.resumed_writes += 1
+                    records: list[WorklogRecord] = self._worklogs[issue]
+                    if kind == "create":
+                        records.append(WorklogRecord(*entry["worklog"]))
+                    elif kind == "update":
+                        self._worklogs[issue] = [
+                            (
+                                WorklogRecord(
+                                    r.worklog_id, r.author_id, r.day, entry["seconds"]
+                                )
+                                if r.worklog_id == entry["worklog_id"]
+                                else r
+                            )
+                            for r in records
+                        ]
+                    elif kind == "delete":
+                        self._worklogs[issue] = [
+                            r for r in records if r.worklog_id != entry["worklog_id"]
+                        ]
+
+        return replayed_size
+
+    def load(
+        self, issues: Iterable[str]
+    ) -> dict[str, tuple[list["WorklogRecord"], Optional["StatusTimeline"]]]:
+        """Return the worklogs and timeline of the issues fetched before the interruption.
+
+        Parameters:
+        issues (Iterable[str]): The Jira issue keys needed by the run.
+
+        Returns:
+        dict[str, tuple[list[WorklogRecord], Optional[StatusTimeline]]]: The worklogs,
+        with the writes of the interrupted run applied, and the timeline (None if
+        it was not fetched) of each journaled issue.
+        """
+        return {
+            issue: (list(self._worklogs[issue]), self._timelines.get(issue))
+            for issue in issues
+            if issue in self._worklogs
+        }
+
+    def _append(self, entry: dict[str, Any], durable: bool = False) -> None:
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(json.dumps(entry) + "\n")
+            self._pending += 1
+            if durable or self._pending >= self._sync_every:
+                self._sync()
+
+    def _sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+
+    def sync(self) -> None:
+        """Make the entries appended so far durable, e.g. at the end of a phase."""
+        with self._lock:
+            if not self._file.closed and self._pending:
+                self._sync()
+
+    def record_worklogs(self, issue: str, records: list["WorklogRecord"]) -> None:
+        self._append(
+            {
+                "type": "worklogs",
+                "issue": issue,
+                "worklogs": [
+                    [r.worklog_id, r.author_id, r.day, r.seconds] for r in records
+                ],
+            }
+        )
+
+    def record_timeline(self, issue: str, timeline: "StatusTimeline") -> None:
+        self._append(
+            {
+                "type": "timeline",
+                "issue": issue,
+                "transitions": [
+                    [date.isoformat(), status]
+                    for date, status in timeline.transitions()
+                ],
+                "valid_until": (
+                    timeline.valid_until.isoformat() if timeline.valid_until else None
+                ),
+            }
+        )
+
+    def record_create(self, issue: str, record: "WorklogRecord") -> None:
+        self._append(
+            {
+                "type": "create",
+                "issue": issue,
+                "worklog": [
+                    record.worklog_id,
+                    record.author_id,
+                    record.day,
+                    record.seconds,
+                ],
+            },
+            durable=True,
+        )
+
+    def record_update(self, issue: str, worklog_id: str, seconds: int) -> None:
+        self._append(
+            {
+                "type": "update",
+                "issue": issue,
+                "worklog_id": worklog_id,
+                "seconds": seconds,
+            }
+        )
+
+    def record_delete(self, issue: str, worklog_id: str) -> None:
+        self._append(
+            {"type": "delete", "issue": issue, "worklog_id": worklog_id}, durable=True
+        )
+
+    def close(self, completed: bool = False) -> None:
+        """Close the journal, deleting it if the run completed."""
+        with self._lock:
+            if self._file.closed:
+                return
+            self._sync()
+            self._file.close()
+        if completed:
+            self.path.unlink(missing_ok=True)
@@ -0,0 +1,85 @@
+import datetime
+from urllib.error import URLError
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+import custom_exceptions as ce
+import get_certificate_chain_download as gccd
+
+NOW = datetime.datetime(2025, 1, 1)
+
+
+def make_certificate(subject, issuer, key, issuer_key):
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, subject)])
+    issuer_name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, issuer)])
+    return (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(issuer_name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(NOW)
+        .not_valid_after(NOW + datetime.timedelta(days=30))
+        .add_extension(
+            x509.SubjectKeyIdentifier.from_public_key(key.public_key()), False
+        )
+        .add_extension(
+            x509.AuthorityKeyIdentifier.from_issuer_public_key(issuer_key.public_key()),
+            False,
+        )
+        .sign(issuer_key, hashes.SHA256())
+    )
+
+
+@pytest.fixture
+def leaf_without_aia(tmp_path, monkeypatch):
+    # No local bundle, and no cached index of a previous one
+    monkeypatch.setattr(gccd, "ROOT_CA_BUNDLE_PATH", tmp_path / "cacert.pem")
+    monkeypatch.setattr(gccd, "ROOT_CA_STORE_CACHE_DIR", tmp_path / "root_ca_store")
+    root_key = ec.generate_private_key(ec.SECP256R1())
+    root = make_certificate("Root", "Root", root_key, root_key)
+    leaf = make_certificate(
+        "leaf", "Root", ec.generate_private_key(ec.SECP256R1()), root_key
+    )
+    return root, leaf
+
+
+def test_missing_bundle_that_cannot_be_downloaded(leaf_without_aia, monkeypatch):
+    _, leaf = leaf_without_aia
+
+    def unreachable(*args, **kwargs):
+        raise URLError("no network")
+
+    monkeypatch.setattr(gccd, "urlopen", unreachable)
+    downloader = gccd.SSLCertificateChainDownloader(cert_cache=False)
+
+    with pytest.raises(ce.NetworkConnectionError):
+        downloader.walk_the_chain(leaf, 1)
+
+
+def test_missing_bundle_is_downloaded(leaf_without_aia, monkeypatch):
+    root, leaf = leaf_without_aia
+
+    class Response:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            return False
+
+        def getcode(self):
+            return 200
+
+        def read(self):
+            return root.public_bytes(serialization.Encoding.PEM)
+
+    monkeypatch.setattr(gccd, "urlopen", lambda *args, **kwargs: Response())
+    downloader = gccd.SSLCertificateChainDownloader(cert_cache=False)
+
+    downloader.walk_the_chain(leaf, 1)
+
+    assert downloader.cert_chain == [root]
@@ -0,0 +1,32 @@
+from issue_state import WorklogRecord
+from run_journal import RunJournal
+
+
+def test_resume_twice_after_a_torn_write(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    journal = RunJournal(path, resume=False)
+    journal.record_worklogs("ABC-1", [])
+    journal.record_create("ABC-1", WorklogRecord("1", "me", "2024-01-02", 3600))
+    journal.close()
+    # The crash tore the next entry
+    with open(path, "a", encoding="utf-8") as file:
+        file.write('{"type": "create", "issue": "AB')
+
+    journal = RunJournal(path)
+    assert journal.resumed_writes == 1
+    journal.record_create("ABC-1", WorklogRecord("2", "me", "2024-01-03", 3600))
+    journal.close()
+
+    journal = RunJournal(path)
+    assert journal.resumed_writes == 2
+    assert journal.load(["ABC-1"]) == {
+        "ABC-1": (
+            [
+                WorklogRecord("1", "me", "2024-01-02", 3600),
+                WorklogRecord("2", "me", "2024-01-03", 3600),
+            ],
+            None,
+        )
+    }
+    journal.close(completed=True)
+    assert not path.exists()
@@ -0,0 +1,49 @@
+import sqlite3
+
+from issue_state import WorklogRecord
+from worklog_ledger import WorklogLedger
+
+CLOUD = "https://example.atlassian.net"
+SELF_HOSTED = "https://jira.example.com"
+
+
+def test_servers_do_not_share_issues_or_worklog_ids(tmp_path):
+    ledger = WorklogLedger(tmp_path / "ledger.sqlite3")
+    ledger.sync_worklogs(
+        CLOUD, "ABC-1", [WorklogRecord("10", "cloud-me", "2024-01-02", 3600)]
+    )
+    ledger.sync_worklogs(
+        SELF_HOSTED, "ABC-1", [WorklogRecord("10", "hosted-me", "2024-01-03", 7200)]
+    )
+    ledger.sync_worklogs(SELF_HOSTED, "ABC-2", [])
+
+    cloud = ledger.load_fresh(CLOUD, ["ABC-1", "ABC-2"])
+    hosted = ledger.load_fresh(SELF_HOSTED, ["ABC-1", "ABC-2"])
+
+    assert cloud == {
+        "ABC-1": ([WorklogRecord("10", "cloud-me", "2024-01-02", 3600)], None)
+    }
+    assert hosted["ABC-1"] == (
+        [WorklogRecord("10", "hosted-me", "2024-01-03", 7200)],
+        None,
+    )
+    assert hosted["ABC-2"] == ([], None)
+
+    ledger.mark_stale(CLOUD, ["ABC-1"])
+    assert ledger.load_fresh(CLOUD, ["ABC-1"]) == {}
+    assert "ABC-1" in ledger.load_fresh(SELF_HOSTED, ["ABC-1"])
+    ledger.close()
+
+
+def test_ledger_without_servers_is_recreated(tmp_path):
+    path = tmp_path / "ledger.sqlite3"
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            "CREATE TABLE issues (issue TEXT PRIMARY KEY, synced_at REAL)"
+        )
+        connection.execute("INSERT INTO issues VALUES ('ABC-1', 1e12)")
+    connection.close()
+
+    ledger = WorklogLedger(path)
+    assert ledger.load_fresh(CLOUD, ["ABC-1"]) == {}
+    ledger.close()
@@ -0,0 +1,60 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from issue_state import IssueStateCache
+from worklog_plan import CREATE, WorklogAction
+from worklog_writer import WorklogWriter, retry_after_seconds
+
+
+def rate_limit_error(retry_after):
+    return SimpleNamespace(
+        response=SimpleNamespace(headers={"Retry-After": retry_after})
+    )
+
+
+@pytest.mark.parametrize(
+    "retry_after, attempt, expected",
+    [("7", 0, 7.0), ("-3", 0, 0.0), ("abc", 3, 8.0), ("", 2, 4.0)],
+)
+def test_retry_after_seconds(retry_after, attempt, expected):
+    assert retry_after_seconds(rate_limit_error(retry_after), attempt) == expected
+
+
+def test_retry_after_seconds_http_date_in_the_past():
+    error = rate_limit_error("Wed, 21 Oct 2015 07:28:00 GMT")
+    assert retry_after_seconds(error, 0) == 0.0
+
+
+class FailingJira:
+    """Raises the error of each issue instead of adding the worklog."""
+
+    def __init__(self, errors):
+        self._errors = errors
+
+    def add_worklog(self, issue, **kwargs):
+        raise self._errors[issue]
+
+
+def test_write_errors_fail_the_action_without_cancelling_the_run():
+    jira = FailingJira(
+        {
+            "A-1": requests.ConnectionError("Connection reset by peer"),
+            "A-2": RuntimeError("unexpected"),
+        }
+    )
+    cancel_event = threading.Event()
+    writer = WorklogWriter(
+        jira, IssueStateCache(jira), 2, 100.0, cancel_event=cancel_event
+    )
+    actions = [
+        WorklogAction("A-1", "2024-01-02", 3600, CREATE),
+        WorklogAction("A-2", "2024-01-02", 3600, CREATE),
+    ]
+
+    counts = writer.write_worklogs(actions)
+
+    assert counts == {"logged": 0, "updated": 0, "deleted": 0, "failed": 2}
+    assert not cancel_event.is_set()
@@ -0,0 +1,155 @@
+"""Local cache of parsed workbooks, so unchanged Excel files are not parsed again."""
+
+import hashlib
+import io
+import json
+import os
+import pickle
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Union
+
+from constants import (
+    WORKBOOK_CACHE_DIR,
+    WORKBOOK_CACHE_MAX_BYTES,
+    WORKBOOK_CACHE_VERSION,
+)
+from logging_conf import logger
+
+INDEX_FILE_NAME = "index.json"
+
+
+class WorkbookCache:
+    """Content-addressed LRU cache of parsed workbooks.
+
+    A file is identified by path, size and modification time: when they match a
+    previous run its content hash is reused without reading the file again,
+    otherwise the file is read once and hashed. Parsed objects are stored as
+    pickles keyed on content hash, parse arguments and WORKBOOK_CACHE_VERSION,
+    and the least recently used ones are evicted when the cache grows over its
+    size cap.
+
+    Parameters:
+    cache_dir (Union[str, Path]): Directory of the cache files.
+    max_size_bytes (int): Maximum total size of the cached objects.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Union[str, Path] = WORKBOOK_CACHE_DIR,
+        max_size_bytes: int = WORKBOOK_CACHE_MAX_BYTES,
+    ):
+        self._cache_dir = Path(cache_dir)
+        self._max_size_bytes: int = max_size_bytes
+        self._lock = threading.Lock()
+
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+        self._index: dict[str, dict[str, Any]] = self._load_index()
+
+    @property
+    def _index_path(self) -> Path:
+        return self._cache_dir / INDEX_FILE_NAME
+
+    def _load_index(self) -> dict[str, dict[str, Any]]:
+        try:
+            with open(self._index_path, encoding="utf-8") as file:
+                index: dict[str, dict[str, Any]] = json.load(file)
+            if {"files", "entries"} <= index.keys():
+                return index
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        return {"files": {}, "entries": {}}
+
+    def _save_index(self) -> None:
+        # Write and rename, so that a crash never leaves a truncated index
+        temp_path: Path = self._index_path.with_suffix(".tmp")
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(self._index, file)
+        os.replace(temp_path, self._index_path)
+
+    def get_or_parse(
+        self, file_path: Union[str, Path], parse_function: Callable, *args: Any
+    ) -> Any:
+        """Return the parsed file from the cache, parsing and storing it on a miss.
+
+        Parameters:
+        file_path (Union[str, Path]): The workbook to parse.
+        parse_function (Callable): Called with a buffer of the file content and `args`.
+        *args: Further arguments of the parse function, part of the cache key.
+
+        Returns:
+        Any: The value returned by the parse function.
+        """
+        file_stat: os.stat_result = os.stat(file_path)
+        file_key: str = (
+            f"{Path(file_path).resolve()}|{file_stat.st_size}|{file_stat.st_mtime_ns}"
+        )
+
+        content: Union[None, bytes] = None
+        with self._lock:
+            content_hash: Union[None, str] = self._index["files"].get(file_key)
+        if content_hash is None:
+            with open(file_path, "rb") as file:
+                content = file.read()
+            content_hash = hashlib.sha256(content).hexdigest()
+
+        entry_key: str = hashlib.sha256(
+            f"{WORKBOOK_CACHE_VERSION}|{content_hash}|"
+            f"{parse_function.__name__}|{args!r}".encode()
+        ).hexdigest()
+        entry_path: Path = self._cache_dir / f"{entry_key}.pkl"
+
+        with self._lock:
+            self._index["files"][file_key] = content_hash
+            entry: Union[None, dict[str, Any]] = self._index["entries"].get(entry_key)
+
+        if entry is not None:
+            try:
+                # Plain pickle: pandas is imported by the unpickling only when needed
+                with open(entry_path, "rb") as file:
+                    value: Any = pickle.load(file)
+                with self._lock:
+                    entry["last_used"] = time.time()
+                    self._save_index()
+                logger.info(f"Using cached {parse_function.__name__} of {file_path}")
+                return value
+            except (OSError, EOFError, ValueError, pickle.UnpicklingError) as e:
+                logger.warning(f"Discarding unreadable cache entry {entry_path}: {e}")
+
+        if content is None:
+            with open(file_path, "rb") as file:
+                content = file.read()
+
+        value = parse_function(io.BytesIO(content), *args)
+
+        with open(entry_path, "wb") as file:
+            pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._index["entries"][entry_key] = {
+                "content_hash": content_hash,
+                "size": entry_path.stat().st_size,
+                "last_used": time.time(),
+            }
+            self._evict()
+            self._save_index()
+
+        return value
+
+    def _evict(self) -> None:
+        entries: dict[str, dict[str, Any]] = self._index["entries"]
+        total_size: int = sum(entry["size"] for entry in entries.values())
+
+        for entry_key in sorted(entries, key=lambda key: entries[key]["last_used"]):
+            if total_size <= self._max_size_bytes:
+                break
+            total_size -= entries.pop(entry_key)["size"]
+            (self._cache_dir / f"{entry_key}.pkl").unlink(missing_ok=True)
+
+        # Forget the files whose content has no cached entry left
+        cached_hashes: set[str] = {entry["content_hash"] for entry in entries.values()}
+        self._index["files"] = {
+            file_key: content_hash
+            for file_key, content_hash in self._index["files"].items()
+            if content_hash in cached_hashes
+        }
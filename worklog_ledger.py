@@ -0,0 +1,263 @@
+"""Local SQLite ledger of the Jira worklogs, so that re-runs only fetch stale issues."""
+
+import datetime
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Optional, Union
+
+from constants import DEFAULT_LEDGER_TTL_HOURS, WORKLOG_LEDGER_PATH
+from logging_conf import logger
+
+if TYPE_CHECKING:
+    # The GUI opens the ledger at startup, before the Jira client is imported
+    from issue_state import StatusTimeline, WorklogRecord
+
+# Stored as the user_version of the database, an older ledger is recreated
+SCHEMA_VERSION = 2
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS issues (
+    server TEXT NOT NULL,       -- URL of the Jira server of the issue
+    issue TEXT NOT NULL,
+    synced_at REAL,             -- Unix time of the last worklogs download, NULL if stale
+    transitions TEXT,           -- JSON list of the [date, status] of the status timeline
+    timeline_synced_on TEXT,    -- Date of the last changelog download
+    PRIMARY KEY (server, issue)
+);
+CREATE TABLE IF NOT EXISTS worklogs (
+    server TEXT NOT NULL,
+    worklog_id TEXT NOT NULL,
+    issue TEXT NOT NULL,
+    author_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    seconds INTEGER NOT NULL,
+    run_id TEXT,                -- The run that created the worklog, NULL if read from Jira
+    recorded_at REAL NOT NULL,
+    PRIMARY KEY (server, worklog_id)
+);
+CREATE INDEX IF NOT EXISTS worklogs_issue ON worklogs (server, issue);
+"""
+
+# Keys per "IN (...)" query, below the SQLite limit of bound parameters
+QUERY_CHUNK_SIZE = 500
+
+
+class WorklogLedger:
+    """One row per worklog of the logged issues and the time each issue was synced.
+
+    The worklogs created by the tool are recorded as soon as Jira accepts them,
+    so an issue synced less than `ttl_hours` ago is planned from the ledger
+    alone. Worklogs added or changed by hand in Jira are picked up once the
+    issue is stale again. Every row belongs to a Jira server, so the Cloud and
+    Self-Hosted instances share the ledger without mixing their issues.
+
+    Parameters:
+    path (Union[str, Path]): The SQLite database file.
+    ttl_hours (float): Time after which a synced issue is fetched again from Jira.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path] = WORKLOG_LEDGER_PATH,
+        ttl_hours: float = DEFAULT_LEDGER_TTL_HOURS,
+    ):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._ttl_seconds: float = ttl_hours * 3600
+        # Shared by the writer threads, serialized by the lock
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+
+        with self._lock, self._connection:
+            (version,) = self._connection.execute("PRAGMA user_version").fetchone()
+            if version != SCHEMA_VERSION:
+                # Only a cache of the Jira state: drop it rather than migrate it
+                self._connection.executescript(
+                    "DROP TABLE IF EXISTS issues; DROP TABLE IF EXISTS worklogs;"
+                )
+            self._connection.executescript(SCHEMA)
+            self._connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def load_fresh(
+        self, server: str, issues: Iterable[str]
+    ) -> dict[str, tuple[list["WorklogRecord"], Optional["StatusTimeline"]]]:
+        """Return the worklogs and status timeline of the issues synced within the TTL.
+
+        Parameters:
+        server (str): The URL of the Jira server of the issues.
+        issues (Iterable[str]): The Jira issue keys needed by the run.
+
+        Returns:
+        dict[str, tuple[list[WorklogRecord], Optional[StatusTimeline]]]: The worklogs
+        and the timeline (None if never stored) of each fresh issue.
+        """
+        from issue_state import StatusTimeline, WorklogRecord
+
+        issues = list(issues)
+        oldest_fresh: float = time.time() - self._ttl_seconds
+        fresh: dict[str, tuple[list[WorklogRecord], Optional[StatusTimeline]]] = {}
+
+        with self._lock:
+            for start in range(0, len(issues), QUERY_CHUNK_SIZE):
+                chunk: list[str] = issues[start : start + QUERY_CHUNK_SIZE]
+                placeholders: str = ",".join("?" * len(chunk))
+
+                for issue, transitions, synced_on in self._connection.execute(
+                    f"SELECT issue, transitions, timeline_synced_on FROM issues "
+                    f"WHERE server = ? AND issue IN ({placeholders}) AND synced_at >= ?",
+                    (server, *chunk, oldest_fresh),
+                ):
+                    timeline: Optional[StatusTimeline] = None
+                    if transitions is not None:
+                        dates_statuses: list[list[str]] = json.loads(transitions)
+                        timeline = StatusTimeline(
+                            [datetime.date.fromisoformat(d) for d, _ in dates_statuses],
+                            [status for _, status in dates_statuses],
+                            valid_until=datetime.date.fromisoformat(synced_on),
+                        )
+                    fresh[issue] = ([], timeline)
+
+                for (
+                    worklog_id,
+                    issue,
+                    author_id,
+                    day,
+                    seconds,
+                ) in self._connection.execute(
+                    f"SELECT worklog_id, issue, author_id, day, seconds FROM worklogs "
+                    f"WHERE server = ? AND issue IN ({placeholders})",
+                    (server, *chunk),
+                ):
+                    if issue in fresh:
+                        fresh[issue][0].append(
+                            WorklogRecord(worklog_id, author_id, day, seconds)
+                        )
+
+        return fresh
+
+    def sync_worklogs(
+        self, server: str, issue: str, records: list["WorklogRecord"]
+    ) -> None:
+        """Replace the worklogs of an issue with the ones just downloaded from Jira.
+
+        Rows created by a run keep their run id.
+
+        Parameters:
+        server (str): The URL of the Jira server of the issue.
+        issue (str): The Jira issue key.
+        records (list[WorklogRecord]): All the worklogs of the issue.
+        """
+        now: float = time.time()
+        with self._lock, self._connection:
+            stored_ids: set[str] = {
+                worklog_id
+                for (worklog_id,) in self._connection.execute(
+                    "SELECT worklog_id FROM worklogs WHERE server = ? AND issue = ?",
+                    (server, issue),
+                )
+            }
+            deleted_ids: set[str] = stored_ids - {
+                record.worklog_id for record in records
+            }
+            self._connection.executemany(
+                "DELETE FROM worklogs WHERE server = ? AND worklog_id = ?",
+                [(server, worklog_id) for worklog_id in deleted_ids],
+            )
+            self._connection.executemany(
+                "INSERT INTO worklogs VALUES (?, ?, ?, ?, ?, ?, NULL, ?) "
+                "ON CONFLICT (server, worklog_id) DO UPDATE SET "
+                "author_id = excluded.author_id, day = excluded.day, "
+                "seconds = excluded.seconds",
+                [
+                    (
+                        server,
+                        record.worklog_id,
+                        issue,
+                        record.author_id,
+                        record.day,
+                        record.seconds,
+                        now,
+                    )
+                    for record in records
+                ],
+            )
+            self._connection.execute(
+                "INSERT INTO issues (server, issue, synced_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (server, issue) DO UPDATE SET "
+                "synced_at = excluded.synced_at",
+                (server, issue, now),
+            )
+
+    def record_worklog(
+        self, server: str, issue: str, record: "WorklogRecord", run_id: str
+    ) -> None:
+        """Store a worklog just created by a run.
+
+        Parameters:
+        server (str): The URL of the Jira server of the issue.
+        issue (str): The Jira issue key.
+        record (WorklogRecord): The created worklog.
+        run_id (str): The run that created it.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO worklogs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    server,
+                    record.worklog_id,
+                    issue,
+                    record.author_id,
+                    record.day,
+                    record.seconds,
+                    run_id,
+                    time.time(),
+                ),
+            )
+
+    def update_worklog(self, server: str, worklog_id: str, seconds: int) -> None:
+        """Store the new time of a worklog just updated by a run."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE worklogs SET seconds = ?, recorded_at = ? "
+                "WHERE server = ? AND worklog_id = ?",
+                (seconds, time.time(), server, worklog_id),
+            )
+
+    def delete_worklog(self, server: str, worklog_id: str) -> None:
+        """Forget a worklog just deleted by a run."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM worklogs WHERE server = ? AND worklog_id = ?",
+                (server, worklog_id),
+            )
+
+    def store_timeline(
+        self, server: str, issue: str, timeline: "StatusTimeline"
+    ) -> None:
+        """Store the status timeline of an issue just downloaded from Jira."""
+        transitions: str = json.dumps(
+            [[date.isoformat(), status] for date, status in timeline.transitions()]
+        )
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO issues (server, issue, transitions, timeline_synced_on) "
+                "VALUES (?, ?, ?, ?) ON CONFLICT (server, issue) DO UPDATE SET "
+                "transitions = excluded.transitions, "
+                "timeline_synced_on = excluded.timeline_synced_on",
+                (server, issue, transitions, datetime.date.today().isoformat()),
+            )
+
+    def mark_stale(self, server: str, issues: Iterable[str]) -> None:
+        """Force the issues of the server to be fetched from Jira on the next run."""
+        issues = list(issues)
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "UPDATE issues SET synced_at = NULL WHERE server = ? AND issue = ?",
+                [(server, issue) for issue in issues],
+            )
+        logger.debug(f"Issues marked stale in the worklog ledger: {issues}")
@@ -0,0 +1,554 @@
+"""Worklog plan: the decisions of a logging run, computed before any write to Jira."""
+
+import dataclasses
+import datetime
+import json
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Optional, Union
+
+import numpy as np
+import pandas as pd
+from jira import exceptions
+
+from constants import HOUR_TO_SECONDS
+from issue_state import IssueStateCache, WorklogRecord
+from logging_conf import logger
+from profiling import profile_scope
+
+# Worklog actions
+CREATE = "create"
+UPDATE = "update"
+DELETE = "delete"
+SKIP = "skip"
+WRITE_ACTIONS: tuple[str, ...] = (CREATE, UPDATE, DELETE)
+# Skip reason of a day already planned for another user of the same Jira account
+ALREADY_PLANNED = "already planned"
+
+
+@dataclasses.dataclass(frozen=True)
+class WorklogAction:
+    """A worklog to create, update or delete, or the reason why it is skipped."""
+
+    issue: str
+    day: str  # Formatted as 'YYYY-MM-DD'
+    seconds: int
+    action: str
+    reason: str = ""
+    worklog_id: str = ""  # The existing worklog to update or delete
+
+    @property
+    def started(self) -> datetime.datetime:
+        return datetime.datetime.strptime(self.day, "%Y-%m-%d")
+
+
+@dataclasses.dataclass
+class WorklogPlan:
+    """The worklog actions of a user for a month, serializable as JSON or Parquet."""
+
+    author_id: str
+    user: str = ""
+    month: int = 0
+    actions: list[WorklogAction] = dataclasses.field(default_factory=list)
+    created_at: str = dataclasses.field(
+        default_factory=lambda: datetime.datetime.now().isoformat(timespec="seconds")
+    )
+
+    @property
+    def creates(self) -> list[WorklogAction]:
+        return [action for action in self.actions if action.action == CREATE]
+
+    @property
+    def writes(self) -> list[WorklogAction]:
+        return [action for action in self.actions if action.action in WRITE_ACTIONS]
+
+    def _metadata(self) -> dict[str, Any]:
+        return {
+            "author_id": self.author_id,
+            "user": self.user,
+            "month": self.month,
+            "created_at": self.created_at,
+        }
+
+    def save(self, plan_file: Union[str, Path]) -> None:
+        """Save the plan as Parquet if the file has a .parquet suffix, as JSON otherwise.
+
+        Parameters:
+        plan_file (Union[str, Path]): The destination file.
+        """
+        plan_file = Path(plan_file)
+        if plan_file.suffix == ".parquet":
+            # Requires pyarrow or fastparquet, plan metadata are kept in the frame attrs
+            df_actions = pd.DataFrame(
+                [dataclasses.asdict(action) for action in self.actions],
+                columns=[field.name for field in dataclasses.fields(WorklogAction)],
+            )
+            df_actions.attrs = self._metadata()
+            df_actions.to_parquet(plan_file, index=False)
+        else:
+            with open(plan_file, "w", encoding="utf-8") as file:
+                json.dump(
+                    {
+                        **self._metadata(),
+                        "actions": [
+                            dataclasses.asdict(action) for action in self.actions
+                        ],
+                    },
+                    file,
+                    indent=1,
+                )
+
+        logger.info(f"Worklog plan saved to {plan_file}")
+
+    @classmethod
+    def load(cls, plan_file: Union[str, Path]) -> "WorklogPlan":
+        """Load a plan saved with `save`.
+
+        Parameters:
+        plan_file (Union[str, Path]): The plan file, JSON or Parquet.
+
+        Returns:
+        WorklogPlan: The loaded plan.
+        """
+        plan_file = Path(plan_file)
+        if plan_file.suffix == ".parquet":
+            df_actions: pd.DataFrame = pd.read_parquet(plan_file)
+            metadata: dict[str, Any] = dict(df_actions.attrs)
+            records: list[dict[str, Any]] = df_actions.to_dict(orient="records")
+        else:
+            with open(plan_file, encoding="utf-8") as file:
+                metadata = json.load(file)
+            records = metadata.pop("actions")
+
+        return cls(
+            actions=[
+                WorklogAction(
+                    issue=str(record["issue"]),
+                    day=str(record["day"]),
+                    seconds=int(record["seconds"]),
+                    action=str(record["action"]),
+                    reason=str(record["reason"]),
+                    # Missing in the plans saved before reconciliation existed
+                    worklog_id=str(record.get("worklog_id") or ""),
+                )
+                for record in records
+            ],
+            **metadata,
+        )
+
+    @property
+    def already_planned(self) -> list[WorklogAction]:
+        """The days not logged because another user of the team planned them first."""
+        return [action for action in self.actions if action.reason == ALREADY_PLANNED]
+
+    def summary(self) -> dict[str, int]:
+        """Count the actions by type and skip reason."""
+        counts: dict[str, int] = defaultdict(int)
+        for action in self.actions:
+            counts[action.reason or action.action] += 1
+        return dict(counts)
+
+
+def collect_issue_keys(jira_map: pd.Series) -> list[str]:
+    """Collect the distinct Jira issue keys referenced by a jira map.
+
+    Parameters:
+    jira_map (pd.Series): Comma-separated Jira issue keys indexed by report row.
+
+    Returns:
+    list[str]: The sorted issue keys.
+    """
+    return sorted(
+        {issue.strip() for issues in jira_map.unique() for issue in issues.split(",")}
+    )
+
+
+def seconds_by_issue_day(
+    df_month_to_log: pd.DataFrame, jira_map: pd.Series
+) -> pd.DataFrame:
+    """Apportion the hours of the month to the mapped issues, in whole seconds.
+
+    The map is exploded once into the issues of each distinct map value. The
+    rows mapped to the same issues are summed per day in whole seconds, then
+    each day total is split equally among those issues by the largest remainder
+    method: the shares differ by at most a second and always add back to the
+    total of the report. The shares are finally summed per issue and day.
+
+    Parameters:
+    df_month_to_log (pd.DataFrame): DataFrame containing the hours of the selected month to be logged.
+    jira_map (pd.Series): Series mapping the DataFrame indices to JIRA issue keys.
+
+    Returns:
+    pd.DataFrame: The columns issue, day (pd.Timestamp) and seconds, one row per
+    issue and day with time to log, issues in the order of the map and days in order.
+    """
+    mapped: pd.Series = jira_map.reindex(df_month_to_log.index)
+    has_map: np.ndarray = mapped.notna().to_numpy()
+    if not has_map.any() or df_month_to_log.columns.empty:
+        return pd.DataFrame(
+            {
+                "issue": pd.Series(dtype=object),
+                "day": pd.Series(dtype="datetime64[ns]"),
+                "seconds": pd.Series(dtype="int64"),
+            }
+        )
+
+    # Each cell in whole seconds, so that every sum below is exact
+    cell_seconds: np.ndarray = np.rint(
+        np.nan_to_num(df_month_to_log.to_numpy(dtype=float)[has_map]) * HOUR_TO_SECONDS
+    ).astype(np.int64)
+
+    # Seconds by day of the rows sharing a map value
+    group_codes, group_maps = pd.factorize(mapped[has_map], sort=True)
+    group_seconds: np.ndarray = np.zeros(
+        (len(group_maps), cell_seconds.shape[1]), dtype=np.int64
+    )
+    np.add.at(group_seconds, group_codes, cell_seconds)
+    group_index, day_index = np.nonzero(group_seconds)
+    df_totals = pd.DataFrame(
+        {
+            "group": group_index,
+            "day": day_index,
+            "total": group_seconds[group_index, day_index],
+        }
+    )
+
+    # (group, issue, position among the issues of the group, number of issues)
+    issues: pd.Series = (
+        pd.Series(group_maps, dtype=object).str.split(",").explode().str.strip()
+    )
+    df_shares = pd.DataFrame(
+        {
+            "group": issues.index.to_numpy(),
+            "issue_code": pd.factorize(issues)[0],
+            "position": issues.groupby(level=0).cumcount().to_numpy(),
+        }
+    )
+    df_shares["count"] = df_shares.groupby("group")["group"].transform("size")
+
+    df_long: pd.DataFrame = df_totals.merge(df_shares, on="group")
+    # Equal quotas: the remainder seconds go to the first issues of the group
+    df_long["seconds"] = df_long["total"] // df_long["count"] + (
+        df_long["position"] < df_long["total"] % df_long["count"]
+    )
+
+    df_seconds: pd.DataFrame = (
+        df_long[df_long["seconds"] > 0]
+        .groupby(["issue_code", "day"], sort=True)["seconds"]
+        .sum()
+        .reset_index()
+    )
+    return pd.DataFrame(
+        {
+            "issue": pd.unique(issues)[df_seconds["issue_code"].to_numpy()],
+            "day": df_month_to_log.columns[df_seconds["day"].to_numpy()],
+            "seconds": df_seconds["seconds"].to_numpy(),
+        }
+    )
+
+
+def build_worklog_plan(
+    df_month_to_log: pd.DataFrame,
+    jira_map: pd.Series,
+    issue_state: IssueStateCache,
+    author_id: str,
+    user: str = "",
+    month: int = 0,
+    planned_days: Optional[dict[str, set[str]]] = None,
+) -> WorklogPlan:
+    """Decide which worklogs to create. If an activity is linked to multiple issues, time is split equally between them.
+
+    The time of all the report rows mapped to an issue is summed per day, so an
+    issue gets at most one worklog per day.
+
+    No worklog is written: the Jira state is read from the issue state cache,
+    which should have been prefetched for all the mapped issues.
+
+    Parameters:
+    df_month_to_log (pd.DataFrame): DataFrame containing the hours of the selected month to be logged.
+    jira_map (pd.Series): Series mapping the DataFrame indices to JIRA issue keys.
+    issue_state (IssueStateCache): Worklogs and status timelines of the mapped issues.
+    author_id (str): The Jira account ID of the worklogs author.
+    user (str): The report sheet of the plan, stored as metadata.
+    month (int): The month of the plan, stored as metadata.
+    planned_days (dict[str, set[str]], optional): Days already planned by issue,
+        shared by the plans of many users logging as the same Jira account.
+        Updated with the days planned here.
+
+    Returns:
+    WorklogPlan: One action per issue and day with hours to log.
+    """
+    plan = WorklogPlan(author_id=author_id, user=user, month=month)
+
+    # Days planned for the previous users of the same Jira account count as logged
+    if planned_days is None:
+        planned_days = {}
+
+    with profile_scope("groupby/split"):
+        df_seconds: pd.DataFrame = seconds_by_issue_day(df_month_to_log, jira_map)
+
+    # Days on which the author has already logged work, None if unavailable
+    author_days: dict[str, Optional[set[str]]] = {}
+    for issue, day, seconds in zip(
+        df_seconds["issue"], df_seconds["day"], df_seconds["seconds"].tolist()
+    ):
+        if issue not in author_days:
+            try:
+                author_days[issue] = issue_state.author_worklog_days(issue, author_id)
+            except exceptions.JIRAError as e:
+                logger.warning(f"Failed to fetch worklogs for issue {issue}: {e}")
+                author_days[issue] = None
+        this_author_worklogs_days: Optional[set[str]] = author_days[issue]
+        day_str: str = day.strftime("%Y-%m-%d")
+
+        if this_author_worklogs_days is None:
+            action = WorklogAction(
+                issue, day_str, seconds, SKIP, "worklogs unavailable"
+            )
+        elif day_str in this_author_worklogs_days:
+            logger.info(f"Work already logged for issue {issue} on {day_str}")
+            action = WorklogAction(issue, day_str, seconds, SKIP, "already logged")
+        elif day_str in planned_days.get(issue, ()):
+            action = WorklogAction(issue, day_str, seconds, SKIP, ALREADY_PLANNED)
+        elif not issue_state.is_open_on(issue, day.date()):
+            logger.info(f"Issue {issue} was not 'open' on {day_str}. Skipping log.")
+            action = WorklogAction(issue, day_str, seconds, SKIP, "issue not open")
+        else:
+            # New worklog to be log on Jira
+            action = WorklogAction(issue, day_str, seconds, CREATE)
+            planned_days.setdefault(issue, set()).add(day_str)
+
+        plan.actions.append(action)
+
+    return plan
+
+
+def build_reconcile_plan(
+    df_month_to_log: pd.DataFrame,
+    jira_map: pd.Series,
+    issue_state: IssueStateCache,
+    author_id: str,
+    user: str = "",
+    month: int = 0,
+) -> WorklogPlan:
+    """Decide the fewest writes making the author's worklogs match the report.
+
+    The hours of all the report rows mapped to an issue are summed per day, then
+    compared with the worklogs of the author on that issue and day:
+    - no worklog: one is created, if the issue was open on that day;
+    - worklogs with a different total: the one already matching the hours is kept
+      (or the first one is updated to them) and the others are deleted, so that a
+      day always ends with a single worklog;
+    - worklogs on a day of the month without hours in the report: deleted.
+
+    Every worklog of the author on the mapped issues is compared, including the
+    issues without hours in the month, so the Jira account must be used to log
+    this report only.
+
+    Parameters:
+    df_month_to_log (pd.DataFrame): DataFrame containing the hours of the selected month to be logged.
+    jira_map (pd.Series): Series mapping the report rows to JIRA issue keys, all of
+        its issues are reconciled.
+    issue_state (IssueStateCache): Worklogs and status timelines of the mapped issues.
+    author_id (str): The Jira account ID of the worklogs author.
+    user (str): The report sheet of the plan, stored as metadata.
+    month (int): The month of the plan, stored as metadata.
+
+    Returns:
+    WorklogPlan: The create, update and delete actions, and the matching days as skipped.
+    """
+    plan = WorklogPlan(author_id=author_id, user=user, month=month)
+    if df_month_to_log.columns.empty:
+        return plan
+
+    # Seconds to log by issue and day, summed over all the rows mapped to the issue
+    target_seconds: dict[str, dict[str, int]] = defaultdict(dict)
+    with profile_scope("groupby/split"):
+        df_seconds: pd.DataFrame = seconds_by_issue_day(df_month_to_log, jira_map)
+    for issue, day, seconds in zip(
+        df_seconds["issue"], df_seconds["day"], df_seconds["seconds"].tolist()
+    ):
+        target_seconds[issue][day.strftime("%Y-%m-%d")] = seconds
+    # The mapped issues without hours in the month lose all the worklogs of the month
+    for issue in collect_issue_keys(jira_map):
+        target_seconds.setdefault(issue, {})
+
+    # Worklogs outside the month of the report are never touched
+    month_prefix: str = df_month_to_log.columns[0].strftime("%Y-%m-")
+
+    for issue, seconds_by_day in target_seconds.items():
+        try:
+            logged_by_day: dict[str, list[WorklogRecord]] = author_month_worklogs(
+                issue_state, issue, author_id, month_prefix
+            )
+        except exceptions.JIRAError as e:
+            logger.warning(f"Failed to fetch worklogs for issue {issue}: {e}")
+            plan.actions.extend(
+                WorklogAction(issue, day, seconds, SKIP, "worklogs unavailable")
+                for day, seconds in seconds_by_day.items()
+            )
+            continue
+
+        for day in sorted(seconds_by_day.keys() | logged_by_day.keys()):
+            plan.actions.extend(
+                reconcile_day(
+                    issue_state,
+                    issue,
+                    day,
+                    seconds_by_day.get(day, 0),
+                    logged_by_day.get(day, []),
+                )
+            )
+
+    return plan
+
+
+def author_month_worklogs(
+    issue_state: IssueStateCache, issue: str, author_id: str, month_prefix: str
+) -> dict[str, list[WorklogRecord]]:
+    """Return the worklogs of the author on an issue during a month, by day.
+
+    Raises:
+    JIRAError: If the worklogs could not be fetched.
+    """
+    logged_by_day: dict[str, list[WorklogRecord]] = defaultdict(list)
+    for record in issue_state.worklogs(issue):
+        if record.author_id == author_id and record.day.startswith(month_prefix):
+            logged_by_day[record.day].append(record)
+    return logged_by_day
+
+
+def reconcile_day(
+    issue_state: IssueStateCache,
+    issue: str,
+    day: str,
+    seconds: int,
+    logged: list[WorklogRecord],
+) -> list[WorklogAction]:
+    """Return the fewest actions making the worklogs of an issue and day total `seconds`.
+
+    Parameters:
+    issue_state (IssueStateCache): The status timeline of the issue.
+    issue (str): The Jira issue key.
+    day (str): The day, formatted as 'YYYY-MM-DD'.
+    seconds (int): The time to log on that day, 0 to remove every worklog.
+    logged (list[WorklogRecord]): The worklogs of the author on that day.
+
+    Returns:
+    list[WorklogAction]: The writes, or the reason why nothing is written.
+    """
+    if not logged:
+        if not seconds:
+            return []
+        if issue_state.is_open_on(issue, datetime.date.fromisoformat(day)):
+            return [WorklogAction(issue, day, seconds, CREATE)]
+        logger.info(f"Issue {issue} was not 'open' on {day}. Skipping log.")
+        return [WorklogAction(issue, day, seconds, SKIP, "issue not open")]
+
+    if sum(record.seconds for record in logged) == seconds:
+        return [WorklogAction(issue, day, seconds, SKIP, "already logged")]
+
+    actions: list[WorklogAction] = []
+    kept: Optional[WorklogRecord] = None
+    if seconds:
+        # Keep the worklog with the right time if any, so no update is needed
+        kept = next(
+            (record for record in logged if record.seconds == seconds),
+            logged[0],
+        )
+        if kept.seconds != seconds:
+            logger.info(
+                f"Updating worklog of issue {issue} on {day} from {kept.seconds}s to {seconds}s"
+            )
+            actions.append(
+                WorklogAction(issue, day, seconds, UPDATE, worklog_id=kept.worklog_id)
+            )
+
+    for record in logged:
+        if record is not kept:
+            logger.info(
+                f"Deleting worklog of issue {issue} on {day} ({record.seconds}s)"
+            )
+            actions.append(
+                WorklogAction(issue, day, 0, DELETE, worklog_id=record.worklog_id)
+            )
+    return actions
+
+
+def build_team_reconcile_plans(
+    months_to_log: dict[str, pd.DataFrame],
+    jira_map: pd.Series,
+    issue_state: IssueStateCache,
+    author_id: str,
+    month: int = 0,
+) -> dict[str, WorklogPlan]:
+    """Reconcile the worklogs of a Jira account shared by the users of a team.
+
+    As when the team only creates worklogs, an issue and day belongs to the first
+    user planning time on it: the time of the next users is skipped as already
+    planned. The worklogs of the account on the other days of the month, on every
+    mapped issue, are deleted by the plan of the first user.
+
+    Parameters:
+    months_to_log (dict[str, pd.DataFrame]): The hours of the month of each user, in order.
+    jira_map (pd.Series): Series mapping the report rows to JIRA issue keys, all of
+        its issues are reconciled.
+    issue_state (IssueStateCache): Worklogs and status timelines of the mapped issues.
+    author_id (str): The Jira account ID of the worklogs author.
+    month (int): The month of the plans, stored as metadata.
+
+    Returns:
+    dict[str, WorklogPlan]: The plan of each user.
+    """
+    users: list[str] = list(months_to_log)
+    plans: dict[str, WorklogPlan] = {
+        user: WorklogPlan(author_id=author_id, user=user, month=month) for user in users
+    }
+    if not users:
+        return plans
+
+    # Seconds to log and owner of each issue and day
+    targets: dict[str, dict[str, tuple[str, int]]] = defaultdict(dict)
+    month_prefix: str = ""
+    for user, df_month_to_log in months_to_log.items():
+        if df_month_to_log.columns.empty:
+            continue
+        month_prefix = df_month_to_log.columns[0].strftime("%Y-%m-")
+        with profile_scope("groupby/split"):
+            df_seconds: pd.DataFrame = seconds_by_issue_day(df_month_to_log, jira_map)
+        for issue, day, seconds in zip(
+            df_seconds["issue"], df_seconds["day"], df_seconds["seconds"].tolist()
+        ):
+            day_str: str = day.strftime("%Y-%m-%d")
+            if day_str in targets[issue]:
+                plans[user].actions.append(
+                    WorklogAction(issue, day_str, seconds, SKIP, ALREADY_PLANNED)
+                )
+            else:
+                targets[issue][day_str] = (user, seconds)
+    if not month_prefix:
+        return plans
+
+    for issue in collect_issue_keys(jira_map):
+        owned_days: dict[str, tuple[str, int]] = targets.get(issue, {})
+        try:
+            logged_by_day: dict[str, list[WorklogRecord]] = author_month_worklogs(
+                issue_state, issue, author_id, month_prefix
+            )
+        except exceptions.JIRAError as e:
+            logger.warning(f"Failed to fetch worklogs for issue {issue}: {e}")
+            for day, (user, seconds) in owned_days.items():
+                plans[user].actions.append(
+                    WorklogAction(issue, day, seconds, SKIP, "worklogs unavailable")
+                )
+            continue
+
+        for day in sorted(owned_days.keys() | logged_by_day.keys()):
+            user, seconds = owned_days.get(day, (users[0], 0))
+            plans[user].actions.extend(
+                reconcile_day(
+                    issue_state, issue, day, seconds, logged_by_day.get(day, [])
+                )
+            )
+
+    return plans
@@ -0,0 +1,323 @@
+"""Concurrent posting of worklogs to Jira with client-side rate limiting."""
+
+import email.utils
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Callable, Optional
+
+from jira import JIRA, Worklog, exceptions
+
+from constants import MAX_RATE_LIMIT_RETRIES
+from custom_exceptions import RunCancelledError
+from issue_state import IssueStateCache
+from jira_client import session_status_retries_disabled
+from logging_conf import logger
+from worklog_plan import CREATE, DELETE, UPDATE, WorklogAction
+
+# Requests made by each write: an update or a delete first fetches the worklog
+# resource, and the update reloads it after the change
+REQUESTS_PER_ACTION: dict[str, int] = {CREATE: 1, UPDATE: 3, DELETE: 2}
+# Responses retried after a pause of the rate limit, as Retry-After asks
+RETRY_STATUS_CODES: tuple[int, ...] = (429, 503)
+
+
+def retry_after_seconds(error: exceptions.JIRAError, attempt: int) -> float:
+    """Return how long to wait before retrying a request rejected with HTTP 429 or 503.
+
+    Parameters:
+    error (JIRAError): The error raised by the Jira client.
+    attempt (int): The number of attempts already made, used for the fallback backoff.
+
+    Returns:
+    float: The delay in seconds requested by the `Retry-After` header, or an
+    exponential backoff if the header is missing or malformed.
+    """
+    response = getattr(error, "response", None)
+    retry_after: Optional[str] = (
+        response.headers.get("Retry-After") if response is not None else None
+    )
+    if retry_after:
+        try:
+            return max(float(retry_after), 0.0)
+        except ValueError:
+            try:
+                retry_at = email.utils.parsedate_to_datetime(retry_after)
+            except (TypeError, ValueError):
+                retry_at = None
+            if retry_at is not None:
+                return max(retry_at.timestamp() - time.time(), 0.0)
+
+    return float(2**attempt)
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at a constant rate."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self._rate: float = rate
+        self._capacity: float = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens: float = self._capacity
+        self._updated_at: float = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1) -> None:
+        """Block until the tokens are available and consume them."""
+        tokens = min(tokens, self._capacity)
+        while True:
+            with self._lock:
+                now: float = time.monotonic()
+                if now >= self._updated_at:
+                    self._tokens = min(
+                        self._capacity,
+                        self._tokens + (now - self._updated_at) * self._rate,
+                    )
+                    self._updated_at = now
+                    if self._tokens >= tokens:
+                        self._tokens -= tokens
+                        return
+                    wait: float = (tokens - self._tokens) / self._rate
+                else:
+                    # Paused by a Retry-After
+                    wait = self._updated_at - now
+
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Empty the bucket and stop refilling it for the given time."""
+        with self._lock:
+            self._tokens = 0.0
+            self._updated_at = max(self._updated_at, time.monotonic() + seconds)
+
+
+class AdaptiveConcurrencyLimit:
+    """Concurrency limit with additive increase and multiplicative decrease (AIMD)."""
+
+    def __init__(self, max_limit: int):
+        self._max_limit: int = max_limit
+        self._limit: float = float(max_limit)
+        # The lowest limit reached, to check that the errors slowed the writers down
+        self.lowest_limit: int = max_limit
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def acquire(self) -> None:
+        """Block until the number of requests in flight is below the current limit."""
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self, success: bool) -> None:
+        """Release a slot, growing the limit on success and halving it on error."""
+        with self._condition:
+            self._in_flight -= 1
+            if success:
+                # About +1 every time a full window of requests succeeds
+                self._limit = min(self._max_limit, self._limit + 1 / self._limit)
+            else:
+                self._limit = max(1.0, self._limit / 2)
+                self.lowest_limit = min(self.lowest_limit, int(self._limit))
+            self._condition.notify_all()
+
+
+class WorklogWriter:
+    """Write worklogs through a bounded thread pool, shared rate limit and AIMD backoff.
+
+    Parameters:
+    jira (JIRA): An authenticated JIRA client instance.
+    issue_state (IssueStateCache): Cache updated with every worklog written.
+    max_workers (int): Maximum number of concurrent requests.
+    requests_per_second (float): Sustained request rate allowed towards the server.
+    cancel_event (threading.Event, optional): Once set, the writes not started yet
+        are skipped and `write_worklogs` raises RunCancelledError.
+    """
+
+    def __init__(
+        self,
+        jira: JIRA,
+        issue_state: IssueStateCache,
+        max_workers: int,
+        requests_per_second: float,
+        cancel_event: Optional[threading.Event] = None,
+    ):
+        self._jira: JIRA = jira
+        self._issue_state: IssueStateCache = issue_state
+        self._max_workers: int = max(1, max_workers)
+        self._bucket = TokenBucket(requests_per_second)
+        self._concurrency = AdaptiveConcurrencyLimit(self._max_workers)
+        self._cancel_event: threading.Event = (
+            cancel_event if cancel_event is not None else threading.Event()
+        )
+        # Writes rejected with 429 or 503
+        self.rate_limited = 0
+        self._rate_limited_lock = threading.Lock()
+
+    @property
+    def lowest_concurrency_limit(self) -> int:
+        return self._concurrency.lowest_limit
+
+    def _write(self, action: WorklogAction) -> None:
+        if action.action == CREATE:
+            worklog: Worklog = self._jira.add_worklog(
+                issue=action.issue,
+                timeSpentSeconds=action.seconds,
+                started=action.started,
+            )
+            self._issue_state.record_worklog(action.issue, worklog)
+        elif action.action == UPDATE:
+            self._jira.worklog(action.issue, action.worklog_id).update(
+                timeSpentSeconds=action.seconds
+            )
+            self._issue_state.record_worklog_update(
+                action.issue, action.worklog_id, action.seconds
+            )
+        elif action.action == DELETE:
+            self._jira.worklog(action.issue, action.worklog_id).delete()
+            self._issue_state.record_worklog_delete(action.issue, action.worklog_id)
+        else:
+            raise ValueError(f"Not a write action: {action.action}")
+
+    def _write_with_retry(self, action: WorklogAction) -> None:
+        attempt = 0
+        while True:
+            self._concurrency.acquire()
+            self._bucket.acquire(REQUESTS_PER_ACTION[action.action])
+            if self._cancel_event.is_set():
+                # A write already sent completes, the next ones are not started
+                self._concurrency.release(success=True)
+                raise RunCancelledError()
+            try:
+                # The session would retry 429 and 503 itself, holding the slot
+                with session_status_retries_disabled(self._jira):
+                    self._write(action)
+            except exceptions.JIRAError as e:
+                self._concurrency.release(success=False)
+                if e.status_code not in RETRY_STATUS_CODES:
+                    raise
+                with self._rate_limited_lock:
+                    self.rate_limited += 1
+                if attempt >= MAX_RATE_LIMIT_RETRIES:
+                    raise
+
+                delay: float = retry_after_seconds(e, attempt)
+                logger.debug(
+                    f"Rate limited while writing work on {action.issue}, retry in {delay}s"
+                )
+                self._bucket.pause(delay)
+                attempt += 1
+            except Exception:
+                self._concurrency.release(success=False)
+                raise
+            else:
+                self._concurrency.release(success=True)
+                return
+
+    def write_worklogs(
+        self,
+        actions: list[WorklogAction],
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> dict[str, int]:
+        """Create, update and delete worklogs and log the outcome of each issue.
+
+        Parameters:
+        actions (list[WorklogAction]): The write actions to apply.
+        progress_callback (Callable[[int, int], None], optional): Called with the number
+            of completed and total actions each time an action is done.
+
+        Returns:
+        dict[str, int]: The number of worklogs "logged" (created), "updated",
+        "deleted" and "failed".
+
+        Raises:
+        RunCancelledError: If the run was cancelled before all the writes were done.
+        """
+        total_actions: int = len(actions)
+        remaining: dict[str, int] = defaultdict(int)
+        for action in actions:
+            remaining[action.issue] += 1
+        done: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        failed: set[str] = set()
+        cancelled = 0
+
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            futures: dict[Future, WorklogAction] = {
+                executor.submit(self._write_with_retry, action): action
+                for action in actions
+            }
+
+            try:
+                cancelled = self._collect(
+                    futures, total_actions, remaining, done, failed, progress_callback
+                )
+            except BaseException:
+                # E.g. Ctrl+C: let the threads skip the writes not started yet
+                self._cancel_event.set()
+                raise
+
+        counts: dict[str, int] = {
+            "logged": sum(by_action[CREATE] for by_action in done.values()),
+            "updated": sum(by_action[UPDATE] for by_action in done.values()),
+            "deleted": sum(by_action[DELETE] for by_action in done.values()),
+        }
+        if cancelled:
+            raise RunCancelledError(
+                f"The run was cancelled after {sum(counts.values())} of "
+                f"{total_actions} worklog write(s)"
+            )
+        counts["failed"] = total_actions - sum(counts.values())
+        return counts
+
+    def _collect(
+        self,
+        futures: dict[Future, WorklogAction],
+        total_actions: int,
+        remaining: dict[str, int],
+        done: dict[str, dict[str, int]],
+        failed: set[str],
+        progress_callback: Optional[Callable[[int, int], None]],
+    ) -> int:
+        # Wait for the writes and log the outcome of each issue once complete,
+        # returns the number of writes skipped because the run was cancelled
+        cancelled = 0
+        for done_actions, future in enumerate(as_completed(futures), start=1):
+            action: WorklogAction = futures[future]
+            issue: str = action.issue
+            try:
+                future.result()
+                done[issue][action.action] += 1
+            except RunCancelledError:
+                cancelled += 1
+            except Exception as e:
+                failed.add(issue)
+                # Its state changed (e.g. closed) or the write may have been done
+                # before the connection dropped, do not trust the ledger next time
+                self._issue_state.mark_stale(issue)
+                if not isinstance(e, exceptions.JIRAError):
+                    logger.warning(f"Error writing a worklog of issue {issue}: {e!r}")
+
+            # Report each issue once all of its actions are done
+            remaining[issue] -= 1
+            if not remaining[issue]:
+                if done[issue][CREATE]:
+                    logger.info(
+                        f"Logged {done[issue][CREATE]} worklog(s) for issue {issue}"
+                    )
+                if done[issue][UPDATE] or done[issue][DELETE]:
+                    logger.info(
+                        f"Updated {done[issue][UPDATE]} and deleted {done[issue][DELETE]} worklog(s) for issue {issue}"
+                    )
+                if issue in failed:
+                    logger.warning(
+                        f"Cannot log work for the issue {issue}, issue might be closed."
+                    )
+
+            if progress_callback is not None:
+                progress_callback(done_actions, total_actions)
+
+        return cancelled